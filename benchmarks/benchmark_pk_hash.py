@@ -0,0 +1,75 @@
+"""
+Microbenchmark comparing the rows/sec of the columnar primary key hashing
+engine used by the hash bucket step against the legacy per-row generator.
+
+Usage:
+    python benchmarks/benchmark_pk_hash.py [record_count]
+"""
+import sys
+from typing import Callable, Dict, List
+
+import numpy as np
+import pyarrow as pa
+
+from deltacat.compute.compactor.utils.primary_key_hash import hash_primary_keys
+from deltacat.tests.test_utils.primary_key_hash import legacy_pk_digests
+from deltacat.utils.performance import timed_invocation
+
+
+def _legacy_hash_primary_keys(table: pa.Table, primary_keys: List[str]) -> pa.Array:
+    return pa.array(legacy_pk_digests(table, primary_keys), pa.binary(20))
+
+
+def _generate_table(record_count: int) -> pa.Table:
+    rng = np.random.default_rng(0)
+    int_keys = rng.integers(0, 2**62, size=record_count, dtype=np.int64)
+    return pa.table(
+        {
+            "int_pk": int_keys,
+            "str_pk": pa.array(int_keys.astype(str)).cast(pa.string()),
+            # microseconds since epoch, up to ~2033
+            "ts_pk": pa.array(int_keys % 2_000_000_000_000_000, pa.timestamp("us")),
+        }
+    )
+
+
+def run_benchmark(record_count: int) -> Dict[str, Dict[str, float]]:
+    table = _generate_table(record_count)
+    key_sets = {
+        "string": ["str_pk"],
+        "int": ["int_pk"],
+        "multi-column": ["int_pk", "str_pk", "ts_pk"],
+    }
+    hash_funcs: Dict[str, Callable] = {
+        "legacy": _legacy_hash_primary_keys,
+        "columnar": hash_primary_keys,
+    }
+    results = {}
+    for key_set_name, primary_keys in key_sets.items():
+        results[key_set_name] = {}
+        digests = {}
+        for hash_func_name, hash_func in hash_funcs.items():
+            digests[hash_func_name], latency = timed_invocation(
+                hash_func,
+                table,
+                primary_keys,
+            )
+            results[key_set_name][hash_func_name] = record_count / latency
+        assert digests["legacy"].to_pylist() == digests["columnar"].to_pylist(), (
+            f"Columnar digests for {key_set_name} primary keys are not "
+            f"byte-identical to legacy digests."
+        )
+    return results
+
+
+if __name__ == "__main__":
+    record_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    results = run_benchmark(record_count)
+    print(f"Primary key hashing throughput for {record_count} records (rows/sec):")
+    for key_set_name, hash_func_results in results.items():
+        legacy = hash_func_results["legacy"]
+        columnar = hash_func_results["columnar"]
+        print(
+            f"  {key_set_name:>12}: legacy={legacy:,.0f} "
+            f"columnar={columnar:,.0f} speedup={columnar / legacy:.2f}x"
+        )
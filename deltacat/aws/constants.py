@@ -4,3 +4,10 @@ from deltacat.utils.common import env_integer
 
 BOTO_MAX_RETRIES = env_integer("BOTO_MAX_RETRIES", 15)
 TIMEOUT_ERROR_CODES: List[str] = ["ReadTimeoutError", "ConnectTimeoutError"]
+
+# Bytes read from the end of an S3 object when it's opened for ranged reads.
+# Objects up to this size are read with one request, and larger Parquet
+# files usually have their footer served from this tail.
+S3_RANGED_READ_TAIL_SIZE_BYTES = env_integer(
+    "S3_RANGED_READ_TAIL_SIZE_BYTES", 64 * 1024
+)
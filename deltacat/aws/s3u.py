@@ -1,10 +1,15 @@
+import io
 import logging
-import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from typing import Any, Callable, Dict, Generator, List, Optional, Union
 from uuid import uuid4
 
 import pyarrow as pa
+import pyarrow.parquet as papq
 import ray
 import s3fs
 from boto3.resources.base import ServiceResource
@@ -23,7 +28,10 @@ from tenacity import (
 
 import deltacat.aws.clients as aws_utils
 from deltacat import logs
-from deltacat.aws.constants import TIMEOUT_ERROR_CODES
+from deltacat.aws.constants import (
+    S3_RANGED_READ_TAIL_SIZE_BYTES,
+    TIMEOUT_ERROR_CODES,
+)
 from deltacat.exceptions import NonRetryableError, RetryableError
 from deltacat.storage import (
     DistributedDataset,
@@ -46,6 +54,12 @@ logger = logs.configure_deltacat_logger(logging.getLogger(__name__))
 # TODO(raghumdani): refactor redshift datasource to reuse the
 # same module for writing output files.
 
+# thread pool shared by all parallel manifest entry downloads in this process
+_download_executor: Optional[ThreadPoolExecutor] = None
+_download_executor_max_workers = 0
+_download_executor_pid: Optional[int] = None
+_download_executor_lock = threading.Lock()
+
 
 class CapturedBlockWritePaths:
     def __init__(self):
@@ -150,6 +164,95 @@ def get_object_at_url(url: str, **s3_client_kwargs) -> Dict[str, Any]:
     return s3.get_object(Bucket=parsed_s3_url.bucket, Key=parsed_s3_url.key)
 
 
+class S3RangedReader(io.RawIOBase):
+    """
+    Read-only, seekable file over an S3 object that fetches the bytes of each
+    read with a ranged GET, so that readers like Parquet only download the
+    parts of the object that they need. The tail of the object is fetched
+    when the file is opened, which also discovers the object size.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        tail_size: int = S3_RANGED_READ_TAIL_SIZE_BYTES,
+        **s3_client_kwargs,
+    ):
+        super().__init__()
+        self._s3 = s3_client_cache(None, **s3_client_kwargs)
+        parsed_s3_url = parse_s3_url(url)
+        self._bucket = parsed_s3_url.bucket
+        self._key = parsed_s3_url.key
+        self._position = 0
+        try:
+            response = self._s3.get_object(
+                Bucket=self._bucket,
+                Key=self._key,
+                Range=f"bytes=-{tail_size}",
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "InvalidRange":
+                raise
+            # ranged reads of an empty object are unsatisfiable
+            self._size = 0
+            self._tail = b""
+        else:
+            self._tail = response["Body"].read()
+            content_range = response.get("ContentRange")
+            self._size = (
+                int(content_range.rsplit("/", 1)[1])
+                if content_range
+                else len(self._tail)
+            )
+        self._tail_offset = self._size - len(self._tail)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError(f"Negative seek position: {position}")
+        self._position = position
+        return position
+
+    def readinto(self, buffer) -> int:
+        length = min(len(buffer), self._size - self._position)
+        if length <= 0:
+            return 0
+        start = self._position
+        if start >= self._tail_offset:
+            tail_start = start - self._tail_offset
+            data = memoryview(self._tail)[tail_start : tail_start + length]
+        else:
+            data = self._s3.get_object(
+                Bucket=self._bucket,
+                Key=self._key,
+                Range=f"bytes={start}-{start + length - 1}",
+            )["Body"].read()
+        length = len(data)
+        buffer[:length] = data
+        self._position += length
+        return length
+
+
 def delete_files_by_prefix(bucket: str, prefix: str, **s3_client_kwargs) -> None:
 
     s3 = s3_resource_cache(None, **s3_client_kwargs)
@@ -429,6 +532,45 @@ def download_manifest_entry(
     return table
 
 
+def _read_parquet_metadata(s3_url: str, **s3_client_kwargs) -> papq.FileMetaData:
+    with S3RangedReader(s3_url, **s3_client_kwargs) as reader:
+        return papq.read_metadata(pa.PythonFile(reader, mode="r"))
+
+
+def get_parquet_metadata(
+    manifest_entry: ManifestEntry,
+    token_holder: Optional[Dict[str, Any]] = None,
+) -> Optional[papq.FileMetaData]:
+    """
+    Reads the footer metadata of an uncompressed Parquet manifest entry
+    without downloading its data pages. Returns None for manifest entries of
+    any other content type or encoding.
+    """
+    if (
+        manifest_entry.meta.content_type != ContentType.PARQUET.value
+        or manifest_entry.meta.content_encoding != ContentEncoding.IDENTITY.value
+    ):
+        return None
+    s3_client_kwargs = (
+        {
+            "aws_access_key_id": token_holder["accessKeyId"],
+            "aws_secret_access_key": token_holder["secretAccessKey"],
+            "aws_session_token": token_holder["sessionToken"],
+        }
+        if token_holder
+        else {}
+    )
+    s3_url = manifest_entry.uri
+    if s3_url is None:
+        s3_url = manifest_entry.url
+    retrying = Retrying(
+        wait=wait_random_exponential(multiplier=1, max=60),
+        stop=stop_after_delay(30 * 60),
+        retry=retry_if_not_exception_type(NonRetryableError),
+    )
+    return retrying(_read_parquet_metadata, s3_url, **s3_client_kwargs)
+
+
 def _download_manifest_entries(
     manifest: Manifest,
     token_holder: Optional[Dict[str, Any]] = None,
@@ -451,6 +593,31 @@ def _download_manifest_entries(
     ]
 
 
+def _get_download_executor(max_workers: int) -> ThreadPoolExecutor:
+    """
+    Returns the thread pool shared by parallel manifest entry downloads in
+    this process, replacing it with a larger pool if it has fewer than
+    `max_workers` threads or if it was created before this process forked.
+    A replaced pool is never shut down, since concurrent downloads may still
+    be submitting to it. Its idle threads exit once it's garbage collected.
+    """
+    global _download_executor, _download_executor_max_workers, _download_executor_pid
+    with _download_executor_lock:
+        pid = os.getpid()
+        if (
+            _download_executor is None
+            or _download_executor_pid != pid
+            or _download_executor_max_workers < max_workers
+        ):
+            _download_executor = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix="deltacat-s3-download",
+            )
+            _download_executor_max_workers = max_workers
+            _download_executor_pid = pid
+        return _download_executor
+
+
 def _download_manifest_entries_parallel(
     manifest: Manifest,
     token_holder: Optional[Dict[str, Any]] = None,
@@ -461,8 +628,11 @@ def _download_manifest_entries_parallel(
     file_reader_kwargs_provider: Optional[ReadKwargsProvider] = None,
 ) -> LocalDataset:
 
-    tables = []
-    pool = multiprocessing.Pool(max_parallelism)
+    # S3 reads and Arrow decoding release the GIL, so threads download
+    # entries in parallel without copying tables across process boundaries
+    if not max_parallelism:
+        max_parallelism = os.cpu_count() or 1
+    executor = _get_download_executor(max_parallelism)
     downloader = partial(
         download_manifest_entry,
         token_holder=token_holder,
@@ -471,8 +641,19 @@ def _download_manifest_entries_parallel(
         include_columns=include_columns,
         file_reader_kwargs_provider=file_reader_kwargs_provider,
     )
-    for table in pool.map(downloader, [e for e in manifest.entries]):
-        tables.append(table)
+    tables = []
+    pending_downloads = deque()
+    try:
+        for entry in manifest.entries:
+            if len(pending_downloads) >= max_parallelism:
+                tables.append(pending_downloads.popleft().result())
+            pending_downloads.append(executor.submit(downloader, entry))
+        while pending_downloads:
+            tables.append(pending_downloads.popleft().result())
+    except BaseException:
+        for pending_download in pending_downloads:
+            pending_download.cancel()
+        raise
     return tables
 
 
@@ -2,6 +2,9 @@ from deltacat.compute.compactor.model.delta_annotated import DeltaAnnotated
 from deltacat.compute.compactor.model.delta_file_envelope import DeltaFileEnvelope
 from deltacat.compute.compactor.model.delta_file_locator import DeltaFileLocator
 from deltacat.compute.compactor.model.materialize_result import MaterializeResult
+from deltacat.compute.compactor.model.primary_key_digest_algorithm import (
+    PrimaryKeyDigestAlgorithm,
+)
 from deltacat.compute.compactor.model.primary_key_index import (
     PrimaryKeyIndexLocator,
     PrimaryKeyIndexMeta,
@@ -9,6 +12,7 @@ from deltacat.compute.compactor.model.primary_key_index import (
     PrimaryKeyIndexVersionMeta,
 )
 from deltacat.compute.compactor.model.pyarrow_write_result import PyArrowWriteResult
+from deltacat.compute.compactor.model.record_index_ranges import RecordIndexRanges
 from deltacat.compute.compactor.model.round_completion_info import (
     RoundCompletionInfo,
     HighWatermark,
@@ -20,11 +24,13 @@ __all__ = [
     "DeltaFileEnvelope",
     "DeltaFileLocator",
     "MaterializeResult",
+    "PrimaryKeyDigestAlgorithm",
     "PrimaryKeyIndexLocator",
     "PrimaryKeyIndexMeta",
     "PrimaryKeyIndexVersionLocator",
     "PrimaryKeyIndexVersionMeta",
     "PyArrowWriteResult",
+    "RecordIndexRanges",
     "RoundCompletionInfo",
     "HighWatermark",
     "SortKey",
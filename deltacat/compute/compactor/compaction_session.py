@@ -3,13 +3,22 @@ from contextlib import nullcontext
 import functools
 import logging
 import ray
+from ray.types import ObjectRef
 import time
 import json
 from deltacat.aws import s3u as s3_utils
 import deltacat
 from deltacat import logs
+import numpy as np
 import pyarrow as pa
+import pyarrow.compute as pc
 from deltacat.compute.compactor import (
+    DeltaAnnotated,
+    HighWatermark,
+    PrimaryKeyDigestAlgorithm,
+    PrimaryKeyIndexMeta,
+    PrimaryKeyIndexVersionLocator,
+    PrimaryKeyIndexVersionMeta,
     PyArrowWriteResult,
     RoundCompletionInfo,
     SortKey,
@@ -17,10 +26,17 @@ from deltacat.compute.compactor import (
 from deltacat.compute.compactor.model.dedupe_result import DedupeResult
 from deltacat.compute.compactor.model.hash_bucket_result import HashBucketResult
 from deltacat.compute.compactor.model.materialize_result import MaterializeResult
+from deltacat.compute.compactor.model.pre_dedupe_result import PreDedupeResult
+from deltacat.compute.compactor.model.primary_key_index_hash_bucket import (
+    PrimaryKeyIndexHashBucket,
+)
 from deltacat.compute.stats.models.delta_stats import DeltaStats
 from deltacat.storage import (
     Delta,
     DeltaLocator,
+    DeltaType,
+    Manifest,
+    ManifestEntry,
     Partition,
     PartitionLocator,
     interface as unimplemented_deltacat_storage,
@@ -34,15 +50,26 @@ from deltacat.utils.ray_utils.concurrency import (
 )
 from deltacat.utils.common import ReadKwargsProvider
 from deltacat.utils.ray_utils.runtime import live_node_resource_keys
+from deltacat.compute.compactor.steps import apply_deletes as ad
 from deltacat.compute.compactor.steps import dedupe as dd
 from deltacat.compute.compactor.steps import hash_bucket as hb
 from deltacat.compute.compactor.steps import materialize as mat
 from deltacat.compute.compactor.utils import io
+from deltacat.compute.compactor.utils import materialize_planner as mp
+from deltacat.compute.compactor.utils import primary_key_bloom_filter as pbf
+from deltacat.compute.compactor.utils import primary_key_index as pki
+from deltacat.compute.compactor.utils import resource_planner as rp
 from deltacat.compute.compactor.utils import round_completion_file as rcf
+from deltacat.compute.compactor.utils import system_columns as sc
+from deltacat.compute.compactor.utils.primary_key_hash import hash_primary_keys
 
-from deltacat.types.media import ContentType
+from deltacat.constants import (
+    PRIMARY_KEY_BLOOM_FILTER_BITS_PER_KEY,
+    PRIMARY_KEY_INDEX_ALGORITHM_VERSION,
+)
+from deltacat.types.media import ContentType, StorageType
 from deltacat.utils.placement import PlacementGroupConfig
-from typing import List, Set, Optional, Tuple, Dict, Any
+from typing import Callable, List, Set, Optional, Tuple, Dict, Any
 from collections import defaultdict
 from deltacat.utils.metrics import MetricsConfig
 from deltacat.compute.compactor.model.compaction_session_audit_info import (
@@ -112,6 +139,17 @@ def compact_partition(
     list_deltas_kwargs: Optional[Dict[str, Any]] = None,
     read_kwargs_provider: Optional[ReadKwargsProvider] = None,
     s3_table_writer_kwargs: Optional[Dict[str, Any]] = None,
+    enable_streaming_scheduler: bool = False,
+    enable_materialize_balancing: bool = False,
+    enable_streaming_hash_bucket: bool = False,
+    hash_bucket_prefetch_depth: int = 0,
+    enable_row_group_split: bool = False,
+    enable_resource_planner: bool = False,
+    enable_primary_key_index: bool = False,
+    enable_bloom_filter_pruning: bool = False,
+    enable_delete_only_fast_path: bool = False,
+    primary_key_digest_algorithm: PrimaryKeyDigestAlgorithm = PrimaryKeyDigestAlgorithm.SHA1,
+    enable_dedupe_spill: bool = False,
     deltacat_storage=unimplemented_deltacat_storage,
     **kwargs,
 ) -> Optional[str]:
@@ -125,53 +163,84 @@ def compact_partition(
     with memray.Tracker(
         f"compaction_partition.bin"
     ) if enable_profiler else nullcontext():
-        partition = None
-        (
-            new_partition,
-            new_rci,
-            new_rcf_partition_locator,
-        ) = _execute_compaction_round(
-            source_partition_locator,
-            destination_partition_locator,
-            primary_keys,
-            compaction_artifact_s3_bucket,
-            last_stream_position_to_compact,
-            hash_bucket_count,
-            sort_keys,
-            records_per_compacted_file,
-            input_deltas_stats,
-            min_hash_bucket_chunk_size,
-            compacted_file_content_type,
-            pg_config,
-            schema_on_read,
-            rebase_source_partition_locator,
-            rebase_source_partition_high_watermark,
-            enable_profiler,
-            metrics_config,
-            list_deltas_kwargs,
-            read_kwargs_provider,
-            s3_table_writer_kwargs,
-            deltacat_storage,
-            **kwargs,
-        )
-        if new_partition:
-            partition = new_partition
-
-        logger.info(
-            f"Partition-{source_partition_locator.partition_values}-> Compaction session data processing completed"
-        )
         round_completion_file_s3_url = None
-        if partition:
-            logger.info(f"Committing compacted partition to: {partition.locator}")
-            partition = deltacat_storage.commit_partition(partition)
-            logger.info(f"Committed compacted partition: {partition}")
-
-            round_completion_file_s3_url = rcf.write_round_completion_file(
-                compaction_artifact_s3_bucket,
-                new_rcf_partition_locator,
+        round_count = 0
+        require_multiple_rounds = True
+        while require_multiple_rounds:
+            partition = None
+            (
+                new_partition,
                 new_rci,
+                new_rcf_partition_locator,
+                require_multiple_rounds,
+            ) = _execute_compaction_round(
+                source_partition_locator,
+                destination_partition_locator,
+                primary_keys,
+                compaction_artifact_s3_bucket,
+                last_stream_position_to_compact,
+                hash_bucket_count,
+                sort_keys,
+                records_per_compacted_file,
+                input_deltas_stats,
+                min_hash_bucket_chunk_size,
+                compacted_file_content_type,
+                pg_config,
+                schema_on_read,
+                rebase_source_partition_locator,
+                rebase_source_partition_high_watermark,
+                enable_profiler,
+                metrics_config,
+                list_deltas_kwargs,
+                read_kwargs_provider,
+                s3_table_writer_kwargs,
+                enable_streaming_scheduler,
+                enable_materialize_balancing,
+                enable_streaming_hash_bucket,
+                hash_bucket_prefetch_depth,
+                enable_row_group_split,
+                enable_resource_planner,
+                enable_primary_key_index,
+                enable_bloom_filter_pruning,
+                enable_delete_only_fast_path,
+                primary_key_digest_algorithm,
+                enable_dedupe_spill,
+                deltacat_storage,
+                **kwargs,
+            )
+            round_count += 1
+            if new_partition:
+                partition = new_partition
+
+            logger.info(
+                f"Partition-{source_partition_locator.partition_values}-> Compaction round {round_count} data processing completed"
             )
-        logger.info(f"Completed compaction session for: {source_partition_locator}")
+            if partition:
+                logger.info(f"Committing compacted partition to: {partition.locator}")
+                partition = deltacat_storage.commit_partition(partition)
+                logger.info(f"Committed compacted partition: {partition}")
+
+                round_completion_file_s3_url = rcf.write_round_completion_file(
+                    compaction_artifact_s3_bucket,
+                    new_rcf_partition_locator,
+                    new_rci,
+                )
+            if require_multiple_rounds:
+                # resume from the round completion file written by this round
+                # by running the remaining rounds as incremental compactions
+                # of the rebase source (if any) into the destination
+                logger.info(
+                    f"Input deltas up to {new_rci.high_watermark} compacted in "
+                    f"round {round_count}, starting the next round..."
+                )
+                if rebase_source_partition_locator:
+                    source_partition_locator = rebase_source_partition_locator
+                    rebase_source_partition_locator = None
+                    rebase_source_partition_high_watermark = None
+        logger.info(
+            f"Completed compaction session for: {source_partition_locator} "
+            f"in {round_count} round(s)"
+        )
         return round_completion_file_s3_url
 
 
@@ -196,9 +265,20 @@ def _execute_compaction_round(
     list_deltas_kwargs: Optional[Dict[str, Any]],
     read_kwargs_provider: Optional[ReadKwargsProvider],
     s3_table_writer_kwargs: Optional[Dict[str, Any]],
+    enable_streaming_scheduler: bool,
+    enable_materialize_balancing: bool,
+    enable_streaming_hash_bucket: bool,
+    hash_bucket_prefetch_depth: int,
+    enable_row_group_split: bool,
+    enable_resource_planner: bool,
+    enable_primary_key_index: bool,
+    enable_bloom_filter_pruning: bool,
+    enable_delete_only_fast_path: bool,
+    primary_key_digest_algorithm: PrimaryKeyDigestAlgorithm,
+    enable_dedupe_spill: bool,
     deltacat_storage=unimplemented_deltacat_storage,
     **kwargs,
-) -> Tuple[Optional[Partition], Optional[RoundCompletionInfo], Optional[str]]:
+) -> Tuple[Optional[Partition], Optional[RoundCompletionInfo], Optional[str], bool]:
 
     rcf_source_partition_locator = (
         rebase_source_partition_locator
@@ -287,6 +367,46 @@ def _execute_compaction_round(
             )
         logger.info(f"Round completion file: {round_completion_info}")
 
+    # primary key digests of different algorithms can't be compared, so
+    # discard all digest-based artifacts of the previous round (i.e. its
+    # primary key index and Bloom filters) to rehash all compacted records
+    primary_key_digest_algorithm = PrimaryKeyDigestAlgorithm(
+        primary_key_digest_algorithm
+    )
+    if (
+        round_completion_info
+        and round_completion_info.primary_key_digest_algorithm
+        != primary_key_digest_algorithm
+    ):
+        logger.info(
+            f"Primary key digest algorithm changed from "
+            f"{round_completion_info.primary_key_digest_algorithm} to "
+            f"{primary_key_digest_algorithm}. Rehashing all compacted records."
+        )
+        round_completion_info = RoundCompletionInfo.of(
+            round_completion_info.high_watermark,
+            round_completion_info.compacted_delta_locator,
+            round_completion_info.compacted_pyarrow_write_result,
+            round_completion_info.sort_keys_bit_width,
+            round_completion_info.rebase_source_partition_locator,
+            round_completion_info.manifest_entry_copied_by_reference_ratio,
+            round_completion_info.compaction_audit_url,
+            primary_key_digest_algorithm=primary_key_digest_algorithm,
+        )
+
+    # read the audit of the previous compaction round to calibrate the plan
+    previous_audits = []
+    if (
+        enable_resource_planner
+        and round_completion_info
+        and round_completion_info.compaction_audit_url
+    ):
+        previous_audit = _read_compaction_audit(
+            round_completion_info.compaction_audit_url
+        )
+        if previous_audit:
+            previous_audits.append(previous_audit)
+
     # discover input delta files
     # For rebase:
     # Copy the old compacted table to a new destination, plus any new deltas from rebased source
@@ -320,12 +440,84 @@ def _execute_compaction_round(
 
     s3_utils.upload(compaction_audit.audit_url, str(json.dumps(compaction_audit)))
 
+    # delete records from the compacted files directly if all new deltas are
+    # deletes, instead of reading the entire compacted table back in
+    if enable_delete_only_fast_path and round_completion_info:
+        delete_only_round = _execute_delete_only_round(
+            input_deltas,
+            round_completion_info,
+            destination_partition_locator,
+            rcf_source_partition_locator,
+            primary_keys,
+            sort_keys,
+            hash_bucket_count,
+            compaction_artifact_s3_bucket,
+            last_stream_position_to_compact,
+            records_per_compacted_file,
+            compacted_file_content_type,
+            schema_on_read,
+            enable_profiler,
+            metrics_config,
+            read_kwargs_provider,
+            s3_table_writer_kwargs,
+            enable_primary_key_index,
+            enable_bloom_filter_pruning,
+            bit_width_of_sort_keys,
+            max_parallelism,
+            round_robin_opt_provider,
+            compaction_audit,
+            compaction_start,
+            deltacat_storage,
+            **kwargs,
+        )
+        if delete_only_round is not None:
+            return delete_only_round
+
+    # dedupe new deltas against the primary key index of the previous round
+    # instead of reading the entire compacted table back in (if possible)
+    pki_hash_buckets = None
+    compacted_manifest = None
+    if enable_primary_key_index and round_completion_info:
+        (
+            input_deltas,
+            compacted_manifest,
+            pki_hash_buckets,
+        ) = _exclude_indexed_compacted_deltas(
+            input_deltas,
+            round_completion_info,
+            primary_keys,
+            sort_keys,
+            hash_bucket_count,
+            deltacat_storage,
+        )
+        if pki_hash_buckets is not None:
+            hash_bucket_count = len(pki_hash_buckets)
+
     if not input_deltas:
         logger.info("No input deltas found to compact.")
-        return None, None, None
+        return None, None, None, False
+
+    resource_plan = None
+    if enable_resource_planner:
+        resource_plan = rp.plan_compaction_resources(
+            input_deltas,
+            cluster_resources,
+            primary_keys,
+            [sort_key.key_name for sort_key in sort_keys],
+            input_deltas_stats,
+            previous_audits,
+            hash_bucket_count,
+        )
+        hash_bucket_count = resource_plan.hash_bucket_count
+        if not min_hash_bucket_chunk_size:
+            min_hash_bucket_chunk_size = resource_plan.hash_bucket_chunk_size
 
     # limit the input deltas to fit on this cluster and convert them to
     # annotated deltas of equivalent size for easy parallel distribution
+    # (optionally splitting large Parquet files into row group ranges)
+    row_group_metadata_provider = (
+        s3_utils.get_parquet_metadata if enable_row_group_split else None
+    )
 
     (
         uniform_deltas,
@@ -338,6 +530,7 @@ def _execute_compaction_round(
             cluster_resources,
             compaction_audit,
             hash_bucket_count,
+            row_group_metadata_provider=row_group_metadata_provider,
             deltacat_storage=deltacat_storage,
         )
         if input_deltas_stats is None
@@ -348,10 +541,51 @@ def _execute_compaction_round(
             min_hash_bucket_chunk_size,
             compaction_audit=compaction_audit,
             input_deltas_stats=input_deltas_stats,
+            row_group_metadata_provider=row_group_metadata_provider,
+            source_partition_locator=rcf_source_partition_locator,
             deltacat_storage=deltacat_storage,
         )
     )
 
+    # read the Bloom filters of the previously compacted files, and skip
+    # reading any compacted file that contains none of the new primary keys
+    bloom_filter_hash_count = pbf.bloom_filter_hash_count(
+        PRIMARY_KEY_BLOOM_FILTER_BITS_PER_KEY
+    )
+    bloom_filters = {}
+    pruned_compacted_entries = []
+    if (
+        enable_bloom_filter_pruning
+        and round_completion_info
+        and round_completion_info.compacted_file_bloom_filters_url
+    ):
+        bloom_filters = (
+            pbf.read_bloom_filters(
+                round_completion_info.compacted_file_bloom_filters_url,
+                primary_keys,
+                bloom_filter_hash_count,
+            )
+            or {}
+        )
+        if enable_primary_key_index:
+            logger.info(
+                "Skipping Bloom filter pruning of compacted files, since the "
+                "compacted files of each hash bucket must be rewritten together "
+                "with a primary key index."
+            )
+        elif bloom_filters:
+            uniform_deltas, pruned_compacted_entries = _prune_compacted_files(
+                uniform_deltas,
+                round_completion_info,
+                bloom_filters,
+                bloom_filter_hash_count,
+                primary_keys,
+                max_parallelism,
+                round_robin_opt_provider,
+                read_kwargs_provider,
+                deltacat_storage,
+            )
+
     compaction_audit.set_uniform_deltas_created(len(uniform_deltas))
 
     assert hash_bucket_count is not None and hash_bucket_count > 0, (
@@ -369,12 +603,28 @@ def _execute_compaction_round(
             None, dest_delta_locator, None, 0, None
         )
 
+    # the compacted delta of an intermediate round only covers the source
+    # deltas compacted up to this round's high watermark
+    round_last_stream_position = last_stream_position_to_compact
     if require_multiple_rounds:
+        round_last_stream_position = last_stream_position_compacted.get(
+            rcf_source_partition_locator
+        )
         logger.info(
-            f"Compaction can not be completed in one round. Either increase cluster size or decrease input"
+            f"Compaction can not be completed in one round. Compacting input "
+            f"deltas up to stream position {round_last_stream_position} in "
+            f"this round."
         )
-        raise AssertionError(
-            "Multiple rounds are not supported. Please increase the cluster size and run again."
+
+    # spill hash bucket output that doesn't fit in dedupe task memory to disk
+    dedupe_spill_threshold_bytes = None
+    if enable_dedupe_spill:
+        dedupe_spill_threshold_bytes = rp.dedupe_spill_threshold_bytes(
+            cluster_resources
+        )
+        logger.info(
+            f"Dedupe tasks will spill hash bucket output beyond "
+            f"{dedupe_spill_threshold_bytes} bytes to disk."
         )
 
     hb_start = time.monotonic()
@@ -392,15 +642,41 @@ def _execute_compaction_round(
         enable_profiler=enable_profiler,
         metrics_config=metrics_config,
         read_kwargs_provider=read_kwargs_provider,
+        enable_streaming_hash_bucket=enable_streaming_hash_bucket,
+        prefetch_depth=hash_bucket_prefetch_depth,
+        primary_key_digest_algorithm=primary_key_digest_algorithm,
         deltacat_storage=deltacat_storage,
     )
 
     hb_invoke_end = time.monotonic()
 
-    logger.info(f"Getting {len(hb_tasks_pending)} hash bucket results...")
-    hb_results: List[HashBucketResult] = ray.get(hb_tasks_pending)
-    logger.info(f"Got {len(hb_results)} hash bucket results.")
-    hb_end = time.monotonic()
+    num_materialize_buckets = (
+        resource_plan.materialize_bucket_count if resource_plan else max_parallelism
+    )
+    # share the primary key index locations of all hash buckets across tasks
+    pki_hash_buckets_ref = (
+        ray.put(pki_hash_buckets) if pki_hash_buckets is not None else None
+    )
+    if enable_streaming_scheduler:
+        hb_results, hb_end, pre_dedupe_results, dd_tasks_pending = _stream_dedupe(
+            hb_tasks_pending,
+            max_parallelism,
+            round_robin_opt_provider,
+            sort_keys,
+            num_materialize_buckets,
+            enable_profiler,
+            metrics_config,
+            enable_primary_key_index,
+            pki_hash_buckets_ref,
+            compaction_artifact_s3_bucket,
+            dedupe_spill_threshold_bytes,
+        )
+    else:
+        logger.info(f"Getting {len(hb_tasks_pending)} hash bucket results...")
+        hb_results: List[HashBucketResult] = ray.get(hb_tasks_pending)
+        logger.info(f"Got {len(hb_results)} hash bucket results.")
+        hb_end = time.monotonic()
+        pre_dedupe_results = []
     hb_results_retrieved_at = time.time()
 
     telemetry_time_hb = compaction_audit.save_step_stats(
@@ -429,10 +705,6 @@ def _execute_compaction_round(
 
     compaction_audit.set_input_records(total_hb_record_count.item())
 
-    # TODO (pdames): when resources are freed during the last round of hash
-    #  bucketing, start running dedupe tasks that read existing dedupe
-    #  output from S3 then wait for hash bucketing to finish before continuing
-
     # create a new stream for this round
     compacted_stream_locator = destination_partition_locator.stream_locator
     stream = deltacat_storage.get_stream(
@@ -449,29 +721,39 @@ def _execute_compaction_round(
     # parallel step 2:
     # discover records with duplicate primary keys in each hash bucket, and
     # identify the index of records to keep or drop based on sort keys
-    num_materialize_buckets = max_parallelism
     logger.info(f"Materialize Bucket Count: {num_materialize_buckets}")
 
-    dedupe_start = time.monotonic()
-
-    dd_tasks_pending = invoke_parallel(
-        items=all_hash_group_idx_to_obj_id.values(),
-        ray_task=dd.dedupe,
-        max_parallelism=max_parallelism,
-        options_provider=round_robin_opt_provider,
-        kwargs_provider=lambda index, item: {
-            "dedupe_task_index": index,
-            "object_ids": item,
-        },
-        sort_keys=sort_keys,
-        num_materialize_buckets=num_materialize_buckets,
-        enable_profiler=enable_profiler,
-        metrics_config=metrics_config,
-    )
+    if enable_streaming_scheduler:
+        # dedupe tasks were launched as their hash bucket groups completed
+        dedupe_start = hb_end
+    else:
+        dedupe_start = time.monotonic()
+        dd_tasks_pending = invoke_parallel(
+            items=all_hash_group_idx_to_obj_id.values(),
+            ray_task=dd.dedupe,
+            max_parallelism=max_parallelism,
+            options_provider=round_robin_opt_provider,
+            kwargs_provider=lambda index, item: {
+                "dedupe_task_index": index,
+                "object_ids": item,
+            },
+            sort_keys=sort_keys,
+            num_materialize_buckets=num_materialize_buckets,
+            enable_profiler=enable_profiler,
+            metrics_config=metrics_config,
+            materialize_by_hash_bucket=enable_primary_key_index,
+            pki_hash_buckets=pki_hash_buckets_ref,
+            compaction_artifact_s3_bucket=compaction_artifact_s3_bucket,
+            spill_threshold_bytes=dedupe_spill_threshold_bytes,
+        )
 
     dedupe_invoke_end = time.monotonic()
     logger.info(f"Getting {len(dd_tasks_pending)} dedupe results...")
-    dd_results: List[DedupeResult] = ray.get(dd_tasks_pending)
+    dd_results: List[DedupeResult] = (
+        _get_as_completed(dd_tasks_pending)
+        if enable_streaming_scheduler
+        else ray.get(dd_tasks_pending)
+    )
     logger.info(f"Got {len(dd_results)} dedupe results.")
 
     # we use time.time() here because time.monotonic() has no reference point
@@ -480,7 +762,10 @@ def _execute_compaction_round(
     dedupe_results_retrieved_at = time.time()
     dedupe_end = time.monotonic()
 
-    total_dd_record_count = sum([ddr.deduped_record_count for ddr in dd_results])
+    total_dd_record_count = sum(
+        [ddr.deduped_record_count for ddr in dd_results]
+        + [pdr.deduped_record_count for pdr in pre_dedupe_results]
+    )
     logger.info(f"Deduped {total_dd_record_count} records...")
 
     telemetry_time_dd = compaction_audit.save_step_stats(
@@ -493,26 +778,55 @@ def _execute_compaction_round(
 
     compaction_audit.set_records_deduped(total_dd_record_count.item())
 
-    all_mat_buckets_to_obj_id = defaultdict(list)
-    for dd_result in dd_results:
-        for (
-            bucket_idx,
-            dd_task_index_and_object_id_tuple,
-        ) in dd_result.mat_bucket_idx_to_obj_id.items():
-            all_mat_buckets_to_obj_id[bucket_idx].append(
-                dd_task_index_and_object_id_tuple
-            )
-    logger.info(f"Getting {len(dd_tasks_pending)} dedupe result stat(s)...")
-    logger.info(f"Materialize buckets created: " f"{len(all_mat_buckets_to_obj_id)}")
-
-    compaction_audit.set_materialize_buckets(len(all_mat_buckets_to_obj_id))
+    total_pki_record_count = sum(
+        [ddr.primary_key_index_record_count for ddr in dd_results]
+    )
+    if pki_hash_buckets is not None:
+        logger.info(
+            f"Deduped new records against {total_pki_record_count} primary key "
+            f"index records..."
+        )
 
-    # TODO(pdames): when resources are freed during the last round of deduping
-    #  start running materialize tasks that read materialization source file
-    #  tables from S3 then wait for deduping to finish before continuing
+    if enable_materialize_balancing and enable_primary_key_index:
+        logger.warning(
+            "Materialize balancing is not supported with a primary key index, "
+            "since each materialize task must write the files of exactly one "
+            "hash bucket."
+        )
+    if enable_materialize_balancing and not enable_primary_key_index:
+        # balance inputs to materialization tasks to ensure that each task has
+        # an approximately equal amount of input to materialize
+        mat_task_plans = mp.plan_materialize_tasks(
+            dd_results,
+            num_materialize_buckets,
+            mp.delta_file_content_lengths(uniform_deltas, round_completion_info),
+            records_per_compacted_file,
+        )
+        mat_task_inputs = [
+            (mat_task_index, dd_task_idx_and_obj_ids, src_file_record_slices)
+            for mat_task_index, (
+                dd_task_idx_and_obj_ids,
+                src_file_record_slices,
+            ) in enumerate(mat_task_plans)
+        ]
+    else:
+        all_mat_buckets_to_obj_id = defaultdict(list)
+        for dd_result in dd_results:
+            for (
+                bucket_idx,
+                dd_task_index_and_object_id_tuple,
+            ) in dd_result.mat_bucket_idx_to_obj_id.items():
+                all_mat_buckets_to_obj_id[bucket_idx].append(
+                    dd_task_index_and_object_id_tuple
+                )
+        mat_task_inputs = [
+            (bucket_idx, dd_task_idx_and_obj_ids, None)
+            for bucket_idx, dd_task_idx_and_obj_ids in all_mat_buckets_to_obj_id.items()
+        ]
+    logger.info(f"Getting {len(dd_tasks_pending)} dedupe result stat(s)...")
+    logger.info(f"Materialize buckets created: " f"{len(mat_task_inputs)}")
 
-    # TODO(pdames): balance inputs to materialization tasks to ensure that each
-    #  task has an approximately equal amount of input to materialize
+    compaction_audit.set_materialize_buckets(len(mat_task_inputs))
 
     # TODO(pdames): garbage collect hash bucket output since it's no longer
     #  needed
@@ -522,16 +836,32 @@ def _execute_compaction_round(
 
     s3_utils.upload(compaction_audit.audit_url, str(json.dumps(compaction_audit)))
 
+    pki_version_locator = None
+    if enable_primary_key_index:
+        pki_version_locator = PrimaryKeyIndexVersionLocator.generate(
+            PrimaryKeyIndexVersionMeta.of(
+                PrimaryKeyIndexMeta.of(
+                    destination_partition_locator,
+                    primary_keys,
+                    sort_keys,
+                    PRIMARY_KEY_INDEX_ALGORITHM_VERSION,
+                ),
+                hash_bucket_count,
+            )
+        )
+        logger.info(f"Writing primary key index to: {pki_version_locator}")
+
     materialize_start = time.monotonic()
 
     mat_tasks_pending = invoke_parallel(
-        items=all_mat_buckets_to_obj_id.items(),
+        items=mat_task_inputs,
         ray_task=mat.materialize,
         max_parallelism=max_parallelism,
         options_provider=round_robin_opt_provider,
-        kwargs_provider=lambda index, mat_bucket_index_to_obj_id: {
-            "mat_bucket_index": mat_bucket_index_to_obj_id[0],
-            "dedupe_task_idx_and_obj_id_tuples": mat_bucket_index_to_obj_id[1],
+        kwargs_provider=lambda index, mat_task_input: {
+            "mat_bucket_index": mat_task_input[0],
+            "dedupe_task_idx_and_obj_id_tuples": mat_task_input[1],
+            "src_file_record_slices": mat_task_input[2],
         },
         schema=schema_on_read,
         round_completion_info=round_completion_info,
@@ -543,6 +873,15 @@ def _execute_compaction_round(
         metrics_config=metrics_config,
         read_kwargs_provider=read_kwargs_provider,
         s3_table_writer_kwargs=s3_table_writer_kwargs,
+        primary_keys=primary_keys,
+        sort_keys=sort_keys,
+        primary_key_index_version_locator=pki_version_locator,
+        compaction_artifact_s3_bucket=compaction_artifact_s3_bucket,
+        bloom_filter_bits_per_key=PRIMARY_KEY_BLOOM_FILTER_BITS_PER_KEY
+        if enable_bloom_filter_pruning
+        else None,
+        primary_key_digest_algorithm=primary_key_digest_algorithm,
+        enable_row_group_split=enable_row_group_split,
         deltacat_storage=deltacat_storage,
     )
 
@@ -566,23 +905,63 @@ def _execute_compaction_round(
 
     mat_results = sorted(mat_results, key=lambda m: m.task_index)
     deltas = [m.delta for m in mat_results]
+    referenced_write_result = PyArrowWriteResult.union([])
+    hash_bucket_file_counts = None
+    hash_bucket_index_version_root_paths = None
+    if enable_primary_key_index:
+        # order compacted files by hash bucket, and copy the compacted files
+        # of hash buckets without new records by reference
+        (
+            deltas,
+            referenced_write_result,
+            hash_bucket_file_counts,
+            hash_bucket_index_version_root_paths,
+        ) = _merge_hash_bucket_deltas(
+            mat_results,
+            set(
+                hb_idx
+                for ddr in dd_results
+                for hb_idx in ddr.hash_bucket_indices.tolist()
+            ),
+            pki_hash_buckets,
+            compacted_manifest,
+            partition,
+            hash_bucket_count,
+            pki_version_locator,
+        )
+    if pruned_compacted_entries:
+        # copy compacted files without any new primary keys by reference
+        pruned_delta, pruned_write_result = _reference_manifest_entries(
+            pruned_compacted_entries,
+            partition,
+        )
+        deltas.append(pruned_delta)
+        referenced_write_result = PyArrowWriteResult.union(
+            [referenced_write_result, pruned_write_result]
+        )
 
     # Note: An appropriate last stream position must be set
     # to avoid correctness issue.
     merged_delta = Delta.merge_deltas(
         deltas,
-        stream_position=last_stream_position_to_compact,
+        stream_position=round_last_stream_position,
     )
 
+    materialized_record_count = (
+        merged_delta.meta.record_count - referenced_write_result.records
+    )
     record_info_msg = (
         f"Hash bucket records: {total_hb_record_count},"
+        f" Primary key index records: {total_pki_record_count},"
         f" Deduped records: {total_dd_record_count}, "
-        f" Materialized records: {merged_delta.meta.record_count}"
+        f" Materialized records: {materialized_record_count},"
+        f" Referenced records: {referenced_write_result.records}"
     )
     logger.info(record_info_msg)
 
     assert (
-        total_hb_record_count - total_dd_record_count == merged_delta.meta.record_count
+        total_hb_record_count + total_pki_record_count - total_dd_record_count
+        == materialized_record_count
     ), (
         f"Number of hash bucket records minus the number of deduped records"
         f" does not match number of materialized records.\n"
@@ -593,6 +972,18 @@ def _execute_compaction_round(
     )
     logger.info(f"Committed compacted delta: {compacted_delta}")
 
+    compacted_file_bloom_filters_url = None
+    if enable_bloom_filter_pruning:
+        compacted_file_bloom_filters_url = _write_compacted_file_bloom_filters(
+            bloom_filters,
+            mat_results,
+            merged_delta,
+            compaction_artifact_s3_bucket,
+            rcf_source_partition_locator,
+            primary_keys,
+            bloom_filter_hash_count,
+        )
+
     compaction_end = time.monotonic()
     compaction_audit.set_compaction_time_in_seconds(compaction_end - compaction_start)
 
@@ -608,7 +999,7 @@ def _execute_compaction_round(
     )
 
     pyarrow_write_result = PyArrowWriteResult.union(
-        [m.pyarrow_write_result for m in mat_results]
+        [m.pyarrow_write_result for m in mat_results] + [referenced_write_result]
     )
 
     session_peak_memory = get_current_node_peak_memory_usage_in_bytes()
@@ -617,7 +1008,9 @@ def _execute_compaction_round(
     )
 
     compaction_audit.save_round_completion_stats(
-        mat_results, telemetry_time_hb + telemetry_time_dd + telemetry_time_materialize
+        mat_results,
+        telemetry_time_hb + telemetry_time_dd + telemetry_time_materialize,
+        referenced_write_result,
     )
 
     s3_utils.upload(compaction_audit.audit_url, str(json.dumps(compaction_audit)))
@@ -630,6 +1023,11 @@ def _execute_compaction_round(
         last_rebase_source_partition_locator,
         compaction_audit.untouched_file_ratio,
         audit_url,
+        pki_version_locator,
+        hash_bucket_file_counts,
+        hash_bucket_index_version_root_paths,
+        compacted_file_bloom_filters_url,
+        primary_key_digest_algorithm,
     )
 
     logger.info(
@@ -642,7 +1040,800 @@ def _execute_compaction_round(
         partition,
         new_round_completion_info,
         rcf_source_partition_locator,
+        require_multiple_rounds,
+    )
+
+
+def _exclude_indexed_compacted_deltas(
+    input_deltas: List[Delta],
+    round_completion_info: RoundCompletionInfo,
+    primary_keys: List[str],
+    sort_keys: List[SortKey],
+    hash_bucket_count: Optional[int],
+    deltacat_storage=unimplemented_deltacat_storage,
+) -> Tuple[
+    List[Delta], Optional[Manifest], Optional[List[Optional[PrimaryKeyIndexHashBucket]]]
+]:
+    """
+    Removes the previously compacted delta from the given input deltas if the
+    previous round wrote a primary key index that can be used to dedupe the
+    remaining input deltas against. Returns the remaining input deltas, the
+    compacted delta manifest, and the primary key index of each hash bucket.
+    Returns the input deltas unchanged if the primary key index can't be used.
+    """
+    compacted_delta_locator = round_completion_info.compacted_delta_locator
+    if not round_completion_info.primary_key_index_version_locator:
+        logger.info("No primary key index found for the compacted delta.")
+        return input_deltas, None, None
+    compacted_partition = compacted_delta_locator.partition_locator.canonical_string()
+    compacted_deltas = [
+        d
+        for d in input_deltas
+        if d.locator.partition_locator.canonical_string() == compacted_partition
+    ]
+    if (
+        len(compacted_deltas) != 1
+        or compacted_deltas[0].stream_position
+        != compacted_delta_locator.stream_position
+    ):
+        logger.info(
+            f"Expected compacted delta {compacted_delta_locator} in input "
+            f"deltas, but found {len(compacted_deltas)} compacted deltas. "
+            f"Ignoring the primary key index."
+        )
+        return input_deltas, None, None
+    compacted_delta = compacted_deltas[0]
+    compacted_manifest = (
+        compacted_delta.manifest or deltacat_storage.get_delta_manifest(compacted_delta)
+    )
+    pki_hash_buckets = pki.primary_key_index_hash_buckets(
+        round_completion_info,
+        compacted_manifest,
+        primary_keys,
+        sort_keys,
+        hash_bucket_count,
+    )
+    if pki_hash_buckets is None:
+        logger.info("Ignoring the primary key index of the compacted delta.")
+        return input_deltas, None, None
+    logger.info(
+        f"Deduping new deltas against the primary key index of compacted "
+        f"delta {compacted_delta_locator} instead of its "
+        f"{len(compacted_manifest.entries)} files."
+    )
+    return (
+        [d for d in input_deltas if d is not compacted_delta],
+        compacted_manifest,
+        pki_hash_buckets,
+    )
+
+
+def _merge_hash_bucket_deltas(
+    mat_results: List[MaterializeResult],
+    deduped_hash_bucket_indices: Set[int],
+    pki_hash_buckets: Optional[List[Optional[PrimaryKeyIndexHashBucket]]],
+    compacted_manifest: Optional[Manifest],
+    partition: Partition,
+    hash_bucket_count: int,
+    pki_version_locator: PrimaryKeyIndexVersionLocator,
+) -> Tuple[List[Delta], PyArrowWriteResult, List[int], List[Optional[str]]]:
+    """
+    Orders the compacted files written by each materialize task by hash
+    bucket. The compacted files of hash buckets that weren't deduped in this
+    round are copied by reference from the previous compacted delta. Returns
+    the ordered deltas to merge, the write result of all compacted files
+    copied by reference, and the compacted file count and primary key index
+    version root path of each hash bucket.
+    """
+    hb_index_to_mat_result = {m.task_index: m for m in mat_results}
+    deltas = []
+    referenced_entries = []
+    referenced_write_results = []
+    hash_bucket_file_counts = []
+    hash_bucket_index_version_root_paths = []
+    referenced_hash_bucket_count = 0
+
+    def reference_entries():
+        if not referenced_entries:
+            return
+        delta, write_result = _reference_manifest_entries(
+            list(referenced_entries),
+            partition,
+        )
+        deltas.append(delta)
+        referenced_write_results.append(write_result)
+        referenced_entries.clear()
+
+    for hb_index in range(hash_bucket_count):
+        mat_result = hb_index_to_mat_result.get(hb_index)
+        pki_hash_bucket = pki_hash_buckets[hb_index] if pki_hash_buckets else None
+        if mat_result:
+            reference_entries()
+            deltas.append(mat_result.delta)
+            hash_bucket_file_counts.append(len(mat_result.delta.manifest.entries))
+            hash_bucket_index_version_root_paths.append(
+                pki_version_locator.primary_key_index_version_root_path
+            )
+        elif pki_hash_bucket and hb_index not in deduped_hash_bucket_indices:
+            first_file_index = pki_hash_bucket.first_file_index
+            file_count = len(pki_hash_bucket.file_record_counts)
+            referenced_entries.extend(
+                compacted_manifest.entries[i]
+                for i in range(first_file_index, first_file_index + file_count)
+            )
+            hash_bucket_file_counts.append(file_count)
+            pkiv_locator = pki_hash_bucket.primary_key_index_version_locator
+            hash_bucket_index_version_root_paths.append(
+                pkiv_locator.primary_key_index_version_root_path
+            )
+            referenced_hash_bucket_count += 1
+        else:
+            # empty, or all records deleted in this round
+            hash_bucket_file_counts.append(0)
+            hash_bucket_index_version_root_paths.append(None)
+    reference_entries()
+    referenced_write_result = PyArrowWriteResult.union(referenced_write_results)
+    logger.info(
+        f"Copied {referenced_write_result.files} compacted files of "
+        f"{referenced_hash_bucket_count} hash buckets without new records by "
+        f"reference."
+    )
+    return (
+        deltas,
+        referenced_write_result,
+        hash_bucket_file_counts,
+        hash_bucket_index_version_root_paths,
+    )
+
+
+def _write_compacted_file_bloom_filters(
+    previous_bloom_filters: Dict[str, np.ndarray],
+    mat_results: List[MaterializeResult],
+    merged_delta: Delta,
+    compaction_artifact_s3_bucket: str,
+    rcf_source_partition_locator: PartitionLocator,
+    primary_keys: List[str],
+    bloom_filter_hash_count: int,
+) -> str:
+    """
+    Writes the Bloom filter of each file of the given merged compacted delta
+    to the compaction artifact S3 bucket, and returns their S3 URL. Files
+    copied by reference keep their Bloom filter from the previous round.
+    """
+    bloom_filters = dict(previous_bloom_filters)
+    for mat_result in mat_results:
+        bloom_filters.update(mat_result.bloom_filters or {})
+    bloom_filters_url = pbf.get_bloom_filters_s3_url(
+        compaction_artifact_s3_bucket,
+        rcf_source_partition_locator,
+    )
+    pbf.write_bloom_filters(
+        bloom_filters_url,
+        {
+            entry.uri: bloom_filters[entry.uri]
+            for entry in merged_delta.manifest.entries
+            if entry.uri in bloom_filters
+        },
+        primary_keys,
+        bloom_filter_hash_count,
+    )
+    return bloom_filters_url
+
+
+def _reference_manifest_entries(
+    entries: List[ManifestEntry],
+    partition: Partition,
+) -> Tuple[Delta, PyArrowWriteResult]:
+    """
+    Stages a delta that copies the given compacted files into the given
+    partition by reference. Returns the delta and its write result.
+    """
+    manifest = Manifest.of(entries)
+    delta = Delta.of(
+        DeltaLocator.of(partition.locator),
+        DeltaType.UPSERT,
+        manifest.meta,
+        None,
+        manifest,
+        partition.stream_position,
+    )
+    write_result = PyArrowWriteResult.of(
+        len(entries),
+        manifest.meta.source_content_length or 0,
+        manifest.meta.content_length,
+        manifest.meta.record_count,
+    )
+    return delta, write_result
+
+
+def _prune_compacted_files(
+    uniform_deltas: List[DeltaAnnotated],
+    round_completion_info: RoundCompletionInfo,
+    bloom_filters: Dict[str, np.ndarray],
+    bloom_filter_hash_count: int,
+    primary_keys: List[str],
+    max_parallelism: int,
+    options_provider: Callable[[int, Any], Dict[str, Any]],
+    read_kwargs_provider: Optional[ReadKwargsProvider],
+    deltacat_storage=unimplemented_deltacat_storage,
+) -> Tuple[List[DeltaAnnotated], List[ManifestEntry]]:
+    """
+    Tests the primary keys of all new uniform deltas against the Bloom filter
+    of each previously compacted file, and removes the compacted files that
+    provably contain none of the new primary keys from the uniform deltas.
+    Returns the remaining uniform deltas and the manifest entries of the
+    compacted files removed.
+    """
+    compacted_delta_locator = round_completion_info.compacted_delta_locator
+    compacted_partition_locator = compacted_delta_locator.partition_locator
+    compacted_uniform_deltas = [
+        d
+        for d in uniform_deltas
+        if d.locator.partition_locator == compacted_partition_locator
+    ]
+    new_uniform_deltas = [
+        d
+        for d in uniform_deltas
+        if d.locator.partition_locator != compacted_partition_locator
+    ]
+    if not compacted_uniform_deltas or not new_uniform_deltas:
+        return uniform_deltas, []
+    if any(
+        d.stream_position != compacted_delta_locator.stream_position
+        for d in compacted_uniform_deltas
+    ):
+        logger.info(
+            f"Expected only compacted delta {compacted_delta_locator} in the "
+            f"compacted partition. Skipping Bloom filter pruning."
+        )
+        return uniform_deltas, []
+    compacted_manifest = deltacat_storage.get_delta_manifest(compacted_delta_locator)
+    compacted_entries = compacted_manifest.entries
+    file_bloom_filters = ray.put(
+        [
+            bloom_filters.get(compacted_entries[i].uri)
+            for i in range(len(compacted_entries))
+        ]
+    )
+    probe_tasks_pending = invoke_parallel(
+        items=new_uniform_deltas,
+        ray_task=hb.probe_bloom_filters,
+        max_parallelism=max_parallelism,
+        options_provider=options_provider,
+        primary_keys=primary_keys,
+        bloom_filters=file_bloom_filters,
+        hash_count=bloom_filter_hash_count,
+        read_kwargs_provider=read_kwargs_provider,
+        primary_key_digest_algorithm=round_completion_info.primary_key_digest_algorithm,
+        deltacat_storage=deltacat_storage,
+    )
+    file_hits = np.logical_or.reduce(ray.get(probe_tasks_pending))
+    hit_file_indices = set(np.flatnonzero(file_hits).tolist())
+    pruned_file_indices = sorted(
+        set(
+            annotation.annotation_file_index
+            for d in compacted_uniform_deltas
+            for annotation in d.annotations
+        )
+        - hit_file_indices
+    )
+    logger.info(
+        f"Pruned {len(pruned_file_indices)} of {len(compacted_entries)} "
+        f"compacted files without any new primary keys."
+    )
+    pruned_uniform_deltas = [
+        DeltaAnnotated.filter_file_indices(d, hit_file_indices)
+        if d.locator.partition_locator == compacted_partition_locator
+        else d
+        for d in uniform_deltas
+    ]
+    return (
+        [d for d in pruned_uniform_deltas if d is not None],
+        [compacted_entries[i] for i in pruned_file_indices],
+    )
+
+
+def _execute_delete_only_round(
+    input_deltas: List[Delta],
+    round_completion_info: RoundCompletionInfo,
+    destination_partition_locator: PartitionLocator,
+    rcf_source_partition_locator: PartitionLocator,
+    primary_keys: List[str],
+    sort_keys: List[SortKey],
+    hash_bucket_count: Optional[int],
+    compaction_artifact_s3_bucket: str,
+    last_stream_position_to_compact: int,
+    records_per_compacted_file: int,
+    compacted_file_content_type: ContentType,
+    schema_on_read: Optional[pa.schema],
+    enable_profiler: Optional[bool],
+    metrics_config: Optional[MetricsConfig],
+    read_kwargs_provider: Optional[ReadKwargsProvider],
+    s3_table_writer_kwargs: Optional[Dict[str, Any]],
+    enable_primary_key_index: bool,
+    enable_bloom_filter_pruning: bool,
+    bit_width_of_sort_keys: int,
+    max_parallelism: int,
+    options_provider: Callable[[int, Any], Dict[str, Any]],
+    compaction_audit: CompactionSessionAuditInfo,
+    compaction_start: float,
+    deltacat_storage=unimplemented_deltacat_storage,
+    **kwargs,
+) -> Optional[Tuple[Partition, RoundCompletionInfo, PartitionLocator, bool]]:
+    """
+    Applies new delete deltas directly to the files of the previously
+    compacted delta. Only the delete deltas' primary keys are read, and only
+    compacted files that may contain a deleted primary key are read and
+    rewritten, while all other compacted files are copied by reference.
+
+    Compacted files that may contain a deleted primary key are found via the
+    primary key index of each hash bucket if it can be used, or else via the
+    Bloom filter of each compacted file if available. Returns None if any new
+    delta isn't a delete or if the table has sort keys (since deletes are
+    then ordered against upserts by sort key), in which case a regular
+    compaction round must run.
+    """
+    if sort_keys:
+        logger.info("Found sort keys. Skipping delete-only compaction.")
+        return None
+    compacted_delta_locator = round_completion_info.compacted_delta_locator
+    compacted_partition_locator = compacted_delta_locator.partition_locator
+    compacted_deltas = [
+        d
+        for d in input_deltas
+        if d.locator.partition_locator == compacted_partition_locator
+    ]
+    delete_deltas = [
+        d
+        for d in input_deltas
+        if d.locator.partition_locator != compacted_partition_locator
+    ]
+    if not delete_deltas or any(d.type != DeltaType.DELETE for d in delete_deltas):
+        logger.info("Found new non-delete deltas. Skipping delete-only compaction.")
+        return None
+    if (
+        len(compacted_deltas) != 1
+        or compacted_deltas[0].stream_position
+        != compacted_delta_locator.stream_position
+    ):
+        logger.info(
+            f"Expected compacted delta {compacted_delta_locator} in input "
+            f"deltas, but found {len(compacted_deltas)} compacted deltas. "
+            f"Skipping delete-only compaction."
+        )
+        return None
+    compacted_delta = compacted_deltas[0]
+    if not compacted_delta.manifest:
+        compacted_manifest = deltacat_storage.get_delta_manifest(compacted_delta)
+        compacted_delta = Delta.of(
+            compacted_delta.locator,
+            compacted_delta.type,
+            compacted_manifest.meta,
+            compacted_delta.properties,
+            compacted_manifest,
+        )
+    compacted_entries = compacted_delta.manifest.entries
+
+    # hash the primary keys of all delete deltas
+    delete_digest_chunks = []
+    for delete_delta in delete_deltas:
+        delete_tables = deltacat_storage.download_delta(
+            delete_delta,
+            max_parallelism=max_parallelism,
+            columns=primary_keys,
+            file_reader_kwargs_provider=read_kwargs_provider,
+            storage_type=StorageType.LOCAL,
+        )
+        for delete_table in delete_tables:
+            delete_digest_chunks.extend(
+                hash_primary_keys(
+                    delete_table,
+                    primary_keys,
+                    round_completion_info.primary_key_digest_algorithm,
+                ).chunks
+            )
+    delete_digests = pc.unique(
+        pa.chunked_array(delete_digest_chunks, sc._PK_HASH_COLUMN_TYPE)
+    )
+    compaction_audit.set_input_records(len(delete_digests))
+    logger.info(
+        f"Deleting {len(delete_digests)} primary keys from "
+        f"{len(compacted_entries)} compacted files..."
+    )
+
+    bloom_filter_hash_count = pbf.bloom_filter_hash_count(
+        PRIMARY_KEY_BLOOM_FILTER_BITS_PER_KEY
+    )
+    bloom_filters = {}
+    if (
+        enable_bloom_filter_pruning
+        and round_completion_info.compacted_file_bloom_filters_url
+    ):
+        bloom_filters = (
+            pbf.read_bloom_filters(
+                round_completion_info.compacted_file_bloom_filters_url,
+                primary_keys,
+                bloom_filter_hash_count,
+            )
+            or {}
+        )
+
+    # find the compacted files that may contain a deleted primary key
+    pki_hash_buckets = None
+    pki_version_locator = None
+    if enable_primary_key_index:
+        pki_hash_buckets = pki.primary_key_index_hash_buckets(
+            round_completion_info,
+            compacted_delta.manifest,
+            primary_keys,
+            sort_keys,
+            hash_bucket_count,
+        )
+    if pki_hash_buckets is not None:
+        hash_bucket_count = len(pki_hash_buckets)
+        delete_hash_buckets = np.unique(
+            pki.pk_digests_to_hash_bucket_indices(
+                sc.digest_bytes_np(delete_digests),
+                hash_bucket_count,
+            )
+        ).tolist()
+        task_inputs = [
+            (
+                hb_index,
+                list(
+                    range(
+                        pki_hash_buckets[hb_index].first_file_index,
+                        pki_hash_buckets[hb_index].first_file_index
+                        + len(pki_hash_buckets[hb_index].file_record_counts),
+                    )
+                ),
+                pki_hash_buckets[hb_index],
+            )
+            for hb_index in delete_hash_buckets
+            if pki_hash_buckets[hb_index]
+        ]
+        pki_version_locator = PrimaryKeyIndexVersionLocator.generate(
+            round_completion_info.primary_key_index_version_locator.primary_key_index_version_meta
+        )
+        logger.info(f"Writing primary key index to: {pki_version_locator}")
+    else:
+        candidate_file_indices = np.arange(len(compacted_entries))
+        if bloom_filters:
+            delete_hashes = pbf.bloom_filter_hashes(sc.digest_bytes_np(delete_digests))
+            candidate_file_indices = [
+                i
+                for i in range(len(compacted_entries))
+                if compacted_entries[i].uri not in bloom_filters
+                or pbf.bloom_filter_may_contain(
+                    bloom_filters[compacted_entries[i].uri],
+                    bloom_filter_hash_count,
+                    delete_hashes,
+                ).any()
+            ]
+        task_inputs = (
+            [
+                (task_index, file_indices.tolist(), None)
+                for task_index, file_indices in enumerate(
+                    np.array_split(
+                        candidate_file_indices,
+                        min(max_parallelism, len(candidate_file_indices)),
+                    )
+                )
+            ]
+            if len(candidate_file_indices)
+            else []
+        )
+    logger.info(
+        f"Found {sum(len(file_indices) for _, file_indices, _ in task_inputs)} "
+        f"compacted files that may contain deleted primary keys."
+    )
+
+    # create a new stream for this round
+    compacted_stream_locator = destination_partition_locator.stream_locator
+    stream = deltacat_storage.get_stream(
+        compacted_stream_locator.namespace,
+        compacted_stream_locator.table_name,
+        compacted_stream_locator.table_version,
+    )
+    partition = deltacat_storage.stage_partition(
+        stream,
+        destination_partition_locator.partition_values,
+    )
+
+    apply_deletes_start = time.monotonic()
+    apply_deletes_tasks_pending = invoke_parallel(
+        items=task_inputs,
+        ray_task=ad.apply_deletes,
+        max_parallelism=max_parallelism,
+        options_provider=options_provider,
+        kwargs_provider=lambda index, task_input: {
+            "task_index": task_input[0],
+            "file_indices": task_input[1],
+            "pki_hash_bucket": task_input[2],
+        },
+        compacted_delta=ray.put(compacted_delta),
+        delete_digests=ray.put(delete_digests),
+        primary_keys=primary_keys,
+        partition=partition,
+        max_records_per_output_file=records_per_compacted_file,
+        compacted_file_content_type=compacted_file_content_type,
+        enable_profiler=enable_profiler,
+        metrics_config=metrics_config,
+        schema=schema_on_read,
+        read_kwargs_provider=read_kwargs_provider,
+        s3_table_writer_kwargs=s3_table_writer_kwargs,
+        primary_key_index_version_locator=pki_version_locator,
+        compaction_artifact_s3_bucket=compaction_artifact_s3_bucket,
+        bloom_filter_bits_per_key=PRIMARY_KEY_BLOOM_FILTER_BITS_PER_KEY
+        if enable_bloom_filter_pruning
+        else None,
+        primary_key_digest_algorithm=round_completion_info.primary_key_digest_algorithm,
+        deltacat_storage=deltacat_storage,
+    )
+    apply_deletes_invoke_end = time.monotonic()
+    logger.info(f"Getting {len(apply_deletes_tasks_pending)} apply deletes results...")
+    mat_results: List[MaterializeResult] = ray.get(apply_deletes_tasks_pending)
+    logger.info(f"Got {len(mat_results)} apply deletes results.")
+    apply_deletes_end = time.monotonic()
+
+    telemetry_time = compaction_audit.save_step_stats(
+        CompactionSessionAuditInfo.MATERIALIZE_STEP_NAME,
+        mat_results,
+        time.time(),
+        apply_deletes_invoke_end - apply_deletes_start,
+        apply_deletes_end - apply_deletes_start,
+    )
+
+    mat_results = sorted(mat_results, key=lambda m: m.task_index)
+    hash_bucket_file_counts = None
+    hash_bucket_index_version_root_paths = None
+    if pki_hash_buckets is not None:
+        # hash buckets without any deleted records keep their files in place
+        mat_results = [
+            m
+            for m in mat_results
+            if m.referenced_pyarrow_write_result.files
+            < len(pki_hash_buckets[m.task_index].file_record_counts)
+        ]
+        (
+            deltas,
+            referenced_write_result,
+            hash_bucket_file_counts,
+            hash_bucket_index_version_root_paths,
+        ) = _merge_hash_bucket_deltas(
+            [m for m in mat_results if m.delta],
+            set(m.task_index for m in mat_results),
+            pki_hash_buckets,
+            compacted_delta.manifest,
+            partition,
+            hash_bucket_count,
+            pki_version_locator,
+        )
+    else:
+        deltas = [m.delta for m in mat_results if m.delta]
+        referenced_write_result = PyArrowWriteResult.union([])
+        candidate_file_indices = set(
+            file_index
+            for _, file_indices, _ in task_inputs
+            for file_index in file_indices
+        )
+        untouched_entries = [
+            compacted_entries[i]
+            for i in range(len(compacted_entries))
+            if i not in candidate_file_indices
+        ]
+        if untouched_entries:
+            untouched_delta, referenced_write_result = _reference_manifest_entries(
+                untouched_entries,
+                partition,
+            )
+            deltas.append(untouched_delta)
+
+    merged_delta = Delta.merge_deltas(
+        deltas,
+        stream_position=last_stream_position_to_compact,
     )
+    deleted_record_count = (
+        compacted_delta.manifest.meta.record_count - merged_delta.meta.record_count
+    )
+    logger.info(f"Deleted {deleted_record_count} records from the compacted delta.")
+    compaction_audit.set_records_deduped(deleted_record_count)
+    compacted_delta = deltacat_storage.commit_delta(
+        merged_delta, properties=kwargs.get("properties", {})
+    )
+    logger.info(f"Committed compacted delta: {compacted_delta}")
+
+    compacted_file_bloom_filters_url = None
+    if enable_bloom_filter_pruning:
+        compacted_file_bloom_filters_url = _write_compacted_file_bloom_filters(
+            bloom_filters,
+            mat_results,
+            merged_delta,
+            compaction_artifact_s3_bucket,
+            rcf_source_partition_locator,
+            primary_keys,
+            bloom_filter_hash_count,
+        )
+
+    compaction_audit.set_compaction_time_in_seconds(time.monotonic() - compaction_start)
+    compaction_audit.save_round_completion_stats(
+        mat_results,
+        telemetry_time,
+        referenced_write_result,
+    )
+    s3_utils.upload(compaction_audit.audit_url, str(json.dumps(compaction_audit)))
+
+    high_watermark = HighWatermark()
+    for delta in input_deltas:
+        high_watermark.set(
+            delta.locator.partition_locator,
+            max(
+                delta.stream_position,
+                high_watermark.get(delta.locator.partition_locator),
+            ),
+        )
+    new_round_completion_info = RoundCompletionInfo.of(
+        high_watermark,
+        DeltaLocator.of(partition.locator, compacted_delta.stream_position),
+        PyArrowWriteResult.union(
+            [m.pyarrow_write_result for m in mat_results] + [referenced_write_result]
+        ),
+        bit_width_of_sort_keys,
+        round_completion_info.rebase_source_partition_locator,
+        compaction_audit.untouched_file_ratio,
+        compaction_audit.audit_url,
+        pki_version_locator,
+        hash_bucket_file_counts,
+        hash_bucket_index_version_root_paths,
+        compacted_file_bloom_filters_url,
+        round_completion_info.primary_key_digest_algorithm,
+    )
+    return partition, new_round_completion_info, rcf_source_partition_locator, False
+
+
+def _read_compaction_audit(audit_url: str) -> Optional[CompactionSessionAuditInfo]:
+    result = s3_utils.download(audit_url, False)
+    if not result:
+        logger.info(f"Compaction audit not found: {audit_url}")
+        return None
+    compaction_audit = CompactionSessionAuditInfo(deltacat.__version__, audit_url)
+    compaction_audit.update(json.loads(result["Body"].read().decode("utf-8")))
+    return compaction_audit
+
+
+def _stream_dedupe(
+    hb_tasks_pending: List[ObjectRef],
+    max_parallelism: int,
+    options_provider: Callable[[int, Any], Dict[str, Any]],
+    sort_keys: List[SortKey],
+    num_materialize_buckets: int,
+    enable_profiler: bool,
+    metrics_config: Optional[MetricsConfig],
+    materialize_by_hash_bucket: bool = False,
+    pki_hash_buckets: Optional[ObjectRef] = None,
+    compaction_artifact_s3_bucket: Optional[str] = None,
+    dedupe_spill_threshold_bytes: Optional[int] = None,
+) -> Tuple[List[HashBucketResult], float, List[PreDedupeResult], List[ObjectRef]]:
+    """
+    Waits for hash bucket tasks to complete one at a time. While hash bucket
+    stragglers leave CPUs idle, runs pre-dedupe tasks over the hash bucket
+    output already produced for each hash bucket group. Every hash bucket task
+    may produce output for every hash bucket group, so each group's dedupe
+    task is launched once all hash bucket tasks and the group's pre-dedupe
+    task (if any) have completed.
+
+    Returns the hash bucket results, the time that hash bucketing completed,
+    the pre-dedupe results, and the pending dedupe tasks.
+    """
+    hash_group_idx_to_obj_ids = defaultdict(list)
+    hb_tasks_pending = list(hb_tasks_pending)
+    hb_results: List[HashBucketResult] = []
+    hb_end = time.monotonic()
+    pre_dedupe_task_to_hash_group_idx: Dict[ObjectRef, int] = {}
+    pre_dedupe_results: List[PreDedupeResult] = []
+    dd_tasks_pending = []
+    logger.info(f"Streaming {len(hb_tasks_pending)} hash bucket results...")
+    while hb_tasks_pending or pre_dedupe_task_to_hash_group_idx:
+        ready, _ = ray.wait(
+            hb_tasks_pending + list(pre_dedupe_task_to_hash_group_idx),
+            num_returns=1,
+        )
+        task = ready[0]
+        if task in pre_dedupe_task_to_hash_group_idx:
+            hash_group_idx = pre_dedupe_task_to_hash_group_idx.pop(task)
+            pre_dedupe_result: PreDedupeResult = ray.get(task)
+            pre_dedupe_results.append(pre_dedupe_result)
+            hash_group_idx_to_obj_ids[hash_group_idx].append(
+                pre_dedupe_result.hash_bucket_group_obj_id
+            )
+        else:
+            hb_tasks_pending.remove(task)
+            hb_result: HashBucketResult = ray.get(task)
+            hb_results.append(hb_result)
+            for hash_group_idx, object_id in enumerate(
+                hb_result.hash_bucket_group_to_obj_id
+            ):
+                if object_id:
+                    hash_group_idx_to_obj_ids[hash_group_idx].append(object_id)
+            if not hb_tasks_pending:
+                hb_end = time.monotonic()
+                logger.info(f"Got {len(hb_results)} hash bucket results.")
+
+        if hb_tasks_pending:
+            idle_cpus = (
+                max_parallelism
+                - len(hb_tasks_pending)
+                - len(pre_dedupe_task_to_hash_group_idx)
+            )
+            pre_deduping_groups = set(pre_dedupe_task_to_hash_group_idx.values())
+            hash_group_indices = sorted(
+                [
+                    hash_group_idx
+                    for hash_group_idx, object_ids in hash_group_idx_to_obj_ids.items()
+                    if len(object_ids) > 1 and hash_group_idx not in pre_deduping_groups
+                ],
+                key=lambda idx: len(hash_group_idx_to_obj_ids[idx]),
+                reverse=True,
+            )[: max(idle_cpus, 0)]
+            for hash_group_idx in hash_group_indices:
+                object_ids = hash_group_idx_to_obj_ids.pop(hash_group_idx)
+                pre_dedupe_task_index = len(pre_dedupe_results) + len(
+                    pre_dedupe_task_to_hash_group_idx
+                )
+                logger.info(
+                    f"Pre-deduping {len(object_ids)} hash bucket outputs of hash "
+                    f"bucket group {hash_group_idx}..."
+                )
+                pre_dedupe_task = dd.pre_dedupe.options(
+                    **options_provider(pre_dedupe_task_index, object_ids)
+                ).remote(
+                    object_ids=object_ids,
+                    sort_keys=sort_keys,
+                    pre_dedupe_task_index=pre_dedupe_task_index,
+                    enable_profiler=enable_profiler,
+                    metrics_config=metrics_config,
+                )
+                pre_dedupe_task_to_hash_group_idx[pre_dedupe_task] = hash_group_idx
+        else:
+            pre_deduping_groups = set(pre_dedupe_task_to_hash_group_idx.values())
+            for hash_group_idx in list(hash_group_idx_to_obj_ids.keys()):
+                if hash_group_idx in pre_deduping_groups:
+                    continue
+                object_ids = hash_group_idx_to_obj_ids.pop(hash_group_idx)
+                dedupe_task_index = len(dd_tasks_pending)
+                dd_tasks_pending.append(
+                    dd.dedupe.options(
+                        **options_provider(dedupe_task_index, object_ids)
+                    ).remote(
+                        object_ids=object_ids,
+                        sort_keys=sort_keys,
+                        num_materialize_buckets=num_materialize_buckets,
+                        dedupe_task_index=dedupe_task_index,
+                        enable_profiler=enable_profiler,
+                        metrics_config=metrics_config,
+                        materialize_by_hash_bucket=materialize_by_hash_bucket,
+                        pki_hash_buckets=pki_hash_buckets,
+                        compaction_artifact_s3_bucket=compaction_artifact_s3_bucket,
+                        spill_threshold_bytes=dedupe_spill_threshold_bytes,
+                    )
+                )
+    logger.info(
+        f"Launched {len(dd_tasks_pending)} dedupe tasks after "
+        f"{len(pre_dedupe_results)} pre-dedupe tasks."
+    )
+    return hb_results, hb_end, pre_dedupe_results, dd_tasks_pending
+
+
+def _get_as_completed(tasks_pending: List[ObjectRef]) -> List[Any]:
+    """
+    Gets the results of the given tasks in the order that they complete.
+    """
+    results = []
+    tasks_pending = list(tasks_pending)
+    while tasks_pending:
+        ready, tasks_pending = ray.wait(tasks_pending, num_returns=1)
+        results.append(ray.get(ready[0]))
+    return results
 
 
 def compact_partition_from_request(
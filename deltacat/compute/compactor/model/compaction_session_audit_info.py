@@ -2,7 +2,7 @@
 from __future__ import annotations
 import logging
 from deltacat import logs
-from typing import List, Union
+from typing import List, Optional, Union
 from deltacat.compute.compactor.model.hash_bucket_result import HashBucketResult
 from deltacat.compute.compactor.model.dedupe_result import DedupeResult
 from deltacat.compute.compactor.model.materialize_result import MaterializeResult
@@ -663,17 +663,27 @@ class CompactionSessionAuditInfo(dict):
         return cluster_util_after_task_latency + telemetry_time
 
     def save_round_completion_stats(
-        self, mat_results: List[MaterializeResult], total_telemetry_time: float
+        self,
+        mat_results: List[MaterializeResult],
+        total_telemetry_time: float,
+        referenced_pyarrow_write_result: Optional[PyArrowWriteResult] = None,
     ) -> None:
         """
         This method saves all the relevant stats after all the steps are completed.
-        """
-        pyarrow_write_result = PyArrowWriteResult.union(
-            [m.pyarrow_write_result for m in mat_results]
-        )
+        Compacted files copied by reference outside of materialize tasks are
+        given by the optional referenced PyArrow write result.
+        """
+        pyarrow_write_results = [m.pyarrow_write_result for m in mat_results]
+        referenced_pyarrow_write_results = [
+            m.referenced_pyarrow_write_result for m in mat_results
+        ]
+        if referenced_pyarrow_write_result:
+            pyarrow_write_results.append(referenced_pyarrow_write_result)
+            referenced_pyarrow_write_results.append(referenced_pyarrow_write_result)
+        pyarrow_write_result = PyArrowWriteResult.union(pyarrow_write_results)
 
         total_count_of_src_dfl_not_touched = sum(
-            m.referenced_pyarrow_write_result.files for m in mat_results
+            rwr.files for rwr in referenced_pyarrow_write_results
         )
 
         logger.info(
@@ -697,10 +707,10 @@ class CompactionSessionAuditInfo(dict):
         )
 
         untouched_file_record_count = sum(
-            m.referenced_pyarrow_write_result.records for m in mat_results
+            rwr.records for rwr in referenced_pyarrow_write_results
         )
         untouched_file_size_bytes = sum(
-            m.referenced_pyarrow_write_result.file_bytes for m in mat_results
+            rwr.file_bytes for rwr in referenced_pyarrow_write_results
         )
 
         self.set_untouched_file_count(total_count_of_src_dfl_not_touched)
@@ -712,13 +722,19 @@ class CompactionSessionAuditInfo(dict):
         self.set_output_size_bytes(pyarrow_write_result.file_bytes)
         self.set_output_size_pyarrow_bytes(pyarrow_write_result.pyarrow_bytes)
 
+        # steps that didn't run in this round have no peak memory usage
         self.set_peak_memory_used_bytes_per_task(
             max(
                 [
-                    self.peak_memory_used_bytes_per_hash_bucket_task,
-                    self.peak_memory_used_bytes_per_dedupe_task,
-                    self.peak_memory_used_bytes_per_materialize_task,
-                ]
+                    peak_memory_used_bytes
+                    for peak_memory_used_bytes in [
+                        self.peak_memory_used_bytes_per_hash_bucket_task,
+                        self.peak_memory_used_bytes_per_dedupe_task,
+                        self.peak_memory_used_bytes_per_materialize_task,
+                    ]
+                    if peak_memory_used_bytes is not None
+                ],
+                default=None,
             )
         )
 
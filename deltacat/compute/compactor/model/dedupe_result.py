@@ -1,11 +1,16 @@
-from typing import Dict, Tuple, NamedTuple
+from typing import Dict, Tuple, NamedTuple, Optional
 
 import numpy as np
 
+from deltacat.compute.compactor.model.delta_file_locator import DeltaFileLocator
+
 
 class DedupeResult(NamedTuple):
     mat_bucket_idx_to_obj_id: Dict[int, Tuple]
+    mat_bucket_idx_to_src_file_record_count: Dict[int, Dict[DeltaFileLocator, int]]
     deduped_record_count: np.int64
     peak_memory_usage_bytes: np.double
     telemetry_time_in_seconds: np.double
     task_completed_at: np.double
+    hash_bucket_indices: Optional[np.ndarray] = None
+    primary_key_index_record_count: np.int64 = np.int64(0)
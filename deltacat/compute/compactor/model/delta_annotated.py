@@ -3,7 +3,9 @@ from __future__ import annotations
 
 import logging
 from types import FunctionType
-from typing import Callable, List, Optional, Union
+from typing import Callable, List, Optional, Set, Tuple, Union
+
+import pyarrow.parquet as papq
 
 from deltacat import logs
 from deltacat.storage import (
@@ -20,9 +22,31 @@ logger = logs.configure_deltacat_logger(logging.getLogger(__name__))
 class DeltaAnnotation(tuple):
     @staticmethod
     def of(
-        file_index: int, delta_type: DeltaType, stream_position: int
+        file_index: int,
+        delta_type: DeltaType,
+        stream_position: int,
+        row_group_range: Optional[Tuple[int, int]] = None,
+        first_record_index: Optional[int] = None,
+        file_record_count: Optional[int] = None,
     ) -> DeltaAnnotation:
-        return DeltaAnnotation((file_index, delta_type, stream_position))
+        """
+        Creates an annotation for a delta manifest entry. If a half-open row
+        group range is given, then the annotation only refers to the records
+        of those Parquet row groups, which start at the given record index of
+        a file with the given total record count.
+        """
+        if row_group_range is None:
+            return DeltaAnnotation((file_index, delta_type, stream_position))
+        return DeltaAnnotation(
+            (
+                file_index,
+                delta_type,
+                stream_position,
+                tuple(row_group_range),
+                first_record_index,
+                file_record_count,
+            )
+        )
 
     @property
     def annotation_file_index(self) -> int:
@@ -36,6 +60,18 @@ class DeltaAnnotation(tuple):
     def annotation_stream_position(self) -> Optional[int]:
         return self[2]
 
+    @property
+    def annotation_row_group_range(self) -> Optional[Tuple[int, int]]:
+        return self[3] if len(self) > 3 else None
+
+    @property
+    def annotation_first_record_index(self) -> int:
+        return self[4] if len(self) > 3 else 0
+
+    @property
+    def annotation_file_record_count(self) -> Optional[int]:
+        return self[5] if len(self) > 3 else None
+
 
 class DeltaAnnotated(Delta):
     @staticmethod
@@ -65,6 +101,9 @@ class DeltaAnnotated(Delta):
         min_delta_bytes: float,
         min_file_counts: Optional[Union[int, float]] = float("inf"),
         estimation_function: Optional[Callable] = None,
+        row_group_metadata_provider: Optional[
+            Callable[[ManifestEntry], Optional[papq.FileMetaData]]
+        ] = None,
     ) -> List[DeltaAnnotated]:
         """
         Simple greedy algorithm to split/merge 1 or more annotated deltas into
@@ -75,6 +114,11 @@ class DeltaAnnotated(Delta):
         manifest entry content length, which is expected to be equal to the number
         of bytes at rest for the associated object. Returns the list of annotated
         delta groups.
+
+        If a row group metadata provider is given, then it's called with each
+        manifest entry larger than `min_delta_bytes`, and any Parquet file
+        metadata that it returns is used to split the entry into row group
+        ranges of about `min_delta_bytes` each.
         """
         groups = []
         new_da = DeltaAnnotated()
@@ -90,50 +134,118 @@ class DeltaAnnotated(Delta):
                 f"delta manifest entries ({len(src_da_entries)}).",
             )
             for i, src_entry in enumerate(src_da_entries):
-                # create a new da group if src and dest has different delta locator
-                # (i.e. the previous compaction round ran a rebase)
-                if new_da and src_da.locator != new_da.locator:
-                    groups.append(new_da)
-                    logger.info(
-                        f"Due to different delta locator, Appending group of {da_group_entry_count} elements "
-                        f"and {new_da_bytes} bytes"
-                    )
-                    new_da = DeltaAnnotated()
-                    new_da_bytes = 0
-                    da_group_entry_count = 0
-                DeltaAnnotated._append_annotated_entry(
-                    src_da, new_da, src_entry, src_da_annotations[i]
-                )
                 # TODO: Fetch s3_obj["Size"] if entry content length undefined?
-                estimated_new_da_bytes = (
+                estimated_entry_bytes = (
                     estimation_function(src_entry.meta.content_length)
                     if type(estimation_function) is FunctionType
                     else src_entry.meta.content_length
                 )
-                new_da_bytes += estimated_new_da_bytes
-                da_group_entry_count += 1
+                annotations_with_bytes = [
+                    (src_da_annotations[i], estimated_entry_bytes)
+                ]
                 if (
-                    new_da_bytes >= min_delta_bytes
-                    or da_group_entry_count >= min_file_counts
+                    row_group_metadata_provider
+                    and estimated_entry_bytes > min_delta_bytes
+                    and src_da_annotations[i].annotation_row_group_range is None
                 ):
-                    if new_da_bytes >= min_delta_bytes:
-                        logger.info(
-                            f"Appending group of {da_group_entry_count} elements "
-                            f"and {new_da_bytes} bytes to meet file size limit"
+                    metadata = row_group_metadata_provider(src_entry)
+                    if metadata is not None:
+                        annotations_with_bytes = DeltaAnnotated._split_by_row_groups(
+                            src_da_annotations[i],
+                            metadata,
+                            estimated_entry_bytes,
+                            min_delta_bytes,
                         )
-                    if da_group_entry_count >= min_file_counts:
+                for annotation, estimated_new_da_bytes in annotations_with_bytes:
+                    # create a new da group if src and dest has different delta locator
+                    # (i.e. the previous compaction round ran a rebase)
+                    if new_da and src_da.locator != new_da.locator:
+                        groups.append(new_da)
                         logger.info(
-                            f"Appending group of {da_group_entry_count} elements "
-                            f"and {da_group_entry_count} files to meet file count limit"
+                            f"Due to different delta locator, Appending group of {da_group_entry_count} elements "
+                            f"and {new_da_bytes} bytes"
                         )
-                    groups.append(new_da)
-                    new_da = DeltaAnnotated()
-                    new_da_bytes = 0
-                    da_group_entry_count = 0
+                        new_da = DeltaAnnotated()
+                        new_da_bytes = 0
+                        da_group_entry_count = 0
+                    DeltaAnnotated._append_annotated_entry(
+                        src_da, new_da, src_entry, annotation
+                    )
+                    new_da_bytes += estimated_new_da_bytes
+                    da_group_entry_count += 1
+                    if (
+                        new_da_bytes >= min_delta_bytes
+                        or da_group_entry_count >= min_file_counts
+                    ):
+                        if new_da_bytes >= min_delta_bytes:
+                            logger.info(
+                                f"Appending group of {da_group_entry_count} elements "
+                                f"and {new_da_bytes} bytes to meet file size limit"
+                            )
+                        if da_group_entry_count >= min_file_counts:
+                            logger.info(
+                                f"Appending group of {da_group_entry_count} elements "
+                                f"and {da_group_entry_count} files to meet file count limit"
+                            )
+                        groups.append(new_da)
+                        new_da = DeltaAnnotated()
+                        new_da_bytes = 0
+                        da_group_entry_count = 0
         if new_da:
             groups.append(new_da)
         return groups
 
+    @staticmethod
+    def _split_by_row_groups(
+        annotation: DeltaAnnotation,
+        metadata: papq.FileMetaData,
+        estimated_entry_bytes: float,
+        min_delta_bytes: float,
+    ) -> List[Tuple[DeltaAnnotation, float]]:
+        # estimate the bytes of each row group from its share of the
+        # compressed column chunk bytes in the file
+        row_group_bytes = [
+            sum(
+                metadata.row_group(rg).column(col).total_compressed_size
+                for col in range(metadata.num_columns)
+            )
+            for rg in range(metadata.num_row_groups)
+        ]
+        total_row_group_bytes = sum(row_group_bytes)
+        if metadata.num_row_groups <= 1 or not total_row_group_bytes:
+            return [(annotation, estimated_entry_bytes)]
+        annotations_with_bytes = []
+        first_row_group = 0
+        first_record_index = 0
+        record_index = 0
+        piece_bytes = 0
+        for rg in range(metadata.num_row_groups):
+            piece_bytes += (
+                estimated_entry_bytes * row_group_bytes[rg] / total_row_group_bytes
+            )
+            record_index += metadata.row_group(rg).num_rows
+            if piece_bytes >= min_delta_bytes or rg == metadata.num_row_groups - 1:
+                row_group_annotation = DeltaAnnotation.of(
+                    annotation.annotation_file_index,
+                    annotation.annotation_delta_type,
+                    annotation.annotation_stream_position,
+                    (first_row_group, rg + 1),
+                    first_record_index,
+                    metadata.num_rows,
+                )
+                annotations_with_bytes.append((row_group_annotation, piece_bytes))
+                first_row_group = rg + 1
+                first_record_index = record_index
+                piece_bytes = 0
+        if len(annotations_with_bytes) == 1:
+            return [(annotation, estimated_entry_bytes)]
+        logger.info(
+            f"Splitting manifest entry {annotation.annotation_file_index} of "
+            f"{estimated_entry_bytes} bytes into {len(annotations_with_bytes)} "
+            f"row group ranges."
+        )
+        return annotations_with_bytes
+
     @staticmethod
     def split(src_da: DeltaAnnotated, pieces: int) -> List[DeltaAnnotated]:
         groups = []
@@ -174,6 +286,24 @@ class DeltaAnnotated(Delta):
             groups.append(new_da)
         return groups
 
+    @staticmethod
+    def filter_file_indices(
+        src_da: DeltaAnnotated, file_indices: Set[int]
+    ) -> Optional[DeltaAnnotated]:
+        """
+        Returns a copy of the given annotated delta with only the manifest
+        entries annotated with one of the given file indices, or None if no
+        manifest entries remain.
+        """
+        new_da = DeltaAnnotated()
+        src_da_entries = src_da.manifest.entries
+        for i, annotation in enumerate(src_da.annotations):
+            if annotation.annotation_file_index in file_indices:
+                DeltaAnnotated._append_annotated_entry(
+                    src_da, new_da, src_da_entries[i], annotation
+                )
+        return new_da if new_da else None
+
     @property
     def annotations(self) -> List[DeltaAnnotation]:
         return self["annotations"]
@@ -18,6 +18,7 @@ class MaterializeResult(dict):
         peak_memory_usage_bytes: Optional[np.double] = None,
         telemetry_time_in_seconds: Optional[np.double] = None,
         task_completed_at: Optional[np.double] = None,
+        bloom_filters: Optional[Dict[str, np.ndarray]] = None,
     ) -> MaterializeResult:
         materialize_result = MaterializeResult()
         materialize_result["delta"] = delta
@@ -27,6 +28,7 @@ class MaterializeResult(dict):
         materialize_result["peakMemoryUsageBytes"] = peak_memory_usage_bytes
         materialize_result["telemetryTimeInSeconds"] = telemetry_time_in_seconds
         materialize_result["taskCompletedAt"] = task_completed_at
+        materialize_result["bloomFilters"] = bloom_filters
         return materialize_result
 
     @property
@@ -70,3 +72,11 @@ class MaterializeResult(dict):
     @property
     def task_completed_at(self) -> Optional[np.double]:
         return self["taskCompletedAt"]
+
+    @property
+    def bloom_filters(self) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Primary key Bloom filter of each compacted file written, keyed by
+        compacted file URI.
+        """
+        return self.get("bloomFilters")
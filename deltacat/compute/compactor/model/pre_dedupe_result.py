@@ -0,0 +1,11 @@
+from typing import NamedTuple
+
+import numpy as np
+
+
+class PreDedupeResult(NamedTuple):
+    hash_bucket_group_obj_id: bytes
+    deduped_record_count: np.int64
+    peak_memory_usage_bytes: np.double
+    telemetry_time_in_seconds: np.double
+    task_completed_at: np.double
@@ -0,0 +1,16 @@
+from enum import Enum
+
+
+class PrimaryKeyDigestAlgorithm(str, Enum):
+    """
+    Algorithm used to digest the primary key values of each record into the
+    20-byte digest used to bucket and dedupe records. Values are versioned,
+    and must change whenever the digest of any primary key would change, since
+    the digests of different algorithms can't be compared.
+    """
+
+    # SHA1 digest of the joined primary key strings (cryptographic)
+    SHA1 = "sha1_v1"
+    # vectorized 128-bit MurmurHash3 (x64 variant) of the joined primary key
+    # strings (non-cryptographic)
+    MURMUR3_X64_128 = "murmur3_x64_128_v1"
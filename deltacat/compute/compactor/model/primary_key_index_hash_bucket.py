@@ -0,0 +1,18 @@
+from typing import List, NamedTuple
+
+from deltacat.compute.compactor.model.primary_key_index import (
+    PrimaryKeyIndexVersionLocator,
+)
+
+
+class PrimaryKeyIndexHashBucket(NamedTuple):
+    """
+    Locates the primary key index of a single hash bucket of a compacted
+    delta whose files are aligned by hash bucket, along with the compacted
+    files that hold the hash bucket's records.
+    """
+
+    primary_key_index_version_locator: PrimaryKeyIndexVersionLocator
+    compacted_stream_position: int
+    first_file_index: int
+    file_record_counts: List[int]
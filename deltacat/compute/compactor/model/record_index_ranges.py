@@ -0,0 +1,63 @@
+# Allow classes to use self-referencing Type hints in Python 3.7.
+from __future__ import annotations
+
+import numpy as np
+
+
+class RecordIndexRanges(tuple):
+    @staticmethod
+    def of(starts: np.ndarray, lengths: np.ndarray) -> RecordIndexRanges:
+        """
+        Create a run-length encoded set of record indices in a single delta
+        file from ascending, non-overlapping ranges of contiguous record
+        indices.
+
+        Args:
+            starts: Ascending int64 array of the first record index of each
+                range.
+
+            lengths: Int64 array of the number of records in each range.
+
+        Returns:
+            record_index_ranges: The Record Index Ranges tuple as
+            (starts, lengths).
+        """
+        return RecordIndexRanges((starts, lengths))
+
+    @staticmethod
+    def of_record_indices(record_indices: np.ndarray) -> RecordIndexRanges:
+        """
+        Create a run-length encoded set of record indices from an ascending
+        array of unique record indices.
+        """
+        record_indices = np.asarray(record_indices, dtype=np.int64)
+        is_range_start = np.ones(len(record_indices), dtype=bool)
+        is_range_start[1:] = record_indices[1:] != record_indices[:-1] + 1
+        range_starts = np.flatnonzero(is_range_start)
+        return RecordIndexRanges.of(
+            record_indices[range_starts],
+            np.diff(np.append(range_starts, len(record_indices))),
+        )
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self[0]
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return self[1]
+
+    @property
+    def record_count(self) -> int:
+        return int(self.lengths.sum())
+
+    def record_indices(self) -> np.ndarray:
+        """
+        Returns an ascending int64 array of all record indices in these
+        ranges.
+        """
+        range_offsets = np.repeat(
+            self.starts - (np.cumsum(self.lengths) - self.lengths),
+            self.lengths,
+        )
+        return np.arange(self.record_count, dtype=np.int64) + range_offsets
@@ -6,7 +6,13 @@ from deltacat.compute.compactor.model.pyarrow_write_result import PyArrowWriteRe
 from deltacat.compute.compactor.model.compaction_session_audit_info import (
     CompactionSessionAuditInfo,
 )
-from typing import Any, Dict, Optional
+from deltacat.compute.compactor.model.primary_key_digest_algorithm import (
+    PrimaryKeyDigestAlgorithm,
+)
+from deltacat.compute.compactor.model.primary_key_index import (
+    PrimaryKeyIndexVersionLocator,
+)
+from typing import Any, Dict, List, Optional
 
 
 class HighWatermark(dict):
@@ -43,6 +49,13 @@ class RoundCompletionInfo(dict):
         rebase_source_partition_locator: Optional[PartitionLocator],
         manifest_entry_copied_by_reference_ratio: Optional[float] = None,
         compaction_audit_url: Optional[str] = None,
+        primary_key_index_version_locator: Optional[
+            PrimaryKeyIndexVersionLocator
+        ] = None,
+        hash_bucket_file_counts: Optional[List[int]] = None,
+        hash_bucket_index_version_root_paths: Optional[List[Optional[str]]] = None,
+        compacted_file_bloom_filters_url: Optional[str] = None,
+        primary_key_digest_algorithm: Optional[PrimaryKeyDigestAlgorithm] = None,
     ) -> RoundCompletionInfo:
 
         rci = RoundCompletionInfo()
@@ -55,6 +68,15 @@ class RoundCompletionInfo(dict):
             "manifestEntryCopiedByReferenceRatio"
         ] = manifest_entry_copied_by_reference_ratio
         rci["compactionAuditUrl"] = compaction_audit_url
+        rci["primaryKeyIndexVersionLocator"] = primary_key_index_version_locator
+        rci["hashBucketFileCounts"] = hash_bucket_file_counts
+        rci["hashBucketIndexVersionRootPaths"] = hash_bucket_index_version_root_paths
+        rci["compactedFileBloomFiltersUrl"] = compacted_file_bloom_filters_url
+        rci["primaryKeyDigestAlgorithm"] = (
+            PrimaryKeyDigestAlgorithm(primary_key_digest_algorithm).value
+            if primary_key_digest_algorithm
+            else None
+        )
         return rci
 
     @property
@@ -90,6 +112,10 @@ class RoundCompletionInfo(dict):
     def compaction_audit(self) -> Optional[CompactionSessionAuditInfo]:
         return self.get("compactionAudit")
 
+    @property
+    def compaction_audit_url(self) -> Optional[str]:
+        return self.get("compactionAuditUrl")
+
     @property
     def rebase_source_partition_locator(self) -> Optional[PartitionLocator]:
         return self.get("rebaseSourcePartitionLocator")
@@ -97,3 +123,48 @@ class RoundCompletionInfo(dict):
     @property
     def manifest_entry_copied_by_reference_ratio(self) -> Optional[float]:
         return self["manifestEntryCopiedByReferenceRatio"]
+
+    @property
+    def primary_key_index_version_locator(
+        self,
+    ) -> Optional[PrimaryKeyIndexVersionLocator]:
+        val: Dict[str, Any] = self.get("primaryKeyIndexVersionLocator")
+        if val is not None and not isinstance(val, PrimaryKeyIndexVersionLocator):
+            self["primaryKeyIndexVersionLocator"] = val = PrimaryKeyIndexVersionLocator(
+                val
+            )
+        return val
+
+    @property
+    def hash_bucket_file_counts(self) -> Optional[List[int]]:
+        """
+        Number of compacted files holding the records of each hash bucket, if
+        the compacted delta's files are ordered and aligned by hash bucket.
+        """
+        return self.get("hashBucketFileCounts")
+
+    @property
+    def hash_bucket_index_version_root_paths(self) -> Optional[List[Optional[str]]]:
+        """
+        Root path of the primary key index version holding the primary key
+        index of each hash bucket, or None for empty hash buckets.
+        """
+        return self.get("hashBucketIndexVersionRootPaths")
+
+    @property
+    def compacted_file_bloom_filters_url(self) -> Optional[str]:
+        """
+        S3 URL of the primary key Bloom filters of the compacted delta's
+        files, if any were written.
+        """
+        return self.get("compactedFileBloomFiltersUrl")
+
+    @property
+    def primary_key_digest_algorithm(self) -> PrimaryKeyDigestAlgorithm:
+        """
+        Algorithm used to digest the primary keys of all compacted records.
+        Round completion info written before digest algorithms were recorded
+        always used SHA1.
+        """
+        val: Optional[str] = self.get("primaryKeyDigestAlgorithm")
+        return PrimaryKeyDigestAlgorithm(val or PrimaryKeyDigestAlgorithm.SHA1)
@@ -0,0 +1,395 @@
+import importlib
+import logging
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import ray
+
+from deltacat import logs
+from deltacat.compute.compactor import (
+    MaterializeResult,
+    PrimaryKeyDigestAlgorithm,
+    PrimaryKeyIndexVersionLocator,
+    PyArrowWriteResult,
+)
+from deltacat.compute.compactor.model.primary_key_index_hash_bucket import (
+    PrimaryKeyIndexHashBucket,
+)
+from deltacat.compute.compactor.utils import primary_key_bloom_filter as pbf
+from deltacat.compute.compactor.utils import primary_key_index as pki
+from deltacat.compute.compactor.utils import system_columns as sc
+from deltacat.compute.compactor.utils.primary_key_hash import hash_primary_keys
+from deltacat.constants import RECORDS_PER_PRIMARY_KEY_INDEX_FILE
+from deltacat.storage import (
+    Delta,
+    DeltaLocator,
+    DeltaType,
+    Manifest,
+    ManifestEntry,
+    Partition,
+    interface as unimplemented_deltacat_storage,
+)
+from deltacat.types.media import DELIMITED_TEXT_CONTENT_TYPES, ContentType
+from deltacat.types.tables import TABLE_CLASS_TO_SIZE_FUNC
+from deltacat.utils.common import ReadKwargsProvider
+from deltacat.utils.performance import timed_invocation
+from deltacat.utils.pyarrow import (
+    ReadKwargsProviderPyArrowCsvPureUtf8,
+    ReadKwargsProviderPyArrowSchemaOverride,
+)
+from deltacat.utils.ray_utils.runtime import (
+    get_current_ray_task_id,
+    get_current_ray_worker_id,
+)
+from deltacat.utils.metrics import emit_timer_metrics, MetricsConfig
+from deltacat.utils.resources import get_current_node_peak_memory_usage_in_bytes
+
+if importlib.util.find_spec("memray"):
+    import memray
+
+logger = logs.configure_deltacat_logger(logging.getLogger(__name__))
+
+
+def _replace_column(table: pa.Table, column_name: str, values: np.ndarray) -> pa.Table:
+    column_index = table.schema.get_field_index(column_name)
+    return table.set_column(
+        column_index,
+        table.schema.field(column_index),
+        pa.array(values, table.schema.field(column_index).type),
+    )
+
+
+def _rewrite_primary_key_index(
+    index_table: pa.Table,
+    is_deleted: np.ndarray,
+    file_deleted_record_indices: Dict[int, np.ndarray],
+    removed_file_indices: List[int],
+) -> pa.Table:
+    # drop deleted records from the index, then shift the record index of
+    # each remaining record in a rewritten file down by the number of records
+    # deleted before it, and the file index of each remaining file down by the
+    # number of files removed before it
+    index_table = index_table.filter(pa.array(~is_deleted))
+    file_indices = sc.file_index_column_np(index_table)
+    record_indices = sc.record_index_column_np(index_table).copy()
+    for file_index, deleted_record_indices in file_deleted_record_indices.items():
+        in_file = file_indices == file_index
+        record_indices[in_file] -= np.searchsorted(
+            np.sort(deleted_record_indices),
+            record_indices[in_file],
+        )
+    if removed_file_indices:
+        file_indices = file_indices - np.searchsorted(
+            removed_file_indices,
+            file_indices,
+        )
+    index_table = _replace_column(
+        index_table,
+        sc._ORDERED_FILE_IDX_COLUMN_NAME,
+        file_indices,
+    )
+    return _replace_column(
+        index_table,
+        sc._ORDERED_RECORD_IDX_COLUMN_NAME,
+        record_indices,
+    )
+
+
+def _timed_apply_deletes(
+    task_index: int,
+    compacted_delta: Delta,
+    file_indices: List[int],
+    delete_digests: pa.Array,
+    primary_keys: List[str],
+    partition: Partition,
+    max_records_per_output_file: int,
+    compacted_file_content_type: ContentType,
+    enable_profiler: bool,
+    schema: Optional[pa.Schema] = None,
+    read_kwargs_provider: Optional[ReadKwargsProvider] = None,
+    s3_table_writer_kwargs: Optional[Dict[str, Any]] = None,
+    pki_hash_bucket: Optional[PrimaryKeyIndexHashBucket] = None,
+    primary_key_index_version_locator: Optional[PrimaryKeyIndexVersionLocator] = None,
+    compaction_artifact_s3_bucket: Optional[str] = None,
+    bloom_filter_bits_per_key: Optional[int] = None,
+    primary_key_digest_algorithm: PrimaryKeyDigestAlgorithm = PrimaryKeyDigestAlgorithm.SHA1,
+    deltacat_storage=unimplemented_deltacat_storage,
+) -> MaterializeResult:
+    task_id = get_current_ray_task_id()
+    worker_id = get_current_ray_worker_id()
+    with memray.Tracker(
+        f"apply_deletes_{worker_id}_{task_id}.bin"
+    ) if enable_profiler else nullcontext():
+        if read_kwargs_provider is None:
+            if compacted_file_content_type in DELIMITED_TEXT_CONTENT_TYPES:
+                read_kwargs_provider = ReadKwargsProviderPyArrowCsvPureUtf8()
+            elif schema is not None:
+                read_kwargs_provider = ReadKwargsProviderPyArrowSchemaOverride(
+                    schema=schema
+                )
+        compacted_entries = compacted_delta.manifest.entries
+
+        # find the records to delete from each compacted file using the
+        # primary key index of its hash bucket (if given)
+        index_table = None
+        is_index_record_deleted = None
+        file_deleted_record_indices = None
+        if pki_hash_bucket:
+            index_table = pa.concat_tables(
+                pki.download_hash_bucket_entries(
+                    compaction_artifact_s3_bucket,
+                    task_index,
+                    pki_hash_bucket.primary_key_index_version_locator,
+                )
+            )
+            is_index_record_deleted = pc.is_in(
+                sc.pk_hash_column(index_table),
+                value_set=delete_digests,
+            ).to_numpy()
+            deleted_file_indices = sc.file_index_column_np(index_table)[
+                is_index_record_deleted
+            ]
+            deleted_record_indices = sc.record_index_column_np(index_table)[
+                is_index_record_deleted
+            ]
+            file_deleted_record_indices = {
+                int(file_index): deleted_record_indices[
+                    deleted_file_indices == file_index
+                ]
+                for file_index in np.unique(deleted_file_indices)
+            }
+
+        deltas: List[Delta] = []
+        referenced_entries: List[ManifestEntry] = []
+        write_results: List[PyArrowWriteResult] = []
+        referenced_write_results: List[PyArrowWriteResult] = []
+        bloom_filters: Dict[str, np.ndarray] = {}
+        removed_file_indices: List[int] = []
+        deleted_record_count = 0
+
+        def reference_entries():
+            if not referenced_entries:
+                return
+            manifest = Manifest.of(list(referenced_entries))
+            deltas.append(
+                Delta.of(
+                    DeltaLocator.of(partition.locator),
+                    DeltaType.UPSERT,
+                    manifest.meta,
+                    None,
+                    manifest,
+                    partition.stream_position,
+                )
+            )
+            referenced_write_results.append(
+                PyArrowWriteResult.of(
+                    len(referenced_entries),
+                    manifest.meta.source_content_length or 0,
+                    manifest.meta.content_length,
+                    manifest.meta.record_count,
+                )
+            )
+            referenced_entries.clear()
+
+        first_file_index = pki_hash_bucket.first_file_index if pki_hash_bucket else 0
+        for file_index in file_indices:
+            entry = compacted_entries[file_index]
+            if pki_hash_bucket:
+                deleted_record_indices = file_deleted_record_indices.get(
+                    file_index - first_file_index
+                )
+                keep = None
+                if deleted_record_indices is not None:
+                    keep = np.ones(entry.meta.record_count, dtype=np.bool_)
+                    keep[deleted_record_indices] = False
+            else:
+                # anti-join the primary key digests of the file with the
+                # digests of all deleted primary keys
+                pk_table = deltacat_storage.download_delta_manifest_entry(
+                    compacted_delta,
+                    file_index,
+                    columns=primary_keys,
+                    file_reader_kwargs_provider=read_kwargs_provider,
+                )
+                is_deleted = pc.is_in(
+                    hash_primary_keys(
+                        pk_table,
+                        primary_keys,
+                        primary_key_digest_algorithm,
+                    ),
+                    value_set=delete_digests,
+                ).to_numpy()
+                keep = ~is_deleted if is_deleted.any() else None
+            if keep is None:
+                referenced_entries.append(entry)
+                continue
+            reference_entries()
+            table = deltacat_storage.download_delta_manifest_entry(
+                compacted_delta,
+                file_index,
+                file_reader_kwargs_provider=read_kwargs_provider,
+            ).filter(pa.array(keep))
+            deleted_record_count += entry.meta.record_count - len(table)
+            if not len(table):
+                removed_file_indices.append(file_index - first_file_index)
+                continue
+            digests = (
+                sc.digest_bytes_np(
+                    hash_primary_keys(
+                        table,
+                        primary_keys,
+                        primary_key_digest_algorithm,
+                    )
+                )
+                if bloom_filter_bits_per_key
+                else None
+            )
+            pyarrow_bytes = TABLE_CLASS_TO_SIZE_FUNC[type(table)](table)
+            record_count = len(table)
+            if compacted_file_content_type in DELIMITED_TEXT_CONTENT_TYPES:
+                table = table.to_pandas(split_blocks=True, self_destruct=True)
+            delta = deltacat_storage.stage_delta(
+                table,
+                partition,
+                max_records_per_entry=max_records_per_output_file,
+                content_type=compacted_file_content_type,
+                s3_table_writer_kwargs=s3_table_writer_kwargs,
+            )
+            deltas.append(delta)
+            write_results.append(
+                PyArrowWriteResult.of(
+                    len(delta.manifest.entries),
+                    pyarrow_bytes,
+                    delta.manifest.meta.content_length,
+                    record_count,
+                )
+            )
+            if digests is not None:
+                first_record_index = 0
+                for new_entry in delta.manifest.entries:
+                    new_record_count = new_entry.meta.record_count
+                    bloom_filters[new_entry.uri] = pbf.build_bloom_filter(
+                        digests[
+                            first_record_index : first_record_index + new_record_count
+                        ],
+                        bloom_filter_bits_per_key,
+                    )
+                    first_record_index += new_record_count
+        reference_entries()
+
+        if pki_hash_bucket and (write_results or removed_file_indices):
+            new_index_table = _rewrite_primary_key_index(
+                index_table,
+                is_index_record_deleted,
+                file_deleted_record_indices,
+                removed_file_indices,
+            )
+            if len(new_index_table):
+                pki_write_result = pki.write_primary_key_index_files(
+                    new_index_table,
+                    primary_key_index_version_locator,
+                    compaction_artifact_s3_bucket,
+                    task_index,
+                    RECORDS_PER_PRIMARY_KEY_INDEX_FILE,
+                )
+                logger.info(
+                    f"Rewrote primary key index of hash bucket {task_index}: "
+                    f"{pki_write_result}"
+                )
+
+        logger.info(
+            f"Deleted {deleted_record_count} records from {len(file_indices)} "
+            f"compacted files. Rewrote {len(write_results)} files, removed "
+            f"{len(removed_file_indices)} files, and referenced "
+            f"{sum(rwr.files for rwr in referenced_write_results)} files."
+        )
+        referenced_write_result = PyArrowWriteResult.union(referenced_write_results)
+        peak_memory_usage_bytes = get_current_node_peak_memory_usage_in_bytes()
+        return MaterializeResult.of(
+            Delta.merge_deltas(deltas) if deltas else None,
+            task_index,
+            PyArrowWriteResult.union(write_results + [referenced_write_result]),
+            referenced_write_result,
+            np.double(peak_memory_usage_bytes),
+            np.double(0.0),
+            np.double(time.time()),
+            bloom_filters if bloom_filter_bits_per_key else None,
+        )
+
+
+@ray.remote
+def apply_deletes(
+    task_index: int,
+    compacted_delta: Delta,
+    file_indices: List[int],
+    delete_digests: pa.Array,
+    primary_keys: List[str],
+    partition: Partition,
+    max_records_per_output_file: int,
+    compacted_file_content_type: ContentType,
+    enable_profiler: bool,
+    metrics_config: MetricsConfig,
+    schema: Optional[pa.Schema] = None,
+    read_kwargs_provider: Optional[ReadKwargsProvider] = None,
+    s3_table_writer_kwargs: Optional[Dict[str, Any]] = None,
+    pki_hash_bucket: Optional[PrimaryKeyIndexHashBucket] = None,
+    primary_key_index_version_locator: Optional[PrimaryKeyIndexVersionLocator] = None,
+    compaction_artifact_s3_bucket: Optional[str] = None,
+    bloom_filter_bits_per_key: Optional[int] = None,
+    primary_key_digest_algorithm: PrimaryKeyDigestAlgorithm = PrimaryKeyDigestAlgorithm.SHA1,
+    deltacat_storage=unimplemented_deltacat_storage,
+) -> MaterializeResult:
+    """
+    Deletes all records with one of the given primary key digests from the
+    given files of the compacted delta. Compacted files without any deleted
+    records are referenced, and all other compacted files are rewritten
+    without their deleted records (or removed if no records remain).
+    Compacted files are ordered as they appear in the merged delta returned.
+
+    If the primary key index of a hash bucket is given, then the task index
+    is the hash bucket index, the given compacted files are all files of the
+    hash bucket, and the primary key index is used to find deleted records
+    without reading any compacted file that has none. The primary key index
+    of the hash bucket is then rewritten to the given primary key index
+    version if any compacted file was rewritten.
+    """
+    logger.info(f"Starting apply deletes task {task_index}...")
+    apply_deletes_result, duration = timed_invocation(
+        func=_timed_apply_deletes,
+        task_index=task_index,
+        compacted_delta=compacted_delta,
+        file_indices=file_indices,
+        delete_digests=delete_digests,
+        primary_keys=primary_keys,
+        partition=partition,
+        max_records_per_output_file=max_records_per_output_file,
+        compacted_file_content_type=compacted_file_content_type,
+        enable_profiler=enable_profiler,
+        schema=schema,
+        read_kwargs_provider=read_kwargs_provider,
+        s3_table_writer_kwargs=s3_table_writer_kwargs,
+        pki_hash_bucket=pki_hash_bucket,
+        primary_key_index_version_locator=primary_key_index_version_locator,
+        compaction_artifact_s3_bucket=compaction_artifact_s3_bucket,
+        bloom_filter_bits_per_key=bloom_filter_bits_per_key,
+        primary_key_digest_algorithm=primary_key_digest_algorithm,
+        deltacat_storage=deltacat_storage,
+    )
+
+    emit_metrics_time = 0.0
+    if metrics_config:
+        emit_result, latency = timed_invocation(
+            func=emit_timer_metrics,
+            metrics_name="apply_deletes",
+            value=duration,
+            metrics_config=metrics_config,
+        )
+        emit_metrics_time = latency
+
+    logger.info(f"Finished apply deletes task in {duration}s...")
+    apply_deletes_result["telemetryTimeInSeconds"] = np.double(emit_metrics_time)
+    return apply_deletes_result
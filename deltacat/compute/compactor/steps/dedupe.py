@@ -1,9 +1,11 @@
 import importlib
 import logging
+import math
 import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import nullcontext
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 import numpy as np
 import pyarrow as pa
 import pyarrow.compute as pc
@@ -13,14 +15,20 @@ from ray import cloudpickle
 from deltacat import logs
 from deltacat.compute.compactor import (
     SortKey,
-    SortOrder,
-    DeltaFileEnvelope,
     DeltaFileLocator,
+    RecordIndexRanges,
 )
 from deltacat.compute.compactor.model.dedupe_result import DedupeResult
+from deltacat.compute.compactor.model.pre_dedupe_result import PreDedupeResult
+from deltacat.compute.compactor.model.primary_key_index_hash_bucket import (
+    PrimaryKeyIndexHashBucket,
+)
+from deltacat.compute.compactor.utils import primary_key_index as pki
+from deltacat.compute.compactor.utils.dedupe_spill import HashBucketSpill
 from deltacat.compute.compactor.utils import system_columns as sc
 from deltacat.utils.ray_utils.runtime import (
     get_current_ray_task_id,
+    get_current_ray_task_num_cpus,
     get_current_ray_worker_id,
 )
 from deltacat.utils.performance import timed_invocation
@@ -33,30 +41,22 @@ if importlib.util.find_spec("memray"):
 logger = logs.configure_deltacat_logger(logging.getLogger(__name__))
 
 MaterializeBucketIndex = int
-DeltaFileLocatorToRecords = Dict[DeltaFileLocator, np.ndarray]
+DeltaFileLocatorToRecords = Dict[DeltaFileLocator, RecordIndexRanges]
 DedupeTaskIndex, PickledObjectRef = int, str
 DedupeTaskIndexWithObjectId = Tuple[DedupeTaskIndex, PickledObjectRef]
 
+# maximum number of primary key digest partitions of spilled hash buckets
+MAX_SPILL_PARTITION_COUNT = 256
+
 
 def _union_primary_key_indices(
-    hash_bucket_index: int, df_envelopes_list: List[List[DeltaFileEnvelope]]
+    hash_bucket_index: int, hb_tables: List[pa.Table]
 ) -> pa.Table:
     logger.info(
         f"[Hash bucket index {hash_bucket_index}] Reading dedupe input for "
-        f"{len(df_envelopes_list)} delta file envelope lists..."
-    )
-    hb_tables = []
-    # sort by delta file stream position now instead of sorting every row later
-    df_envelopes = [d for dfe_list in df_envelopes_list for d in dfe_list]
-    df_envelopes = sorted(
-        df_envelopes,
-        key=lambda df: (df.stream_position, df.file_index),
-        reverse=False,  # ascending
+        f"{len(hb_tables)} hash bucket tables..."
     )
-    for df_envelope in df_envelopes:
-        hb_tables.append(sc.project_delta_file_metadata_on_table(df_envelope))
-
-    hb_table = pa.concat_tables(hb_tables)
+    hb_table = _sort_delta_file_runs(pa.concat_tables(hb_tables))
 
     logger.info(
         f"Total records in hash bucket {hash_bucket_index} is {hb_table.num_rows}"
@@ -64,33 +64,254 @@ def _union_primary_key_indices(
     return hb_table
 
 
-def _drop_duplicates_by_primary_key_hash(table: pa.Table) -> pa.Table:
-    value_to_last_row_idx = {}
-
-    pk_hash_np = sc.pk_hash_column_np(table)
+def _sort_delta_file_runs(table: pa.Table) -> pa.Table:
+    """
+    Stably orders the runs of consecutive records read from the same delta
+    file in the given table with delta file metadata columns by stream
+    position, file index, and first record index, instead of sorting every
+    record. Runs read from different row groups of the same delta file are
+    ordered by the index of their first record in the file.
+    """
+    if not len(table):
+        return table
+    stream_positions = sc.stream_position_column_np(table)
+    file_indices = sc.file_index_column_np(table)
+    record_indices = sc.record_index_column_np(table)
+    is_source = sc.is_source_column_np(table)
+    is_run_start = np.ones(len(table), dtype=bool)
+    is_run_start[1:] = (
+        (stream_positions[1:] != stream_positions[:-1])
+        | (file_indices[1:] != file_indices[:-1])
+        | (is_source[1:] != is_source[:-1])
+        | (record_indices[1:] < record_indices[:-1])
+    )
+    run_starts = np.flatnonzero(is_run_start)
+    run_order = np.lexsort(
+        [
+            record_indices[run_starts],
+            file_indices[run_starts],
+            stream_positions[run_starts],
+        ]
+    )
+    if np.all(run_order[1:] > run_order[:-1]):
+        return table
+    run_lengths = np.diff(np.append(run_starts, len(table)))[run_order]
+    sorted_run_starts = np.cumsum(run_lengths) - run_lengths
+    indices = np.arange(len(table)) + np.repeat(
+        run_starts[run_order] - sorted_run_starts, run_lengths
+    )
+    return table.take(indices)
+
+
+def _group_pk_hashes(digests: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stably sorts the given structured array of primary key digest words (see
+    `sc.digest_words_np`) so that equal digests are adjacent. Returns the
+    sorted record indices, and a boolean array flagging each sorted record
+    that starts a new digest group.
+    """
+    # convert each big-endian digest word to a native unsigned int
+    words = [
+        digests[name].astype(digests.dtype[name].newbyteorder("="))
+        for name in digests.dtype.names
+    ]
+    # sorting on the leading word alone is sufficient unless two different
+    # digests share the same leading 8 bytes
+    sorted_row_indices = np.argsort(words[0], kind="stable")
+    is_group_start = np.ones(len(digests), dtype=bool)
+    sorted_word = words[0][sorted_row_indices]
+    is_group_start[1:] = sorted_word[1:] != sorted_word[:-1]
+    for word in words[1:]:
+        sorted_word = word[sorted_row_indices]
+        is_word_change = sorted_word[1:] != sorted_word[:-1]
+        if np.any(is_word_change & ~is_group_start[1:]):
+            sorted_row_indices = np.lexsort(words[::-1])
+            is_group_start[1:] = False
+            for word_to_compare in words:
+                sorted_word = word_to_compare[sorted_row_indices]
+                is_group_start[1:] |= sorted_word[1:] != sorted_word[:-1]
+            break
+    return sorted_row_indices, is_group_start
+
+
+def _sort_key_ranks(table: pa.Table, sort_keys: List[SortKey]) -> np.ndarray:
+    """
+    Returns an int64 rank for each record of the given table, such that
+    comparing the ranks of two records is equivalent to comparing their sort
+    key values in the order that `pc.sort_indices` would sort them by the
+    given sort keys (i.e. with NaNs and then nulls placed last).
+    """
+    ranks = np.zeros(len(table), dtype=np.int64)
+    rank_count = 1
+    for sort_key in sort_keys:
+        column = table[sort_key.key_name].combine_chunks()
+        column_ranks = [
+            pc.rank(
+                column,
+                sort_keys=sort_key.sort_order.value,
+                null_placement="at_end",
+                tiebreaker="dense",
+            )
+            .to_numpy()
+            .astype(np.int64)
+        ]
+        if column.null_count:
+            # rank ties NaNs with nulls, so order nulls after NaNs explicitly
+            column_ranks.append(column.is_null().to_numpy(zero_copy_only=False))
+        for column_rank in column_ranks:
+            column_rank_count = int(column_rank.max()) + 1
+            if rank_count * column_rank_count > np.iinfo(np.int64).max:
+                # re-rank densely to keep the combined rank within int64
+                _, ranks = np.unique(ranks, return_inverse=True)
+                rank_count = int(ranks.max()) + 1
+            ranks = ranks * column_rank_count + column_rank
+            rank_count *= column_rank_count
+    return ranks
+
+
+def _drop_duplicates_by_primary_key_hash(
+    table: pa.Table,
+    sort_keys: Optional[List[SortKey]] = None,
+    drop_deletes: bool = True,
+) -> pa.Table:
+    """
+    Drops all but the last upsert of each primary key digest from the given
+    table, and drops every primary key digest whose last record is a delete.
+    Records are assumed to be ordered by ascending stream position and file
+    index.
+
+    If sort keys are given, then the last record of each primary key digest
+    is the record with the greatest sort key values (per the sort order of
+    each sort key), with ties broken by record order. The winning record of
+    each primary key digest is found via a grouped arg-max over sort key
+    ranks, without sorting the table, and surviving records are returned in
+    their original record order.
+
+    Otherwise, returns the surviving records ordered by the first upsert of
+    each primary key digest after its last delete (or by its first upsert if
+    it was never deleted), which is the order that a dictionary of primary key
+    digest to last upserted record index would yield.
+
+    If `drop_deletes` is False, then the last record of each primary key
+    digest is kept even if it is a delete, and all surviving records are
+    returned in their original record order. Deduping the concatenation of
+    such partially deduped tables yields the same records as deduping all of
+    their input records at once.
+    """
     op_type_np = sc.delta_type_column_np(table)
+    digests = sc.pk_hash_digest_words_np(table)
 
-    assert len(pk_hash_np) == len(op_type_np), (
-        f"Primary key digest column length ({len(pk_hash_np)}) doesn't "
+    assert len(digests) == len(op_type_np), (
+        f"Primary key digest column length ({len(digests)}) doesn't "
         f"match delta type column length ({len(op_type_np)})."
     )
+    if not len(digests):
+        return table
+
+    # group equal digests together while preserving record order per group
+    sorted_row_indices, is_group_start = _group_pk_hashes(digests)
+    # operation type is True for `UPSERT` and False for `DELETE`
+    sorted_is_delete = ~op_type_np[sorted_row_indices]
+
+    record_count = len(sorted_row_indices)
+    group_starts = np.flatnonzero(is_group_start)
+
+    if sort_keys:
+        # select the last record with the greatest sort key rank in each group
+        sorted_ranks = _sort_key_ranks(table, sort_keys)[sorted_row_indices]
+        group_ids = np.cumsum(is_group_start) - 1
+        group_max_ranks = np.maximum.reduceat(sorted_ranks, group_starts)
+        group_winners = np.maximum.reduceat(
+            np.where(
+                sorted_ranks == group_max_ranks[group_ids],
+                np.arange(record_count),
+                -1,
+            ),
+            group_starts,
+        )
+        if drop_deletes:
+            group_winners = group_winners[~sorted_is_delete[group_winners]]
+        return table.take(np.sort(sorted_row_indices[group_winners]))
+
+    group_ends = np.append(group_starts[1:], record_count) - 1
+    if not drop_deletes:
+        return table.take(np.sort(sorted_row_indices[group_ends]))
+
+    # sorted position of the last delete at or before each record in its group
+    # (or the position before its group start if there is no such delete)
+    positions = np.arange(record_count)
+    group_start_positions = positions[is_group_start][np.cumsum(is_group_start) - 1]
+    last_delete_positions = np.maximum.accumulate(
+        np.where(sorted_is_delete, positions, group_start_positions - 1)
+    )
 
-    # TODO(raghumdani): move the dedupe to C++ using arrow methods or similar.
-    row_idx = 0
-    pk_op_val_iter = zip(pk_hash_np, op_type_np)
-    for (pk_val, op_val) in pk_op_val_iter:
-
-        # operation type is True for `UPSERT` and False for `DELETE`
-        if op_val:
-            # UPSERT this row
-            value_to_last_row_idx[pk_val] = row_idx
-        else:
-            # DELETE this row
-            value_to_last_row_idx.pop(pk_val, None)
-
-        row_idx += 1
+    live_group_ends = group_ends[~sorted_is_delete[group_ends]]
+    live_group_first_upserts = sorted_row_indices[
+        last_delete_positions[live_group_ends] + 1
+    ]
+    last_upserts = sorted_row_indices[live_group_ends]
+    return table.take(last_upserts[np.argsort(live_group_first_upserts)])
+
+
+def _group_record_index_ranges_by_file(
+    file_record_columns: List[List[np.ndarray]],
+) -> Dict[DeltaFileLocator, RecordIndexRanges]:
+    """
+    Groups deduped record indices by the delta file that they were read from,
+    and run-length encodes the ascending record indices of each delta file.
+    Takes a list of [is source, stream position, file index, file record
+    count, record index] column arrays, with one list per deduped table.
+    """
+    if not file_record_columns:
+        return {}
+    (
+        is_source,
+        stream_positions,
+        file_indices,
+        file_record_counts,
+        record_indices,
+    ) = [np.concatenate(columns) for columns in zip(*file_record_columns)]
+    record_count = len(record_indices)
+    if not record_count:
+        return {}
+
+    sorted_indices = np.lexsort(
+        [record_indices, file_indices, stream_positions, is_source]
+    )
+    is_file_start = np.zeros(record_count, dtype=bool)
+    is_file_start[0] = True
+    for column in [is_source, stream_positions, file_indices]:
+        sorted_column = column[sorted_indices]
+        is_file_start[1:] |= sorted_column[1:] != sorted_column[:-1]
+    sorted_record_indices = record_indices[sorted_indices]
+    is_range_start = is_file_start.copy()
+    is_range_start[1:] |= sorted_record_indices[1:] != sorted_record_indices[:-1] + 1
+
+    range_starts = np.flatnonzero(is_range_start)
+    range_record_index_starts = sorted_record_indices[range_starts]
+    range_lengths = np.diff(np.append(range_starts, record_count))
+    file_starts = np.flatnonzero(is_file_start)
+    # index of the first record index range of each file
+    file_range_offsets = np.append(
+        np.cumsum(is_range_start)[file_starts] - 1,
+        len(range_starts),
+    )
 
-    return table.take(list(value_to_last_row_idx.values()))
+    src_file_id_to_record_index_ranges = {}
+    for i, file_start in enumerate(file_starts):
+        record_idx = sorted_indices[file_start]
+        src_dfl = DeltaFileLocator.of(
+            is_source[record_idx],
+            stream_positions[record_idx],
+            file_indices[record_idx],
+            file_record_counts[record_idx],
+        )
+        range_slice = slice(file_range_offsets[i], file_range_offsets[i + 1])
+        src_file_id_to_record_index_ranges[src_dfl] = RecordIndexRanges.of(
+            range_record_index_starts[range_slice],
+            range_lengths[range_slice],
+        )
+    return src_file_id_to_record_index_ranges
 
 
 def delta_file_locator_to_mat_bucket_index(
@@ -100,122 +321,404 @@ def delta_file_locator_to_mat_bucket_index(
     return int.from_bytes(digest, "big") % materialize_bucket_count
 
 
+def _read_primary_key_index_table(
+    s3_bucket: str,
+    hash_bucket_index: int,
+    pki_hash_bucket: PrimaryKeyIndexHashBucket,
+) -> Optional[pa.Table]:
+    tables = pki.download_hash_bucket_entries(
+        s3_bucket,
+        hash_bucket_index,
+        pki_hash_bucket.primary_key_index_version_locator,
+    )
+    if not tables:
+        return None
+    delta_file_envelopes = pki.primary_key_index_to_delta_file_envelopes(
+        pa.concat_tables(tables),
+        pki_hash_bucket,
+    )
+    if not delta_file_envelopes:
+        return None
+    return sc.project_delta_file_metadata_on_tables(delta_file_envelopes)
+
+
+def _dedupe_hash_bucket(
+    hb_idx: int,
+    hb_tables: List[pa.Table],
+    sort_keys: List[SortKey],
+    dedupe_task_index: int,
+    pki_hash_bucket: Optional[PrimaryKeyIndexHashBucket],
+    compaction_artifact_s3_bucket: Optional[str],
+) -> Tuple[List[np.ndarray], int, int]:
+    """
+    Runs a single dedupe round over the given tables of one hash bucket.
+    Returns the file record columns of the records to keep, the number of
+    duplicate records dropped, and the number of primary key index records
+    read.
+    """
+    pki_record_count = 0
+    if pki_hash_bucket is not None:
+        # dedupe the new records of this hash bucket against its primary
+        # key index instead of the compacted files themselves
+        pki_table, read_time = timed_invocation(
+            func=_read_primary_key_index_table,
+            s3_bucket=compaction_artifact_s3_bucket,
+            hash_bucket_index=hb_idx,
+            pki_hash_bucket=pki_hash_bucket,
+        )
+        pki_record_count = len(pki_table) if pki_table is not None else 0
+        logger.info(
+            f"[Dedupe task {dedupe_task_index}] Read {pki_record_count} "
+            f"primary key index records for hash bucket {hb_idx}, took "
+            f"{read_time}s"
+        )
+        if pki_table is not None:
+            hb_tables = hb_tables + [pki_table]
+    logger.info(f"{dedupe_task_index}: union primary keys for hb_index: {hb_idx}")
+
+    table, union_time = timed_invocation(
+        func=_union_primary_key_indices,
+        hash_bucket_index=hb_idx,
+        hb_tables=hb_tables,
+    )
+    logger.info(
+        f"[Dedupe {dedupe_task_index}] Dedupe round input "
+        f"record count: {len(table)}, took {union_time}s"
+    )
+
+    # drop duplicates by primary key hash column
+    logger.info(
+        f"[Dedupe task index {dedupe_task_index}] Dropping duplicates for {hb_idx}"
+    )
+
+    hb_table_record_count = len(table)
+    table, drop_time = timed_invocation(
+        func=_drop_duplicates_by_primary_key_hash,
+        table=table,
+        sort_keys=sort_keys,
+    )
+    deduped_record_count = hb_table_record_count - len(table)
+
+    logger.info(
+        f"[Dedupe task index {dedupe_task_index}] Dedupe round output "
+        f"record count: {len(table)}, took: {drop_time}s"
+    )
+
+    return _file_record_columns(table), deduped_record_count, pki_record_count
+
+
+def _dedupe_spilled_hash_bucket(
+    hb_idx: int,
+    spill: HashBucketSpill,
+    sort_keys: List[SortKey],
+    dedupe_task_index: int,
+    pki_hash_bucket: Optional[PrimaryKeyIndexHashBucket],
+    compaction_artifact_s3_bucket: Optional[str],
+) -> Tuple[List[np.ndarray], int, int]:
+    """
+    Equivalent of `_dedupe_hash_bucket` for a hash bucket whose tables were
+    spilled to disk. Runs one dedupe round per primary key digest partition,
+    so that only the records of a single partition are held in memory.
+    """
+    pki_record_count = 0
+    if pki_hash_bucket is not None:
+        # spill the primary key index so that it's partitioned like the
+        # new records of this hash bucket
+        pki_table = _read_primary_key_index_table(
+            compaction_artifact_s3_bucket,
+            hb_idx,
+            pki_hash_bucket,
+        )
+        if pki_table is not None:
+            pki_record_count = len(pki_table)
+            spill.spill({hb_idx: pki_table})
+            del pki_table
+    input_record_count = 0
+    partition_file_record_columns = []
+    for partition_tables in spill.read_partitions(hb_idx):
+        table = _union_primary_key_indices(hb_idx, partition_tables)
+        input_record_count += len(table)
+        table = _drop_duplicates_by_primary_key_hash(table, sort_keys)
+        partition_file_record_columns.append(_file_record_columns(table))
+    file_record_columns = [
+        np.concatenate(columns) for columns in zip(*partition_file_record_columns)
+    ]
+    deduped_record_count = input_record_count - len(file_record_columns[-1])
+    logger.info(
+        f"[Dedupe task index {dedupe_task_index}] Deduped {input_record_count} "
+        f"spilled records of hash bucket {hb_idx} in {spill.partition_count} "
+        f"partitions, dropped {deduped_record_count} records"
+    )
+    return file_record_columns, deduped_record_count, pki_record_count
+
+
+def _file_record_columns(table: pa.Table) -> List[np.ndarray]:
+    return [
+        sc.is_source_column_np(table),
+        sc.stream_position_column_np(table),
+        sc.file_index_column_np(table),
+        sc.file_record_count_column_np(table),
+        sc.record_index_column_np(table),
+    ]
+
+
+def _spill_hash_bucket_group_tables(
+    spill: HashBucketSpill,
+    hash_bucket_group_tables: List[pa.Table],
+    sort_keys: List[SortKey],
+) -> int:
+    """
+    Partially dedupes the tables of each hash bucket in the given hash bucket
+    group tables, and spills them. Returns the number of records dropped.
+    """
+    hb_index_to_pre_deduped_table = {}
+    deduped_record_count = 0
+    for hb_idx, hb_tables in pki.group_tables_by_hash_bucket(
+        hash_bucket_group_tables
+    ).items():
+        table = _union_primary_key_indices(hb_idx, hb_tables)
+        # keep deletes so that they still apply to records spilled later
+        pre_deduped_table = _drop_duplicates_by_primary_key_hash(
+            table,
+            sort_keys,
+            drop_deletes=False,
+        )
+        deduped_record_count += len(table) - len(pre_deduped_table)
+        hb_index_to_pre_deduped_table[hb_idx] = pre_deduped_table
+    spill.spill(hb_index_to_pre_deduped_table)
+    return deduped_record_count
+
+
+def _get_hash_bucket_group_tables(
+    object_refs: List[Any],
+    sort_keys: List[SortKey],
+    spill_threshold_bytes: int,
+    num_cpus: int,
+    dedupe_task_index: int,
+) -> Tuple[Dict[int, List[pa.Table]], Optional[HashBucketSpill], int]:
+    """
+    Gets the given hash bucket group tables one at a time, and groups their
+    tables by hash bucket. Once the tables gotten exceed the spill threshold,
+    spills all tables gotten so far and every table gotten after them to
+    disk instead (see `HashBucketSpill`).
+
+    Returns the tables of each hash bucket (if nothing was spilled), the spill
+    (if any), and the number of records dropped before spilling.
+    """
+    hash_bucket_group_tables = []
+    table_bytes = 0
+    spill = None
+    deduped_record_count = 0
+    try:
+        for i, object_ref in enumerate(object_refs):
+            table = ray.get(object_ref)
+            if spill is not None:
+                deduped_record_count += _spill_hash_bucket_group_tables(
+                    spill,
+                    [table],
+                    sort_keys,
+                )
+                continue
+            hash_bucket_group_tables.append(table)
+            table_bytes += table.nbytes if table is not None else 0
+            if table_bytes <= spill_threshold_bytes:
+                continue
+            # size partitions to fit in memory while every thread dedupes one
+            estimated_table_bytes = table_bytes / (i + 1) * len(object_refs)
+            partition_count = min(
+                max(
+                    math.ceil(estimated_table_bytes * num_cpus / spill_threshold_bytes),
+                    2,
+                ),
+                MAX_SPILL_PARTITION_COUNT,
+            )
+            logger.info(
+                f"[Dedupe task {dedupe_task_index}] Got {table_bytes} bytes of "
+                f"hash bucket group tables, exceeding the spill threshold of "
+                f"{spill_threshold_bytes} bytes. Spilling an estimated "
+                f"{estimated_table_bytes:.0f} bytes to disk..."
+            )
+            spill = HashBucketSpill(partition_count)
+            deduped_record_count += _spill_hash_bucket_group_tables(
+                spill,
+                hash_bucket_group_tables,
+                sort_keys,
+            )
+            hash_bucket_group_tables = []
+    except BaseException:
+        if spill is not None:
+            spill.close()
+        raise
+    if spill is not None:
+        logger.info(
+            f"[Dedupe task {dedupe_task_index}] Spilled {spill.spilled_bytes} "
+            f"bytes of hash bucket tables, dropped {deduped_record_count} "
+            f"records before spilling."
+        )
+        return {}, spill, deduped_record_count
+    return pki.group_tables_by_hash_bucket(hash_bucket_group_tables), None, 0
+
+
 def _timed_dedupe(
     object_ids: List[Any],
     sort_keys: List[SortKey],
     num_materialize_buckets: int,
     dedupe_task_index: int,
     enable_profiler: bool,
+    materialize_by_hash_bucket: bool = False,
+    pki_hash_buckets: Optional[List[Optional[PrimaryKeyIndexHashBucket]]] = None,
+    compaction_artifact_s3_bucket: Optional[str] = None,
+    spill_threshold_bytes: Optional[int] = None,
 ):
     task_id = get_current_ray_task_id()
     worker_id = get_current_ray_worker_id()
     with memray.Tracker(
         f"dedupe_{worker_id}_{task_id}.bin"
     ) if enable_profiler else nullcontext():
-        # TODO (pdames): mitigate risk of running out of memory here in cases of
-        #  severe skew of primary key updates in deltas
         src_file_records_obj_refs = [
             cloudpickle.loads(obj_id_pkl) for obj_id_pkl in object_ids
         ]
         logger.info(
-            f"[Dedupe task {dedupe_task_index}] Getting delta file envelope "
-            f"groups for {len(src_file_records_obj_refs)} object refs..."
+            f"[Dedupe task {dedupe_task_index}] Getting hash bucket group "
+            f"tables for {len(src_file_records_obj_refs)} object refs..."
         )
 
-        delta_file_envelope_groups_list = ray.get(src_file_records_obj_refs)
-        hb_index_to_delta_file_envelopes_list = defaultdict(list)
-        for delta_file_envelope_groups in delta_file_envelope_groups_list:
-            for hb_idx, dfes in enumerate(delta_file_envelope_groups):
-                if dfes is not None:
-                    hb_index_to_delta_file_envelopes_list[hb_idx].append(dfes)
-        src_file_id_to_row_indices = defaultdict(list)
-        deduped_tables = []
-        logger.info(
-            f"[Dedupe task {dedupe_task_index}] Running {len(hb_index_to_delta_file_envelopes_list)} "
-            f"dedupe rounds..."
-        )
-        total_deduped_records = 0
-        for hb_idx, dfe_list in hb_index_to_delta_file_envelopes_list.items():
-            logger.info(
-                f"{dedupe_task_index}: union primary keys for hb_index: {hb_idx}"
-            )
-
-            table, union_time = timed_invocation(
-                func=_union_primary_key_indices,
-                hash_bucket_index=hb_idx,
-                df_envelopes_list=dfe_list,
+        num_cpus = get_current_ray_task_num_cpus()
+        if spill_threshold_bytes is None:
+            hash_bucket_group_tables = ray.get(src_file_records_obj_refs)
+            hb_index_to_tables = pki.group_tables_by_hash_bucket(
+                hash_bucket_group_tables
             )
-            logger.info(
-                f"[Dedupe {dedupe_task_index}] Dedupe round input "
-                f"record count: {len(table)}, took {union_time}s"
+            spill, total_deduped_records = None, 0
+        else:
+            # spill hash bucket tables to disk instead of running out of memory
+            # in cases of severe skew of primary key updates in deltas
+            (
+                hb_index_to_tables,
+                spill,
+                total_deduped_records,
+            ) = _get_hash_bucket_group_tables(
+                src_file_records_obj_refs,
+                sort_keys,
+                spill_threshold_bytes,
+                num_cpus,
+                dedupe_task_index,
             )
+        hb_indices = (
+            list(hb_index_to_tables.keys())
+            if spill is None
+            else spill.hash_bucket_indices
+        )
+        # dedupe independent hash buckets concurrently, since Arrow and NumPy
+        # kernels release the GIL
+        num_threads = min(num_cpus, len(hb_indices))
+        logger.info(
+            f"[Dedupe task {dedupe_task_index}] Running {len(hb_indices)} "
+            f"dedupe rounds on {num_threads} thread(s)..."
+        )
 
-            # sort by sort keys
-            if len(sort_keys):
-                # TODO (pdames): convert to O(N) dedupe w/ sort keys
-                sort_keys.extend(
-                    [
-                        SortKey.of(
-                            sc._PARTITION_STREAM_POSITION_COLUMN_NAME,
-                            SortOrder.ASCENDING,
-                        ),
-                        SortKey.of(
-                            sc._ORDERED_FILE_IDX_COLUMN_NAME, SortOrder.ASCENDING
-                        ),
-                    ]
+        def dedupe_round(hb_idx: int):
+            pki_hash_bucket = pki_hash_buckets[hb_idx] if pki_hash_buckets else None
+            if spill is None:
+                hb_dedupe_result = _dedupe_hash_bucket(
+                    hb_idx,
+                    hb_index_to_tables[hb_idx],
+                    sort_keys,
+                    dedupe_task_index,
+                    pki_hash_bucket,
+                    compaction_artifact_s3_bucket,
                 )
-                table = table.take(pc.sort_indices(table, sort_keys=sort_keys))
-
-            # drop duplicates by primary key hash column
-            logger.info(
-                f"[Dedupe task index {dedupe_task_index}] Dropping duplicates for {hb_idx}"
-            )
-
-            hb_table_record_count = len(table)
-            table, drop_time = timed_invocation(
-                func=_drop_duplicates_by_primary_key_hash, table=table
+            else:
+                hb_dedupe_result = _dedupe_spilled_hash_bucket(
+                    hb_idx,
+                    spill,
+                    sort_keys,
+                    dedupe_task_index,
+                    pki_hash_bucket,
+                    compaction_artifact_s3_bucket,
+                )
+            (
+                file_record_columns,
+                deduped_record_count,
+                pki_record_count,
+            ) = hb_dedupe_result
+            # the records of each hash bucket materialized into its own files
+            # can also be grouped by delta file on the same thread
+            src_file_records = (
+                _group_record_index_ranges_by_file([file_record_columns])
+                if materialize_by_hash_bucket
+                else None
             )
-            deduped_record_count = hb_table_record_count - len(table)
-            total_deduped_records += deduped_record_count
-
-            logger.info(
-                f"[Dedupe task index {dedupe_task_index}] Dedupe round output "
-                f"record count: {len(table)}, took: {drop_time}s"
+            return (
+                file_record_columns,
+                src_file_records,
+                deduped_record_count,
+                pki_record_count,
             )
 
-            deduped_tables.append((hb_idx, table))
-
-            stream_position_col = sc.stream_position_column_np(table)
-            file_idx_col = sc.file_index_column_np(table)
-            row_idx_col = sc.record_index_column_np(table)
-            is_source_col = sc.is_source_column_np(table)
-            file_record_count_col = sc.file_record_count_column_np(table)
-            for row_idx in range(len(table)):
-                src_dfl = DeltaFileLocator.of(
-                    is_source_col[row_idx],
-                    stream_position_col[row_idx],
-                    file_idx_col[row_idx],
-                    file_record_count_col[row_idx],
-                )
-                # TODO(pdames): merge contiguous record number ranges
-                src_file_id_to_row_indices[src_dfl].append(row_idx_col[row_idx])
+        # all dedupe rounds complete before any spill files are removed
+        with spill or nullcontext(), ThreadPoolExecutor(
+            max_workers=max(num_threads, 1)
+        ) as executor:
+            hb_idx_to_dedupe_round = {
+                hb_idx: executor.submit(dedupe_round, hb_idx) for hb_idx in hb_indices
+            }
+        hb_idx_to_deduped_file_record_columns = {}
+        hb_idx_to_src_file_records = {}
+        total_pki_records = 0
+        for hb_idx, dedupe_round_result in hb_idx_to_dedupe_round.items():
+            (
+                file_record_columns,
+                src_file_records,
+                deduped_record_count,
+                pki_record_count,
+            ) = dedupe_round_result.result()
+            hb_idx_to_deduped_file_record_columns[hb_idx] = file_record_columns
+            hb_idx_to_src_file_records[hb_idx] = src_file_records
+            total_deduped_records += deduped_record_count
+            total_pki_records += pki_record_count
 
         logger.info(f"Finished all dedupe rounds...")
-        mat_bucket_to_src_file_record_count = defaultdict(dict)
+        mat_bucket_to_src_file_record_count: Dict[
+            MaterializeBucketIndex, Dict[DeltaFileLocator, int]
+        ] = defaultdict(dict)
         mat_bucket_to_src_file_records: Dict[
             MaterializeBucketIndex, DeltaFileLocatorToRecords
         ] = defaultdict(dict)
-        for src_dfl, src_row_indices in src_file_id_to_row_indices.items():
-            mat_bucket = delta_file_locator_to_mat_bucket_index(
-                src_dfl,
-                num_materialize_buckets,
-            )
-            mat_bucket_to_src_file_records[mat_bucket][src_dfl] = np.array(
-                src_row_indices,
-            )
-            mat_bucket_to_src_file_record_count[mat_bucket][src_dfl] = len(
-                src_row_indices
+        if materialize_by_hash_bucket:
+            # materialize the records of each hash bucket into its own files
+            for (
+                hb_idx,
+                src_file_id_to_record_index_ranges,
+            ) in hb_idx_to_src_file_records.items():
+                for (
+                    src_dfl,
+                    record_index_ranges,
+                ) in src_file_id_to_record_index_ranges.items():
+                    mat_bucket_to_src_file_records[hb_idx][
+                        src_dfl
+                    ] = record_index_ranges
+                    mat_bucket_to_src_file_record_count[hb_idx][
+                        src_dfl
+                    ] = record_index_ranges.record_count
+        else:
+            src_file_id_to_record_index_ranges = _group_record_index_ranges_by_file(
+                list(hb_idx_to_deduped_file_record_columns.values())
             )
+            for (
+                src_dfl,
+                record_index_ranges,
+            ) in src_file_id_to_record_index_ranges.items():
+                mat_bucket = delta_file_locator_to_mat_bucket_index(
+                    src_dfl,
+                    num_materialize_buckets,
+                )
+                mat_bucket_to_src_file_records[mat_bucket][
+                    src_dfl
+                ] = record_index_ranges
+                mat_bucket_to_src_file_record_count[mat_bucket][
+                    src_dfl
+                ] = record_index_ranges.record_count
 
         mat_bucket_to_dd_idx_obj_id: Dict[
             MaterializeBucketIndex, DedupeTaskIndexWithObjectId
@@ -238,6 +741,62 @@ def _timed_dedupe(
 
         return DedupeResult(
             mat_bucket_to_dd_idx_obj_id,
+            dict(mat_bucket_to_src_file_record_count),
+            np.int64(total_deduped_records),
+            np.double(peak_memory_usage_bytes),
+            np.double(0.0),
+            np.double(time.time()),
+            np.array(hb_indices, dtype=np.int64),
+            np.int64(total_pki_records),
+        )
+
+
+def _timed_pre_dedupe(
+    object_ids: List[Any],
+    sort_keys: List[SortKey],
+    pre_dedupe_task_index: int,
+    enable_profiler: bool,
+):
+    task_id = get_current_ray_task_id()
+    worker_id = get_current_ray_worker_id()
+    with memray.Tracker(
+        f"pre_dedupe_{worker_id}_{task_id}.bin"
+    ) if enable_profiler else nullcontext():
+        src_file_records_obj_refs = [
+            cloudpickle.loads(obj_id_pkl) for obj_id_pkl in object_ids
+        ]
+        logger.info(
+            f"[Pre-dedupe task {pre_dedupe_task_index}] Getting hash bucket "
+            f"group tables for {len(src_file_records_obj_refs)} object refs..."
+        )
+        hash_bucket_group_tables = ray.get(src_file_records_obj_refs)
+        hb_index_to_tables = pki.group_tables_by_hash_bucket(hash_bucket_group_tables)
+        hb_index_to_pre_deduped_table = {}
+        total_deduped_records = 0
+        for hb_idx, hb_tables in hb_index_to_tables.items():
+            table = _union_primary_key_indices(hb_idx, hb_tables)
+            # keep deletes so that they still apply to hash bucket output that
+            # isn't available yet
+            deduped_table = _drop_duplicates_by_primary_key_hash(
+                table,
+                sort_keys,
+                drop_deletes=False,
+            )
+            total_deduped_records += len(table) - len(deduped_table)
+            hb_index_to_pre_deduped_table[hb_idx] = deduped_table
+        logger.info(
+            f"[Pre-dedupe task {pre_dedupe_task_index}] Dropped "
+            f"{total_deduped_records} records from "
+            f"{len(hb_index_to_tables)} hash buckets."
+        )
+        # pre-deduped tables keep the layout of hash bucket group tables
+        object_ref = ray.put(pki.hash_bucket_group_table(hb_index_to_pre_deduped_table))
+        pickled_object_ref = cloudpickle.dumps(object_ref)
+        del object_ref
+
+        peak_memory_usage_bytes = get_current_node_peak_memory_usage_in_bytes()
+        return PreDedupeResult(
+            pickled_object_ref,
             np.int64(total_deduped_records),
             np.double(peak_memory_usage_bytes),
             np.double(0.0),
@@ -245,6 +804,53 @@ def _timed_dedupe(
         )
 
 
+@ray.remote
+def pre_dedupe(
+    object_ids: List[Any],
+    sort_keys: List[SortKey],
+    pre_dedupe_task_index: int,
+    enable_profiler: bool,
+    metrics_config: MetricsConfig,
+) -> PreDedupeResult:
+    """
+    Partially dedupes the hash bucket output available so far for a single
+    hash bucket group, keeping the last record of each primary key digest
+    (including deletes). The result can be passed to `dedupe` in place of the
+    hash bucket output that it was computed from.
+    """
+    logger.info(
+        f"[Pre-dedupe task {pre_dedupe_task_index}] Starting pre-dedupe task..."
+    )
+    pre_dedupe_result, duration = timed_invocation(
+        func=_timed_pre_dedupe,
+        object_ids=object_ids,
+        sort_keys=sort_keys,
+        pre_dedupe_task_index=pre_dedupe_task_index,
+        enable_profiler=enable_profiler,
+    )
+
+    emit_metrics_time = 0.0
+    if metrics_config:
+        emit_result, latency = timed_invocation(
+            func=emit_timer_metrics,
+            metrics_name="pre_dedupe",
+            value=duration,
+            metrics_config=metrics_config,
+        )
+        emit_metrics_time = latency
+
+    logger.info(
+        f"[Pre-dedupe task {pre_dedupe_task_index}] Finished pre-dedupe task..."
+    )
+    return PreDedupeResult(
+        pre_dedupe_result[0],
+        pre_dedupe_result[1],
+        pre_dedupe_result[2],
+        np.double(emit_metrics_time),
+        pre_dedupe_result[4],
+    )
+
+
 @ray.remote
 def dedupe(
     object_ids: List[Any],
@@ -253,7 +859,27 @@ def dedupe(
     dedupe_task_index: int,
     enable_profiler: bool,
     metrics_config: MetricsConfig,
+    materialize_by_hash_bucket: bool = False,
+    pki_hash_buckets: Optional[List[Optional[PrimaryKeyIndexHashBucket]]] = None,
+    compaction_artifact_s3_bucket: Optional[str] = None,
+    spill_threshold_bytes: Optional[int] = None,
 ) -> DedupeResult:
+    """
+    Dedupes the records of each hash bucket of a single hash bucket group, and
+    assigns the records to keep to materialize buckets.
+
+    If `materialize_by_hash_bucket` is True, then the records of each hash
+    bucket are assigned to the materialize bucket with the same index, so that
+    each compacted file only holds the records of a single hash bucket. If
+    the primary key index of each hash bucket of the previous compacted delta
+    is given, then the records of each hash bucket are deduped against its
+    primary key index read from the compaction artifact S3 bucket.
+
+    If a spill threshold is given, then hash bucket tables are spilled to
+    local disk once more than the given number of bytes of them have been
+    read, and each spilled hash bucket is deduped one primary key digest
+    partition at a time.
+    """
     logger.info(f"[Dedupe task {dedupe_task_index}] Starting dedupe task...")
     dedupe_result, duration = timed_invocation(
         func=_timed_dedupe,
@@ -262,6 +888,10 @@ def dedupe(
         num_materialize_buckets=num_materialize_buckets,
         dedupe_task_index=dedupe_task_index,
         enable_profiler=enable_profiler,
+        materialize_by_hash_bucket=materialize_by_hash_bucket,
+        pki_hash_buckets=pki_hash_buckets,
+        compaction_artifact_s3_bucket=compaction_artifact_s3_bucket,
+        spill_threshold_bytes=spill_threshold_bytes,
     )
 
     emit_metrics_time = 0.0
@@ -279,6 +909,9 @@ def dedupe(
         dedupe_result[0],
         dedupe_result[1],
         dedupe_result[2],
+        dedupe_result[3],
         np.double(emit_metrics_time),
-        dedupe_result[4],
+        dedupe_result[5],
+        dedupe_result[6],
+        dedupe_result[7],
     )
@@ -1,9 +1,11 @@
 import importlib
 import logging
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import nullcontext
 from itertools import chain
-from typing import Generator, List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple
 import numpy as np
 import pyarrow as pa
 import ray
@@ -16,19 +18,27 @@ from deltacat.compute.compactor import (
 )
 from deltacat.compute.compactor.model.delta_file_envelope import DeltaFileEnvelopeGroups
 from deltacat.compute.compactor.model.hash_bucket_result import HashBucketResult
+from deltacat.compute.compactor.model.primary_key_digest_algorithm import (
+    PrimaryKeyDigestAlgorithm,
+)
+from deltacat.compute.compactor.utils import primary_key_bloom_filter as pbf
 from deltacat.compute.compactor.utils import system_columns as sc
+from deltacat.compute.compactor.utils.primary_key_hash import hash_primary_keys
 from deltacat.compute.compactor.utils.primary_key_index import (
     group_hash_bucket_indices,
     group_record_indices_by_hash_bucket,
 )
-from deltacat.storage import interface as unimplemented_deltacat_storage
+from deltacat.storage import (
+    LocalTable,
+    interface as unimplemented_deltacat_storage,
+)
 from deltacat.types.media import StorageType
-from deltacat.utils.common import sha1_digest
 from deltacat.utils.ray_utils.runtime import (
     get_current_ray_task_id,
     get_current_ray_worker_id,
 )
 from deltacat.utils.common import ReadKwargsProvider
+from deltacat.utils.pyarrow import ReadKwargsProviderPyArrowParquetRowGroups
 from deltacat.utils.performance import timed_invocation
 from deltacat.utils.metrics import emit_timer_metrics, MetricsConfig
 from deltacat.utils.resources import get_current_node_peak_memory_usage_in_bytes
@@ -38,21 +48,19 @@ if importlib.util.find_spec("memray"):
 
 logger = logs.configure_deltacat_logger(logging.getLogger(__name__))
 
-_PK_BYTES_DELIMITER = b"L6kl7u5f"
-
 
 def _group_by_pk_hash_bucket(
-    table: pa.Table, num_buckets: int, primary_keys: List[str]
+    table: pa.Table,
+    num_buckets: int,
+    primary_keys: List[str],
+    first_record_index: int = 0,
+    digest_algorithm: PrimaryKeyDigestAlgorithm = PrimaryKeyDigestAlgorithm.SHA1,
 ) -> np.ndarray:
     # generate the primary key digest column
-    all_pk_column_fields = []
-    for pk_name in primary_keys:
-        # casting a primary key column to numpy also ensures no nulls exist
-        # TODO (pdames): catch error in cast to numpy and print user-friendly err msg.
-        column_fields = table[pk_name].to_numpy()
-        all_pk_column_fields.append(column_fields)
-    hash_column_generator = _hash_pk_bytes_generator(all_pk_column_fields)
-    table = sc.append_pk_hash_column(table, hash_column_generator)
+    table = sc.append_pk_hash_column(
+        table,
+        hash_primary_keys(table, primary_keys, digest_algorithm),
+    )
 
     # drop primary key columns to free up memory
     table = table.drop(primary_keys)
@@ -63,25 +71,18 @@ def _group_by_pk_hash_bucket(
         num_buckets,
     )
 
-    # generate the ordered record number column
+    # generate the ordered record number column, offset by the index of the
+    # table's first record in its file if the table only holds some row groups
     hash_bucket_to_table = np.empty([num_buckets], dtype="object")
     for hb, indices in enumerate(hash_bucket_to_indices):
-        if indices:
+        if indices is not None:
             hash_bucket_to_table[hb] = sc.append_record_idx_col(
                 table.take(indices),
-                indices,
+                indices + first_record_index if first_record_index else indices,
             )
     return hash_bucket_to_table
 
 
-def _hash_pk_bytes_generator(all_column_fields) -> Generator[bytes, None, None]:
-    for field_index in range(len(all_column_fields[0])):
-        bytes_to_join = []
-        for column_fields in all_column_fields:
-            bytes_to_join.append(bytes(str(column_fields[field_index]), "utf-8"))
-        yield sha1_digest(_PK_BYTES_DELIMITER.join(bytes_to_join))
-
-
 def _group_file_records_by_pk_hash_bucket(
     annotated_delta: DeltaAnnotated,
     num_hash_buckets: int,
@@ -89,26 +90,53 @@ def _group_file_records_by_pk_hash_bucket(
     sort_key_names: List[str],
     is_src_delta: np.bool_ = True,
     read_kwargs_provider: Optional[ReadKwargsProvider] = None,
+    enable_streaming_hash_bucket: bool = False,
+    prefetch_depth: int = 0,
+    primary_key_digest_algorithm: PrimaryKeyDigestAlgorithm = PrimaryKeyDigestAlgorithm.SHA1,
     deltacat_storage=unimplemented_deltacat_storage,
 ) -> Tuple[Optional[DeltaFileEnvelopeGroups], int]:
-    # read input parquet s3 objects into a list of delta file envelopes
-    delta_file_envelopes, total_record_count = _read_delta_file_envelopes(
-        annotated_delta,
-        primary_keys,
-        sort_key_names,
-        read_kwargs_provider,
-        deltacat_storage,
+    has_row_group_ranges = any(
+        annotation.annotation_row_group_range is not None
+        for annotation in annotated_delta.annotations
     )
-    if delta_file_envelopes is None:
-        return None, 0
+    if enable_streaming_hash_bucket or has_row_group_ranges:
+        # read and group one manifest entry at a time to bound memory usage
+        # by the size of the largest manifest entry instead of the delta, and
+        # to only read the annotated row groups of each entry
+        if not annotated_delta.annotations:
+            return None, 0
+        delta_file_envelopes = _iterate_delta_file_envelopes(
+            annotated_delta,
+            primary_keys,
+            sort_key_names,
+            read_kwargs_provider,
+            prefetch_depth,
+            deltacat_storage,
+        )
+    else:
+        # read input parquet s3 objects into a list of delta file envelopes
+        delta_file_envelopes, _ = _read_delta_file_envelopes(
+            annotated_delta,
+            primary_keys,
+            sort_key_names,
+            read_kwargs_provider,
+            deltacat_storage,
+        )
+        if delta_file_envelopes is None:
+            return None, 0
+        delta_file_envelopes = [(dfe, 0) for dfe in delta_file_envelopes]
 
     # group the data by primary key hash value
     hb_to_delta_file_envelopes = np.empty([num_hash_buckets], dtype="object")
-    for dfe in delta_file_envelopes:
+    total_record_count = 0
+    for dfe, first_record_index in delta_file_envelopes:
+        total_record_count += len(dfe.table)
         hash_bucket_to_table = _group_by_pk_hash_bucket(
             dfe.table,
             num_hash_buckets,
             primary_keys,
+            first_record_index,
+            primary_key_digest_algorithm,
         )
         for hb, table in enumerate(hash_bucket_to_table):
             if table:
@@ -127,6 +155,22 @@ def _group_file_records_by_pk_hash_bucket(
     return hb_to_delta_file_envelopes, total_record_count
 
 
+def _project_delta_file_envelope_groups(
+    delta_file_envelope_groups: Optional[DeltaFileEnvelopeGroups],
+) -> Optional[np.ndarray]:
+    """
+    Projects the metadata of each delta file envelope onto its table, and
+    concatenates the envelope tables of each hash bucket into a single table.
+    """
+    if delta_file_envelope_groups is None:
+        return None
+    hash_bucket_to_table = np.empty([len(delta_file_envelope_groups)], dtype="object")
+    for hb, dfes in enumerate(delta_file_envelope_groups):
+        if dfes:
+            hash_bucket_to_table[hb] = sc.project_delta_file_metadata_on_tables(dfes)
+    return hash_bucket_to_table
+
+
 def _read_delta_file_envelopes(
     annotated_delta: DeltaAnnotated,
     primary_keys: List[str],
@@ -170,6 +214,80 @@ def _read_delta_file_envelopes(
     return delta_file_envelopes, total_record_count
 
 
+def _download_delta_manifest_entries(
+    annotated_delta: DeltaAnnotated,
+    columns: List[str],
+    read_kwargs_provider: Optional[ReadKwargsProvider],
+    prefetch_depth: int = 0,
+    deltacat_storage=unimplemented_deltacat_storage,
+) -> Iterator[LocalTable]:
+    def download(entry_index: int) -> LocalTable:
+        annotation = annotated_delta.annotations[entry_index]
+        row_group_range = annotation.annotation_row_group_range
+        return deltacat_storage.download_delta_manifest_entry(
+            annotated_delta,
+            entry_index,
+            columns=columns,
+            file_reader_kwargs_provider=ReadKwargsProviderPyArrowParquetRowGroups(
+                row_groups=list(range(*row_group_range)),
+                delegate=read_kwargs_provider,
+            )
+            if row_group_range is not None
+            else read_kwargs_provider,
+        )
+
+    entry_count = len(annotated_delta.annotations)
+    if prefetch_depth <= 0:
+        for i in range(entry_count):
+            yield download(i)
+        return
+    # download up to the next `prefetch_depth` entries while the caller is
+    # processing the current entry
+    with ThreadPoolExecutor(max_workers=prefetch_depth) as executor:
+        pending_downloads = deque(
+            executor.submit(download, i)
+            for i in range(min(prefetch_depth, entry_count))
+        )
+        next_entry_index = len(pending_downloads)
+        while pending_downloads:
+            table = pending_downloads.popleft().result()
+            if next_entry_index < entry_count:
+                pending_downloads.append(executor.submit(download, next_entry_index))
+                next_entry_index += 1
+            yield table
+            del table
+
+
+def _iterate_delta_file_envelopes(
+    annotated_delta: DeltaAnnotated,
+    primary_keys: List[str],
+    sort_key_names: List[str],
+    read_kwargs_provider: Optional[ReadKwargsProvider],
+    prefetch_depth: int = 0,
+    deltacat_storage=unimplemented_deltacat_storage,
+) -> Iterator[Tuple[DeltaFileEnvelope, int]]:
+
+    columns_to_read = list(chain(primary_keys, sort_key_names))
+    tables = _download_delta_manifest_entries(
+        annotated_delta,
+        columns_to_read,
+        read_kwargs_provider,
+        prefetch_depth,
+        deltacat_storage,
+    )
+    for annotation, table in zip(annotated_delta.annotations, tables):
+        # yield the index of the table's first record in its file with each
+        # envelope, since the table may only hold some of its row groups
+        yield DeltaFileEnvelope.of(
+            stream_position=annotation.annotation_stream_position,
+            file_index=annotation.annotation_file_index,
+            delta_type=annotation.annotation_delta_type,
+            table=table,
+            file_record_count=annotation.annotation_file_record_count or len(table),
+        ), annotation.annotation_first_record_index
+        del table
+
+
 def _timed_hash_bucket(
     annotated_delta: DeltaAnnotated,
     round_completion_info: Optional[RoundCompletionInfo],
@@ -179,6 +297,9 @@ def _timed_hash_bucket(
     num_groups: int,
     enable_profiler: bool,
     read_kwargs_provider: Optional[ReadKwargsProvider] = None,
+    enable_streaming_hash_bucket: bool = False,
+    prefetch_depth: int = 0,
+    primary_key_digest_algorithm: PrimaryKeyDigestAlgorithm = PrimaryKeyDigestAlgorithm.SHA1,
     deltacat_storage=unimplemented_deltacat_storage,
 ):
     task_id = get_current_ray_task_id()
@@ -204,11 +325,15 @@ def _timed_hash_bucket(
             sort_key_names,
             is_src_delta,
             read_kwargs_provider,
+            enable_streaming_hash_bucket,
+            prefetch_depth,
+            primary_key_digest_algorithm,
             deltacat_storage,
         )
+        # hand off a single Arrow table per hash bucket group instead of
+        # pickled delta file envelope lists
         hash_bucket_group_to_obj_id, _ = group_hash_bucket_indices(
-            delta_file_envelope_groups,
-            num_buckets,
+            _project_delta_file_envelope_groups(delta_file_envelope_groups),
             num_groups,
         )
 
@@ -233,6 +358,9 @@ def hash_bucket(
     enable_profiler: bool,
     metrics_config: MetricsConfig,
     read_kwargs_provider: Optional[ReadKwargsProvider],
+    enable_streaming_hash_bucket: bool = False,
+    prefetch_depth: int = 0,
+    primary_key_digest_algorithm: PrimaryKeyDigestAlgorithm = PrimaryKeyDigestAlgorithm.SHA1,
     deltacat_storage=unimplemented_deltacat_storage,
 ) -> HashBucketResult:
 
@@ -247,6 +375,9 @@ def hash_bucket(
         num_groups=num_groups,
         enable_profiler=enable_profiler,
         read_kwargs_provider=read_kwargs_provider,
+        enable_streaming_hash_bucket=enable_streaming_hash_bucket,
+        prefetch_depth=prefetch_depth,
+        primary_key_digest_algorithm=primary_key_digest_algorithm,
         deltacat_storage=deltacat_storage,
     )
 
@@ -268,3 +399,75 @@ def hash_bucket(
         np.double(emit_metrics_time),
         hash_bucket_result[4],
     )
+
+
+def _timed_probe_bloom_filters(
+    annotated_delta: DeltaAnnotated,
+    primary_keys: List[str],
+    bloom_filters: List[Optional[np.ndarray]],
+    hash_count: int,
+    read_kwargs_provider: Optional[ReadKwargsProvider] = None,
+    primary_key_digest_algorithm: PrimaryKeyDigestAlgorithm = PrimaryKeyDigestAlgorithm.SHA1,
+    deltacat_storage=unimplemented_deltacat_storage,
+) -> np.ndarray:
+    # files without a Bloom filter may always contain any key
+    file_hits = np.array([bf is None for bf in bloom_filters], dtype=np.bool_)
+    delta_file_envelopes = _iterate_delta_file_envelopes(
+        annotated_delta,
+        primary_keys,
+        [],
+        read_kwargs_provider,
+        deltacat_storage=deltacat_storage,
+    )
+    for dfe, _ in delta_file_envelopes:
+        hashes = pbf.bloom_filter_hashes(
+            sc.digest_bytes_np(
+                hash_primary_keys(
+                    dfe.table,
+                    primary_keys,
+                    primary_key_digest_algorithm,
+                )
+            )
+        )
+        for file_index in np.flatnonzero(~file_hits):
+            file_hits[file_index] = pbf.bloom_filter_may_contain(
+                bloom_filters[file_index],
+                hash_count,
+                hashes,
+            ).any()
+        if file_hits.all():
+            break
+    return file_hits
+
+
+@ray.remote
+def probe_bloom_filters(
+    annotated_delta: DeltaAnnotated,
+    primary_keys: List[str],
+    bloom_filters: List[Optional[np.ndarray]],
+    hash_count: int,
+    read_kwargs_provider: Optional[ReadKwargsProvider] = None,
+    primary_key_digest_algorithm: PrimaryKeyDigestAlgorithm = PrimaryKeyDigestAlgorithm.SHA1,
+    deltacat_storage=unimplemented_deltacat_storage,
+) -> np.ndarray:
+    """
+    Tests the primary keys of the given annotated delta against the Bloom
+    filter of each compacted file. Returns a boolean array that is False for
+    each compacted file that provably contains none of the primary keys.
+    """
+    logger.info(f"Starting bloom filter probe task...")
+    file_hits, duration = timed_invocation(
+        func=_timed_probe_bloom_filters,
+        annotated_delta=annotated_delta,
+        primary_keys=primary_keys,
+        bloom_filters=bloom_filters,
+        hash_count=hash_count,
+        read_kwargs_provider=read_kwargs_provider,
+        primary_key_digest_algorithm=primary_key_digest_algorithm,
+        deltacat_storage=deltacat_storage,
+    )
+    logger.info(
+        f"Finished bloom filter probe task in {duration}s. Compacted files "
+        f"that may contain probed keys: {np.count_nonzero(file_hits)}"
+    )
+    return file_hits
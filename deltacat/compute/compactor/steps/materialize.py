@@ -4,22 +4,33 @@ import time
 from uuid import uuid4
 from collections import defaultdict
 from contextlib import nullcontext
-from itertools import chain, repeat
-from typing import List, Optional, Tuple, Dict, Any, Union
+from itertools import repeat
+from typing import List, Optional, Tuple, Dict, Any, Iterable, Union
 import pyarrow as pa
 import numpy as np
 import ray
 from ray import cloudpickle
 from deltacat import logs
 from deltacat.compute.compactor import (
+    DeltaFileLocator,
     MaterializeResult,
+    PrimaryKeyDigestAlgorithm,
+    PrimaryKeyIndexVersionLocator,
     PyArrowWriteResult,
+    RecordIndexRanges,
     RoundCompletionInfo,
+    SortKey,
 )
 from deltacat.compute.compactor.steps.dedupe import (
     DedupeTaskIndexWithObjectId,
     DeltaFileLocatorToRecords,
 )
+from deltacat.compute.compactor.utils import primary_key_bloom_filter as pbf
+from deltacat.compute.compactor.utils import primary_key_index as pki
+from deltacat.compute.compactor.utils import system_columns as sc
+from deltacat.compute.compactor.utils.primary_key_hash import hash_primary_keys
+from deltacat.compute.compactor.utils.materialize_planner import RecordSlices
+from deltacat.constants import RECORDS_PER_PRIMARY_KEY_INDEX_FILE
 from deltacat.storage import (
     Delta,
     DeltaLocator,
@@ -34,11 +45,16 @@ from deltacat.storage import (
 )
 from deltacat.storage import interface as unimplemented_deltacat_storage
 from deltacat.utils.common import ReadKwargsProvider
-from deltacat.types.media import DELIMITED_TEXT_CONTENT_TYPES, ContentType
+from deltacat.types.media import (
+    DELIMITED_TEXT_CONTENT_TYPES,
+    ContentEncoding,
+    ContentType,
+)
 from deltacat.types.tables import TABLE_CLASS_TO_SIZE_FUNC
 from deltacat.utils.performance import timed_invocation
 from deltacat.utils.pyarrow import (
     ReadKwargsProviderPyArrowCsvPureUtf8,
+    ReadKwargsProviderPyArrowParquetRowGroups,
     ReadKwargsProviderPyArrowSchemaOverride,
     RecordBatchTables,
 )
@@ -55,6 +71,86 @@ if importlib.util.find_spec("memray"):
 logger = logs.configure_deltacat_logger(logging.getLogger(__name__))
 
 
+def _record_index_ranges_to_mask(
+    record_index_ranges_list: Iterable[RecordIndexRanges],
+    file_record_count: int,
+) -> np.ndarray:
+    # mark the start and end of each range, then take a running sum to select
+    # every record inside a range
+    range_boundaries = np.zeros(file_record_count + 1, dtype=np.int32)
+    for record_index_ranges in record_index_ranges_list:
+        range_boundaries[record_index_ranges.starts] += 1
+        range_boundaries[record_index_ranges.starts + record_index_ranges.lengths] -= 1
+    return np.cumsum(range_boundaries[:-1]) > 0
+
+
+def _slice_record_mask(
+    mask: np.ndarray,
+    record_slices: List[Tuple[int, int]],
+) -> np.ndarray:
+    # keep only the selected records that fall inside the given slices of the
+    # ordered selected record positions
+    selected_positions = np.flatnonzero(mask)
+    sliced_mask = np.zeros_like(mask)
+    for start, stop in record_slices:
+        sliced_mask[selected_positions[start:stop]] = True
+    return sliced_mask
+
+
+def _download_kept_records(
+    delta: Delta,
+    entry_index: int,
+    mask: Optional[np.ndarray],
+    read_kwargs_provider: Optional[ReadKwargsProvider],
+    enable_row_group_split: bool,
+    deltacat_storage,
+) -> pa.Table:
+    """
+    Downloads the given manifest entry, and keeps only the records selected by
+    the given mask (if any). If row group split is enabled, then only the row
+    groups of an uncompressed Parquet file that span the selected records are
+    requested from the storage layer.
+    """
+    record_range = None
+    entry_read_kwargs_provider = read_kwargs_provider
+    if mask is not None and enable_row_group_split:
+        entry_meta = delta.manifest.entries[entry_index].meta
+        kept_record_indices = np.flatnonzero(mask)
+        if (
+            len(kept_record_indices)
+            and entry_meta.content_type == ContentType.PARQUET.value
+            and entry_meta.content_encoding == ContentEncoding.IDENTITY.value
+        ):
+            # only read the row groups spanned by the kept records
+            start = int(kept_record_indices[0])
+            stop = int(kept_record_indices[-1]) + 1
+            if stop - start < len(mask):
+                record_range = (start, stop)
+                entry_read_kwargs_provider = ReadKwargsProviderPyArrowParquetRowGroups(
+                    record_range=record_range,
+                    delegate=read_kwargs_provider,
+                )
+    pa_table = deltacat_storage.download_delta_manifest_entry(
+        delta,
+        entry_index,
+        file_reader_kwargs_provider=entry_read_kwargs_provider,
+    )
+    if mask is None:
+        return pa_table
+    if record_range is not None:
+        start, stop = record_range
+        if len(pa_table) == stop - start:
+            mask = mask[start:stop]
+        else:
+            # the storage layer read the whole file
+            logger.debug(
+                f"Expected records {record_range} of manifest entry "
+                f"{entry_index} but read {len(pa_table)} records, filtering "
+                f"the whole file."
+            )
+    return pa_table.filter(pa.array(mask))
+
+
 @ray.remote
 def materialize(
     source_partition_locator: PartitionLocator,
@@ -69,8 +165,37 @@ def materialize(
     schema: Optional[pa.Schema] = None,
     read_kwargs_provider: Optional[ReadKwargsProvider] = None,
     s3_table_writer_kwargs: Optional[Dict[str, Any]] = None,
+    src_file_record_slices: Optional[Dict[DeltaFileLocator, RecordSlices]] = None,
+    primary_keys: Optional[List[str]] = None,
+    sort_keys: Optional[List[SortKey]] = None,
+    primary_key_index_version_locator: Optional[PrimaryKeyIndexVersionLocator] = None,
+    compaction_artifact_s3_bucket: Optional[str] = None,
+    bloom_filter_bits_per_key: Optional[int] = None,
+    primary_key_digest_algorithm: PrimaryKeyDigestAlgorithm = PrimaryKeyDigestAlgorithm.SHA1,
+    enable_row_group_split: bool = False,
     deltacat_storage=unimplemented_deltacat_storage,
 ):
+    """
+    Materializes the deduped records of a single materialize bucket into new
+    compacted files, and references any compacted files that are kept whole.
+
+    If a primary key index version locator is given, then the materialize
+    bucket index is a hash bucket index, and the primary key index of the
+    hash bucket's compacted files is written to the compaction artifact S3
+    bucket. Compacted files are ordered as they appear in the merged delta
+    returned, with new files preceding referenced files.
+
+    If a number of Bloom filter bits per key is given, then a primary key
+    Bloom filter is built for each new compacted file, and returned by
+    compacted file URI.
+
+    Primary keys of the primary key index and Bloom filters are digested
+    with the given primary key digest algorithm.
+
+    If row group split is enabled, then only the row groups spanned by the
+    kept records of a partially kept uncompressed Parquet file are read.
+    """
+
     def _stage_delta_implementation(
         data: Union[LocalTable, LocalDataset, DistributedDataset, Manifest],
         partition: Partition,
@@ -107,6 +232,22 @@ def materialize(
     #  https://github.com/ray-project/deltacat/issues/79
     def _materialize(compacted_tables: List[pa.Table]) -> MaterializeResult:
         compacted_table = pa.concat_tables(compacted_tables)
+        index_key_table = (
+            compacted_table.select(index_column_names)
+            if primary_key_index_version_locator
+            else None
+        )
+        bloom_filter_digests = (
+            sc.digest_bytes_np(
+                hash_primary_keys(
+                    compacted_table,
+                    primary_keys,
+                    primary_key_digest_algorithm,
+                )
+            )
+            if bloom_filter_bits_per_key
+            else None
+        )
         if compacted_file_content_type in DELIMITED_TEXT_CONTENT_TYPES:
             # TODO (rkenmi): Investigate if we still need to convert this table to pandas DataFrame
             # TODO (pdames): compare performance to pandas-native materialize path
@@ -129,6 +270,28 @@ def materialize(
             f" of size {compacted_table_size} is: {stage_delta_time}s"
         )
         manifest = delta.manifest
+        if index_key_table is not None:
+            index_tables.append(
+                pki.primary_key_index_table(
+                    index_key_table,
+                    primary_keys,
+                    sort_key_names,
+                    [entry.meta.record_count for entry in manifest.entries],
+                    sum(len(mr.delta.manifest.entries) for mr in materialized_results),
+                    primary_key_digest_algorithm,
+                )
+            )
+        if bloom_filter_digests is not None:
+            first_record_index = 0
+            for entry in manifest.entries:
+                record_count = entry.meta.record_count
+                bloom_filters[entry.uri] = pbf.build_bloom_filter(
+                    bloom_filter_digests[
+                        first_record_index : first_record_index + record_count
+                    ],
+                    bloom_filter_bits_per_key,
+                )
+                first_record_index += record_count
         manifest_records = manifest.meta.record_count
         assert (
             manifest_records == len(compacted_table),
@@ -176,21 +339,38 @@ def materialize(
         all_src_file_records = defaultdict(list)
         for i, src_file_records in enumerate(src_file_records_list):
             dedupe_task_idx = dedupe_task_indices[i]
-            for src_dfl, record_numbers in src_file_records.items():
+            for src_dfl, record_index_ranges in src_file_records.items():
                 all_src_file_records[src_dfl].append(
-                    (record_numbers, repeat(dedupe_task_idx, len(record_numbers)))
+                    (
+                        record_index_ranges,
+                        repeat(dedupe_task_idx, record_index_ranges.record_count),
+                    )
                 )
         manifest_cache = {}
         materialized_results: List[MaterializeResult] = []
+        sort_key_names = [sort_key.key_name for sort_key in sort_keys or []]
+        index_column_names = list(
+            dict.fromkeys([*(primary_keys or []), *sort_key_names])
+        )
+        index_tables: List[pa.Table] = []
+        bloom_filters: Dict[str, np.ndarray] = {}
+        referenced_entry_deltas: List[Tuple[Delta, int]] = []
         record_batch_tables = RecordBatchTables(max_records_per_output_file)
         count_of_src_dfl = 0
         manifest_entry_list_reference = []
         referenced_pyarrow_write_results = []
-        for src_dfl in sorted(all_src_file_records.keys()):
+        # only materialize the files (or record slices of files) assigned to
+        # this task if a materialize plan was provided
+        src_dfls = (
+            sorted(src_file_record_slices.keys())
+            if src_file_record_slices is not None
+            else sorted(all_src_file_records.keys())
+        )
+        for src_dfl in src_dfls:
             record_numbers_dd_task_idx_tpl_list: List[
                 Tuple[DeltaFileLocatorToRecords, repeat]
             ] = all_src_file_records[src_dfl]
-            record_numbers_tpl, dedupe_task_idx_iter_tpl = zip(
+            record_index_ranges_tpl, dedupe_task_idx_iter_tpl = zip(
                 *record_numbers_dd_task_idx_tpl_list
             )
             is_src_partition_file_np = src_dfl.is_source_delta
@@ -224,14 +404,21 @@ def materialize(
                     read_kwargs_provider = ReadKwargsProviderPyArrowSchemaOverride(
                         schema=schema
                     )
-            record_numbers = chain.from_iterable(record_numbers_tpl)
-            record_numbers_length = 0
-            mask_pylist = list(repeat(False, src_file_record_count))
-            for record_number in record_numbers:
-                record_numbers_length += 1
-                mask_pylist[record_number] = True
+            record_numbers_length = sum(
+                record_index_ranges.record_count
+                for record_index_ranges in record_index_ranges_tpl
+            )
+            record_slices = (
+                src_file_record_slices[src_dfl]
+                if src_file_record_slices is not None
+                else [(0, record_numbers_length)]
+            )
+            materialized_record_count = sum(
+                stop - start for start, stop in record_slices
+            )
             if (
-                record_numbers_length == src_file_record_count
+                materialized_record_count == src_file_record_count
+                and round_completion_info
                 and src_file_partition_locator
                 == round_completion_info.compacted_delta_locator.partition_locator
             ):
@@ -242,6 +429,12 @@ def materialize(
                 )
                 untouched_src_manifest_entry = manifest.entries[src_file_idx_np.item()]
                 manifest_entry_list_reference.append(untouched_src_manifest_entry)
+                referenced_entry_deltas.append(
+                    (
+                        Delta.of(delta_locator, None, None, None, manifest),
+                        src_file_idx_np.item(),
+                    )
+                )
                 referenced_pyarrow_write_result = PyArrowWriteResult.of(
                     1,
                     manifest.meta.source_content_length,
@@ -250,19 +443,28 @@ def materialize(
                 )
                 referenced_pyarrow_write_results.append(referenced_pyarrow_write_result)
             else:
+                mask = None
+                if materialized_record_count < src_file_record_count:
+                    mask = _record_index_ranges_to_mask(
+                        record_index_ranges_tpl,
+                        src_file_record_count,
+                    )
+                    if materialized_record_count < record_numbers_length:
+                        mask = _slice_record_mask(mask, record_slices)
                 pa_table, download_delta_manifest_entry_time = timed_invocation(
-                    deltacat_storage.download_delta_manifest_entry,
+                    _download_kept_records,
                     Delta.of(delta_locator, None, None, None, manifest),
                     src_file_idx_np.item(),
-                    file_reader_kwargs_provider=read_kwargs_provider,
+                    mask,
+                    read_kwargs_provider,
+                    enable_row_group_split,
+                    deltacat_storage,
                 )
                 logger.debug(
                     f"Time taken for materialize task"
                     f" to download delta locator {delta_locator} with entry ID {src_file_idx_np.item()}"
                     f" is: {download_delta_manifest_entry_time}s"
                 )
-                mask = pa.array(mask_pylist)
-                pa_table = pa_table.filter(mask)
                 record_batch_tables.append(pa_table)
                 if record_batch_tables.has_batches():
                     batched_tables = record_batch_tables.evict()
@@ -271,6 +473,43 @@ def materialize(
         if record_batch_tables.has_remaining():
             materialized_results.append(_materialize(record_batch_tables.remaining))
 
+        if primary_key_index_version_locator:
+            # index referenced files after all new files of this hash bucket
+            written_file_count = sum(
+                len(mr.delta.manifest.entries) for mr in materialized_results
+            )
+            for i, (referenced_delta, entry_index) in enumerate(
+                referenced_entry_deltas
+            ):
+                index_key_table = deltacat_storage.download_delta_manifest_entry(
+                    referenced_delta,
+                    entry_index,
+                    columns=index_column_names,
+                    file_reader_kwargs_provider=read_kwargs_provider,
+                )
+                index_tables.append(
+                    pki.primary_key_index_table(
+                        index_key_table,
+                        primary_keys,
+                        sort_key_names,
+                        [len(index_key_table)],
+                        written_file_count + i,
+                        primary_key_digest_algorithm,
+                    )
+                )
+            pki_write_result, pki_write_time = timed_invocation(
+                pki.write_primary_key_index_files,
+                pa.concat_tables(index_tables),
+                primary_key_index_version_locator,
+                compaction_artifact_s3_bucket,
+                mat_bucket_index,
+                RECORDS_PER_PRIMARY_KEY_INDEX_FILE,
+            )
+            logger.info(
+                f"Wrote primary key index of hash bucket {mat_bucket_index}: "
+                f"{pki_write_result}, took {pki_write_time}s"
+            )
+
         logger.info(f"Got {count_of_src_dfl} source delta files during materialize")
 
         referenced_manifest_delta = (
@@ -339,6 +578,7 @@ def materialize(
             np.double(peak_memory_usage_bytes),
             np.double(emit_metrics_time),
             np.double(time.time()),
+            bloom_filters if bloom_filter_bits_per_key else None,
         )
 
         return merged_materialize_result
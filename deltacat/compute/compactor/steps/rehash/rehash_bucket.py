@@ -23,7 +23,7 @@ def group_file_records_by_pk_hash_bucket(
     )
     hash_bucket_to_table = np.empty([num_buckets], dtype="object")
     for hash_bucket, indices in enumerate(hash_bucket_to_indices):
-        if indices:
+        if indices is not None:
             hash_bucket_to_table[hash_bucket] = pki_table.take(indices)
     return hash_bucket_to_table
 
@@ -50,7 +50,6 @@ def rehash_bucket(
     )
     hash_bucket_group_to_obj_id, object_refs = pki.group_hash_bucket_indices(
         hash_bucket_to_table,
-        num_buckets,
         num_groups,
     )
     logger.info(f"Finished rehash bucket task...")
@@ -1,5 +1,4 @@
 import logging
-from collections import defaultdict
 from typing import Any, List, Tuple
 
 import pyarrow as pa
@@ -27,11 +26,7 @@ def rewrite_index(
     logger.info(f"Getting table groups object refs...")
     table_groups_list = ray.get(object_refs)
     logger.info(f"Got {len(table_groups_list)} table groups object refs...")
-    hb_index_to_tables = defaultdict(list)
-    for table_groups in table_groups_list:
-        for hb_index, table in enumerate(table_groups):
-            if table is not None:
-                hb_index_to_tables[hb_index].append(table)
+    hb_index_to_tables = pki.group_tables_by_hash_bucket(table_groups_list)
     logger.info(f"Running {len(hb_index_to_tables)} rewrite index rounds...")
     pki_stats = []
     for hb_index, tables in hb_index_to_tables.items():
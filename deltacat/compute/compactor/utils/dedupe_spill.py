@@ -0,0 +1,155 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+
+from deltacat import logs
+from deltacat.compute.compactor.utils import system_columns as sc
+
+logger = logs.configure_deltacat_logger(logging.getLogger(__name__))
+
+SpillFileBatch = Tuple[str, int]
+
+
+class HashBucketSpill:
+    """
+    Spills hash bucket tables of primary key digest and delta file metadata
+    columns to local Arrow IPC files, so that a dedupe task doesn't need to
+    hold all of its hash bucket tables in memory at once.
+
+    The records of each spilled table are partitioned by primary key digest,
+    and every partition of every hash bucket is written as separate record
+    batches. Since records with different digests never dedupe against each
+    other, each partition of a hash bucket can later be read back from all
+    spill files and deduped independently of the others.
+
+    Spill files are removed when the spill is closed.
+    """
+
+    def __init__(self, partition_count: int, spill_dir: Optional[str] = None):
+        self._partition_count = partition_count
+        self._spill_dir = tempfile.mkdtemp(prefix="deltacat-dedupe-", dir=spill_dir)
+        self._lock = threading.Lock()
+        self._file_count = 0
+        self._spilled_bytes = 0
+        self._hb_partition_to_batches: Dict[
+            Tuple[int, int], List[SpillFileBatch]
+        ] = defaultdict(list)
+        logger.info(
+            f"Spilling hash bucket tables in {partition_count} partitions to: "
+            f"{self._spill_dir}"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def partition_count(self) -> int:
+        return self._partition_count
+
+    @property
+    def spilled_bytes(self) -> int:
+        """
+        Total size of all spill files written.
+        """
+        return self._spilled_bytes
+
+    @property
+    def hash_bucket_indices(self) -> List[int]:
+        """
+        Sorted indices of all hash buckets with spilled records.
+        """
+        return sorted(set(hb_idx for hb_idx, _ in self._hb_partition_to_batches))
+
+    def spill(self, hb_index_to_table: Dict[int, pa.Table]) -> None:
+        """
+        Partitions the records of each hash bucket table by primary key digest
+        and writes them to a new spill file. All given tables must share the
+        same schema. Can be called concurrently from multiple threads.
+        """
+        hb_index_to_table = {
+            hb_idx: table for hb_idx, table in hb_index_to_table.items() if len(table)
+        }
+        if not hb_index_to_table:
+            return
+        with self._lock:
+            path = os.path.join(self._spill_dir, f"{self._file_count}.arrow")
+            self._file_count += 1
+        schema = next(iter(hb_index_to_table.values())).schema
+        hb_partition_to_batches = defaultdict(list)
+        batch_count = 0
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, schema) as writer:
+                for hb_idx, table in hb_index_to_table.items():
+                    for partition, partition_table in self._partition(table):
+                        for batch in partition_table.to_batches():
+                            writer.write_batch(batch)
+                            hb_partition_to_batches[(hb_idx, partition)].append(
+                                (path, batch_count)
+                            )
+                            batch_count += 1
+        with self._lock:
+            self._spilled_bytes += os.path.getsize(path)
+            for key, batches in hb_partition_to_batches.items():
+                self._hb_partition_to_batches[key].extend(batches)
+
+    def read_partitions(self, hash_bucket_index: int) -> Iterator[List[pa.Table]]:
+        """
+        Reads the spilled records of the given hash bucket back one digest
+        partition at a time. Yields a list of memory-mapped tables (one per
+        spill file) for each non-empty partition.
+        """
+        for partition in range(self._partition_count):
+            with self._lock:
+                batches = list(
+                    self._hb_partition_to_batches.get(
+                        (hash_bucket_index, partition), []
+                    )
+                )
+            file_to_batches = defaultdict(list)
+            for path, batch_index in batches:
+                file_to_batches[path].append(batch_index)
+            if not file_to_batches:
+                continue
+            tables = []
+            for path, batch_indices in file_to_batches.items():
+                reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+                tables.append(
+                    pa.Table.from_batches(
+                        [reader.get_batch(i) for i in batch_indices],
+                        reader.schema,
+                    )
+                )
+            yield tables
+
+    def close(self) -> None:
+        shutil.rmtree(self._spill_dir, ignore_errors=True)
+
+    def _partition(self, table: pa.Table) -> Iterator[Tuple[int, pa.Table]]:
+        # partition by the leading digest word, since hash bucket indices are
+        # derived from the trailing digest bytes for power-of-2 bucket counts
+        digests = sc.pk_hash_digest_words_np(table)
+        partitions = (
+            digests["high"].astype(np.uint64) % np.uint64(self._partition_count)
+        ).astype(np.int64)
+        # a stable sort preserves the original record order in each partition
+        record_indices = np.argsort(partitions, kind="stable")
+        partition_record_counts = np.bincount(
+            partitions,
+            minlength=self._partition_count,
+        )
+        partition_end_offsets = np.cumsum(partition_record_counts)
+        partitioned_table = table.take(record_indices)
+        for partition in np.flatnonzero(partition_record_counts):
+            end = partition_end_offsets[partition]
+            start = end - partition_record_counts[partition]
+            yield int(partition), partitioned_table.slice(start, end - start)
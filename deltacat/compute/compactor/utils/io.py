@@ -1,24 +1,29 @@
 import logging
 import math
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow.parquet as papq
 from deltacat.compute.stats.models.delta_stats import DeltaStats
 from deltacat.constants import (
     PYARROW_INFLATION_MULTIPLIER,
     BYTES_PER_MEBIBYTE,
     MEMORY_TO_HASH_BUCKET_COUNT_RATIO,
+    MAX_DELTA_MANIFEST_FETCH_PARALLELISM,
 )
 
 from deltacat.storage import (
     PartitionLocator,
     Delta,
+    ManifestEntry,
     interface as unimplemented_deltacat_storage,
 )
 from deltacat import logs
 from deltacat.compute.compactor import DeltaAnnotated
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
 from deltacat.compute.compactor import HighWatermark
 from deltacat.compute.compactor.model.compaction_session_audit_info import (
     CompactionSessionAuditInfo,
 )
+from deltacat.utils.performance import timed_invocation
 
 logger = logs.configure_deltacat_logger(logging.getLogger(__name__))
 
@@ -98,8 +103,27 @@ def limit_input_deltas(
     user_hash_bucket_chunk_size: int,
     input_deltas_stats: Dict[int, DeltaStats],
     compaction_audit: CompactionSessionAuditInfo,
+    row_group_metadata_provider: Optional[
+        Callable[[ManifestEntry], Optional[papq.FileMetaData]]
+    ] = None,
+    source_partition_locator: Optional[PartitionLocator] = None,
+    manifest_fetch_parallelism: int = MAX_DELTA_MANIFEST_FETCH_PARALLELISM,
     deltacat_storage=unimplemented_deltacat_storage,
 ) -> Tuple[List[DeltaAnnotated], int, HighWatermark, bool]:
+    """
+    Limits the input deltas to those that fit in the object store memory of
+    this cluster, and rebatches them into annotated deltas of uniform size.
+
+    If a source partition locator is given, then only its deltas are limited,
+    and only to the longest prefix of its ascending deltas that fits (or to its
+    first delta if none fit). Deltas of all other partitions are always
+    included. Otherwise, all input deltas are limited. Returns the annotated
+    deltas, the hash bucket count, the high watermark of the deltas included,
+    and whether any input deltas were left for a subsequent round.
+
+    Manifests missing from input deltas are fetched concurrently by up to
+    `manifest_fetch_parallelism` threads.
+    """
     # TODO (pdames): when row counts are available in metadata, use them
     #  instead of bytes - memory consumption depends more on number of
     #  input delta records than bytes.
@@ -134,38 +158,78 @@ def limit_input_deltas(
         int(stream_pos): DeltaStats(delta_stats)
         for stream_pos, delta_stats in input_deltas_stats.items()
     }
+    _resolve_delta_manifests(
+        input_deltas,
+        compaction_audit,
+        manifest_fetch_parallelism,
+        deltacat_storage,
+    )
+    input_delta_bytes = []
     for delta in input_deltas:
-        manifest = deltacat_storage.get_delta_manifest(delta)
-        delta.manifest = manifest
-        position = delta.stream_position
+        manifest = delta.manifest
         delta_stats = input_deltas_stats.get(delta.stream_position, DeltaStats())
+        content_bytes = sum(entry.meta.content_length for entry in manifest.entries)
         if delta_stats:
             # TODO (pdames): derive from row count instead of table bytes
-            delta_bytes_pyarrow += delta_stats.stats.pyarrow_table_bytes
+            pyarrow_bytes = delta_stats.stats.pyarrow_table_bytes
         else:
             # TODO (pdames): ensure pyarrow object fits in per-task obj store mem
             logger.warning(
                 f"Stats are missing for delta stream position {delta.stream_position}, "
                 f"materialized delta may not fit in per-task object store memory."
             )
-        manifest_entries = delta.manifest.entries
-        delta_manifest_entries += len(manifest_entries)
-        for entry in manifest_entries:
-            delta_bytes += entry.meta.content_length
-            if not delta_stats:
-                delta_bytes_pyarrow = delta_bytes * PYARROW_INFLATION_MULTIPLIER
+            pyarrow_bytes = content_bytes * PYARROW_INFLATION_MULTIPLIER
+        input_delta_bytes.append((content_bytes, pyarrow_bytes))
+
+    # deltas from any partition other than the source partition (i.e. the
+    # previously compacted deltas) must be compacted in every round
+    is_limited = [
+        source_partition_locator is None
+        or delta.locator.partition_locator.canonical_string()
+        == source_partition_locator.canonical_string()
+        for delta in input_deltas
+    ]
+    required_bytes_pyarrow = sum(
+        pyarrow_bytes
+        for (_, pyarrow_bytes), limited in zip(input_delta_bytes, is_limited)
+        if not limited
+    )
+    if required_bytes_pyarrow > worker_obj_store_mem:
+        logger.warning(
+            f"Previously compacted input deltas ({required_bytes_pyarrow} bytes) "
+            f"don't fit in object store memory ({worker_obj_store_mem} bytes)."
+        )
+    limited_delta_bytes_pyarrow = required_bytes_pyarrow
+    limited_delta_count = 0
+    for delta, (content_bytes, pyarrow_bytes), limited in zip(
+        input_deltas, input_delta_bytes, is_limited
+    ):
+        if limited:
+            # always compact at least one source delta to make progress
+            if require_multiple_rounds or (
+                limited_delta_count
+                and limited_delta_bytes_pyarrow + pyarrow_bytes > worker_obj_store_mem
+            ):
+                if not require_multiple_rounds:
+                    logger.info(
+                        f"Input deltas limited to {limited_delta_count} by "
+                        f"object store mem ({limited_delta_bytes_pyarrow} + "
+                        f"{pyarrow_bytes} > {worker_obj_store_mem})"
+                    )
+                require_multiple_rounds = True
+                continue
+            limited_delta_bytes_pyarrow += pyarrow_bytes
+            limited_delta_count += 1
+        delta_bytes += content_bytes
+        delta_bytes_pyarrow += pyarrow_bytes
+        delta_manifest_entries += len(delta.manifest.entries)
         high_watermark.set(
             delta.locator.partition_locator,
-            max(position, high_watermark.get(delta.locator.partition_locator)),
+            max(
+                delta.stream_position,
+                high_watermark.get(delta.locator.partition_locator),
+            ),
         )
-        if delta_bytes_pyarrow > worker_obj_store_mem:
-            logger.info(
-                f"Input deltas limited to "
-                f"{len(limited_input_da_list)} by object store mem "
-                f"({delta_bytes_pyarrow} > {worker_obj_store_mem})"
-            )
-            require_multiple_rounds = True
-            break
         delta_annotated = DeltaAnnotated.of(delta)
         limited_input_da_list.append(delta_annotated)
 
@@ -238,6 +302,7 @@ def limit_input_deltas(
         limited_input_da_list,
         hash_bucket_chunk_size,
         # TODO (pdames): Test and add value for min_file_counts
+        row_group_metadata_provider=row_group_metadata_provider,
     )
 
     compaction_audit.set_input_size_bytes(delta_bytes)
@@ -257,6 +322,9 @@ def fit_input_deltas(
     cluster_resources: Dict[str, float],
     compaction_audit: CompactionSessionAuditInfo,
     hash_bucket_count: Optional[int],
+    row_group_metadata_provider: Optional[
+        Callable[[ManifestEntry], Optional[papq.FileMetaData]]
+    ] = None,
     deltacat_storage=unimplemented_deltacat_storage,
 ) -> Tuple[List[DeltaAnnotated], int, HighWatermark, bool]:
     """
@@ -265,12 +333,15 @@ def fit_input_deltas(
     It is the responsibility of the caller to ensure that they pass enough resources for the job to execute.
 
     Note: There is a possibility that individual file could be very large, which makes the deltas non uniform.
-    In such scenarios, it is advisable to allocate multiple vCPUs to the tasks to ensure parallelism.
+    In such scenarios, it is advisable to allocate multiple vCPUs to the tasks to ensure parallelism, or to
+    pass a row group metadata provider to split large Parquet files into row group ranges.
 
     Args:
         input_deltas: The input deltas to be normalized.
         cluster_resources: Total available resources in the cluster.
         hash_bucket_count: The hash bucket count.
+        row_group_metadata_provider: Returns the Parquet file metadata of a
+            manifest entry, or None if it can't be split into row group ranges.
         deltacat_storage: An implementation of the DeltaCAT storage interface.
 
     Returns:
@@ -287,6 +358,12 @@ def fit_input_deltas(
     if not input_deltas:
         raise AssertionError("No input deltas found!")
 
+    _resolve_delta_manifests(
+        input_deltas,
+        compaction_audit,
+        MAX_DELTA_MANIFEST_FETCH_PARALLELISM,
+        deltacat_storage,
+    )
     for delta in input_deltas:
         manifest_entries = delta.manifest.entries
         position = delta.stream_position
@@ -315,6 +392,7 @@ def fit_input_deltas(
         annotated_deltas=annotated_input_da_list,
         min_delta_bytes=min_delta_bytes,
         estimation_function=estimate_size,
+        row_group_metadata_provider=row_group_metadata_provider,
     )
 
     # Recommended hash buckets based on the experiments performed
@@ -336,6 +414,41 @@ def fit_input_deltas(
     return rebatched_da_list, hash_bucket_count, high_watermark, False
 
 
+def _resolve_delta_manifests(
+    deltas: List[Delta],
+    compaction_audit: CompactionSessionAuditInfo,
+    max_parallelism: int,
+    deltacat_storage=unimplemented_deltacat_storage,
+) -> None:
+    """
+    Fetches the manifest of each given delta that wasn't discovered with its
+    manifest, with up to `max_parallelism` concurrent fetches, and adds the
+    time taken to the delta discovery time of the compaction audit.
+    """
+    deltas_to_fetch = [delta for delta in deltas if not delta.manifest]
+
+    def fetch_manifests():
+        with ThreadPoolExecutor(
+            max_workers=max(min(max_parallelism, len(deltas_to_fetch)), 1)
+        ) as executor:
+            return list(
+                executor.map(deltacat_storage.get_delta_manifest, deltas_to_fetch)
+            )
+
+    manifests, latency = (
+        timed_invocation(fetch_manifests) if deltas_to_fetch else ([], 0.0)
+    )
+    for delta, manifest in zip(deltas_to_fetch, manifests):
+        delta.manifest = manifest
+    logger.info(
+        f"Fetched {len(deltas_to_fetch)} delta manifests in {latency}s, and "
+        f"reused {len(deltas) - len(deltas_to_fetch)} discovered manifests."
+    )
+    compaction_audit.set_delta_discovery_time_in_seconds(
+        (compaction_audit.delta_discovery_time_in_seconds or 0.0) + latency
+    )
+
+
 def _discover_deltas(
     source_partition_locator: PartitionLocator,
     start_position_exclusive: Optional[int],
@@ -0,0 +1,192 @@
+import heapq
+import logging
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from deltacat import logs
+from deltacat.compute.compactor import (
+    DeltaAnnotated,
+    DeltaFileLocator,
+    RoundCompletionInfo,
+)
+from deltacat.compute.compactor.model.dedupe_result import DedupeResult
+from deltacat.compute.compactor.steps.dedupe import DedupeTaskIndexWithObjectId
+
+logger = logs.configure_deltacat_logger(logging.getLogger(__name__))
+
+# (is source delta, stream position, file index) of a delta manifest entry
+DeltaFileKey = Tuple[bool, int, int]
+
+# half-open [start, stop) ranges over the ordered records kept from a file
+RecordSlices = List[Tuple[int, int]]
+
+MaterializeTaskPlan = Tuple[
+    List[DedupeTaskIndexWithObjectId],
+    Dict[DeltaFileLocator, RecordSlices],
+]
+
+
+def delta_file_content_lengths(
+    annotated_deltas: List[DeltaAnnotated],
+    round_completion_info: Optional[RoundCompletionInfo],
+) -> Dict[DeltaFileKey, int]:
+    """
+    Returns the content length of each manifest entry in the given annotated
+    deltas, keyed by the source delta flag, stream position, and file index
+    used to locate the same file in dedupe output.
+    """
+    content_lengths = {}
+    for annotated_delta in annotated_deltas:
+        is_src_delta = (
+            not round_completion_info
+            or annotated_delta.locator.partition_locator
+            != round_completion_info.compacted_delta_locator.partition_locator
+        )
+        for annotation, entry in zip(
+            annotated_delta.annotations,
+            annotated_delta.manifest.entries,
+        ):
+            key = (
+                is_src_delta,
+                annotation.annotation_stream_position,
+                annotation.annotation_file_index,
+            )
+            content_lengths[key] = entry.meta.content_length or 0
+    return content_lengths
+
+
+def _is_untouched(src_dfl: DeltaFileLocator, record_count: int) -> bool:
+    # compacted files that keep all of their records are referenced as-is by
+    # materialize instead of being downloaded and rewritten
+    return not src_dfl.is_source_delta and record_count == src_dfl.file_record_count
+
+
+def _record_slices(record_count: int, slice_count: int) -> RecordSlices:
+    return [
+        (record_count * i // slice_count, record_count * (i + 1) // slice_count)
+        for i in range(slice_count)
+    ]
+
+
+def plan_materialize_tasks(
+    dedupe_results: List[DedupeResult],
+    num_tasks: int,
+    content_lengths: Optional[Dict[DeltaFileKey, int]] = None,
+    min_records_per_slice: int = 1,
+) -> List[MaterializeTaskPlan]:
+    """
+    Assigns the records kept by dedupe to at most `num_tasks` materialize
+    tasks, so that each task materializes an approximately equal share of the
+    records and bytes kept. The cost of each file is the sum of its share of
+    all kept records and its share of all kept bytes, where kept bytes are
+    estimated by scaling the file's content length by the fraction of its
+    records kept. Files that cost more than an even share of the total are
+    split into equally sized record slices of at least
+    `min_records_per_slice` records, and files or slices are assigned
+    to tasks from largest to smallest by always picking the least loaded
+    task. Untouched compacted files cost nothing to materialize, so they're
+    spread evenly by count.
+
+    Returns the dedupe output objects to read and the record slices to
+    materialize per source file for each non-empty task.
+    """
+    if content_lengths is None:
+        content_lengths = {}
+    src_file_record_counts: Dict[DeltaFileLocator, int] = defaultdict(int)
+    src_file_obj_ids: Dict[
+        DeltaFileLocator, List[DedupeTaskIndexWithObjectId]
+    ] = defaultdict(list)
+    for dd_result in dedupe_results:
+        for (
+            mat_bucket,
+            src_file_record_count,
+        ) in dd_result.mat_bucket_idx_to_src_file_record_count.items():
+            dd_task_idx_and_obj_id = dd_result.mat_bucket_idx_to_obj_id[mat_bucket]
+            for src_dfl, record_count in src_file_record_count.items():
+                src_file_record_counts[src_dfl] += int(record_count)
+                src_file_obj_ids[src_dfl].append(dd_task_idx_and_obj_id)
+
+    src_file_bytes = {}
+    for src_dfl, record_count in src_file_record_counts.items():
+        content_length = content_lengths.get(
+            (
+                bool(src_dfl.is_source_delta),
+                int(src_dfl.stream_position),
+                int(src_dfl.file_index),
+            ),
+            0,
+        )
+        file_record_count = int(src_dfl.file_record_count)
+        src_file_bytes[src_dfl] = (
+            content_length * record_count / file_record_count
+            if file_record_count
+            else 0
+        )
+    touched_src_dfls = [
+        src_dfl
+        for src_dfl, record_count in src_file_record_counts.items()
+        if not _is_untouched(src_dfl, record_count)
+    ]
+    total_records = sum(src_file_record_counts[dfl] for dfl in touched_src_dfls)
+    total_bytes = sum(src_file_bytes[dfl] for dfl in touched_src_dfls)
+
+    def file_cost(src_dfl: DeltaFileLocator) -> float:
+        if _is_untouched(src_dfl, src_file_record_counts[src_dfl]):
+            return 0.0
+        cost = 0.0
+        if total_records:
+            cost += src_file_record_counts[src_dfl] / total_records
+        if total_bytes:
+            cost += src_file_bytes[src_dfl] / total_bytes
+        return cost
+
+    src_file_costs = {dfl: file_cost(dfl) for dfl in src_file_record_counts}
+    target_task_cost = sum(src_file_costs.values()) / num_tasks
+
+    # split files that cost more than an even share into record slices
+    items: List[Tuple[float, DeltaFileLocator, Tuple[int, int]]] = []
+    for src_dfl in sorted(src_file_record_counts.keys()):
+        record_count = src_file_record_counts[src_dfl]
+        cost = src_file_costs[src_dfl]
+        slice_count = 1
+        if target_task_cost > 0 and cost > target_task_cost:
+            slice_count = min(
+                math.ceil(cost / target_task_cost),
+                max(record_count // min_records_per_slice, 1),
+                num_tasks,
+            )
+        if slice_count > 1:
+            logger.info(
+                f"Splitting {record_count} records kept from {src_dfl} "
+                f"across {slice_count} materialize tasks."
+            )
+        for record_slice in _record_slices(record_count, slice_count):
+            items.append((cost / slice_count, src_dfl, record_slice))
+
+    # assign the largest remaining item to the least loaded task
+    items.sort(key=lambda item: item[0], reverse=True)
+    task_loads = [(0.0, 0, task_idx) for task_idx in range(num_tasks)]
+    task_src_file_record_slices: List[Dict[DeltaFileLocator, RecordSlices]] = [
+        defaultdict(list) for _ in range(num_tasks)
+    ]
+    for cost, src_dfl, record_slice in items:
+        load, file_count, task_idx = heapq.heappop(task_loads)
+        task_src_file_record_slices[task_idx][src_dfl].append(record_slice)
+        heapq.heappush(task_loads, (load + cost, file_count + 1, task_idx))
+
+    plans = []
+    for src_file_record_slices in task_src_file_record_slices:
+        if not src_file_record_slices:
+            continue
+        # read each dedupe output object only once per task
+        dd_task_idx_and_obj_ids = {}
+        for src_dfl in src_file_record_slices:
+            for dd_task_idx_and_obj_id in src_file_obj_ids[src_dfl]:
+                dd_task_idx_and_obj_ids[dd_task_idx_and_obj_id] = None
+        plans.append((list(dd_task_idx_and_obj_ids), dict(src_file_record_slices)))
+    logger.info(
+        f"Planned {len(plans)} materialize tasks for {len(items)} file slices "
+        f"from {len(src_file_record_counts)} files."
+    )
+    return plans
@@ -0,0 +1,166 @@
+import json
+import logging
+import math
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as papq
+
+from deltacat import logs
+from deltacat.aws import s3u
+from deltacat.storage import PartitionLocator
+
+logger = logs.configure_deltacat_logger(logging.getLogger(__name__))
+
+_URI_COLUMN_NAME = "uri"
+_BLOOM_FILTER_COLUMN_NAME = "bloom_filter"
+_PRIMARY_KEYS_METADATA_KEY = b"primary_keys"
+_HASH_COUNT_METADATA_KEY = b"hash_count"
+
+# minimum number of bits in a Bloom filter
+_MIN_BIT_COUNT = 64
+
+
+def bloom_filter_hash_count(bits_per_key: int) -> int:
+    """
+    Returns the number of hash functions that minimizes the false positive
+    rate of a Bloom filter with the given number of bits per key.
+    """
+    return max(1, round(bits_per_key * math.log(2)))
+
+
+def bloom_filter_hashes(digests: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Derives the two base hashes used to set and test Bloom filter bits from a
+    2D uint8 array of primary key digests (one digest per row). Since the
+    digests are already uniformly distributed, the first two 8-byte words of
+    each digest are used directly.
+    """
+    words = np.ascontiguousarray(digests[:, :16]).view("<u8")
+    # an odd second hash ensures that all bit positions of a digest differ
+    return words[:, 0], words[:, 1] | np.uint64(1)
+
+
+def _bit_positions(
+    hashes: Tuple[np.ndarray, np.ndarray],
+    bit_count: int,
+    hash_count: int,
+) -> np.ndarray:
+    # double hashing: the i-th bit position of a key is (h1 + i * h2) % m,
+    # relying on wrapping unsigned 64-bit arithmetic
+    h1, h2 = hashes
+    multipliers = np.arange(hash_count, dtype=np.uint64)
+    return (h1[:, None] + h2[:, None] * multipliers) % np.uint64(bit_count)
+
+
+def build_bloom_filter(digests: np.ndarray, bits_per_key: int) -> np.ndarray:
+    """
+    Builds a Bloom filter over the given 2D uint8 array of primary key
+    digests with the given number of bits per key. Returns the Bloom filter
+    as a 1D uint8 array of packed bits.
+    """
+    bit_count = max(_MIN_BIT_COUNT, math.ceil(len(digests) * bits_per_key / 8) * 8)
+    bits = np.zeros(bit_count, dtype=np.bool_)
+    positions = _bit_positions(
+        bloom_filter_hashes(digests),
+        bit_count,
+        bloom_filter_hash_count(bits_per_key),
+    )
+    bits[positions.ravel()] = True
+    return np.packbits(bits, bitorder="little")
+
+
+def bloom_filter_may_contain(
+    bloom_filter: np.ndarray,
+    hash_count: int,
+    hashes: Tuple[np.ndarray, np.ndarray],
+) -> np.ndarray:
+    """
+    Tests the keys with the given Bloom filter hashes against a Bloom filter.
+    Returns a boolean array that is False for each key that is definitely not
+    in the Bloom filter, and True for each key that may be in it.
+    """
+    positions = _bit_positions(hashes, len(bloom_filter) * 8, hash_count)
+    bits = (bloom_filter[positions >> np.uint64(3)] >> (positions & np.uint64(7))) & 1
+    return bits.all(axis=1)
+
+
+def get_bloom_filters_s3_url(
+    bucket: str,
+    partition_locator: PartitionLocator,
+) -> str:
+    """
+    Returns a new unique S3 URL to write the compacted file Bloom filters of
+    the given round completion file partition to.
+    """
+    base_url = partition_locator.path(f"s3://{bucket}/bloom-filters")
+    return f"{base_url}/{uuid4()}.parquet"
+
+
+def write_bloom_filters(
+    s3_url: str,
+    bloom_filters: Dict[str, np.ndarray],
+    primary_keys: List[str],
+    hash_count: int,
+) -> None:
+    """
+    Writes the given Bloom filters of each compacted file URI to a single
+    Parquet file at the given S3 URL.
+    """
+    table = pa.table(
+        {
+            _URI_COLUMN_NAME: pa.array(list(bloom_filters.keys()), pa.string()),
+            _BLOOM_FILTER_COLUMN_NAME: pa.array(
+                [bloom_filter.tobytes() for bloom_filter in bloom_filters.values()],
+                pa.large_binary(),
+            ),
+        }
+    ).replace_schema_metadata(
+        {
+            _PRIMARY_KEYS_METADATA_KEY: json.dumps(primary_keys),
+            _HASH_COUNT_METADATA_KEY: str(hash_count),
+        }
+    )
+    buffer = pa.BufferOutputStream()
+    papq.write_table(table, buffer)
+    s3u.upload(s3_url, buffer.getvalue().to_pybytes())
+    logger.info(f"Wrote {len(table)} compacted file Bloom filters to: {s3_url}")
+
+
+def read_bloom_filters(
+    s3_url: str,
+    primary_keys: List[str],
+    hash_count: int,
+) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Reads the Bloom filters of each compacted file URI from the given S3 URL.
+    Returns None if the Bloom filters weren't found, or were built over
+    different primary keys or with a different number of hash functions.
+    """
+    result = s3u.download(s3_url, False)
+    if not result:
+        logger.info(f"Compacted file Bloom filters not found: {s3_url}")
+        return None
+    table = papq.read_table(pa.BufferReader(result["Body"].read()))
+    metadata = table.schema.metadata or {}
+    if json.loads(metadata.get(_PRIMARY_KEYS_METADATA_KEY, b"null")) != primary_keys:
+        logger.info(
+            f"Ignoring compacted file Bloom filters built over different "
+            f"primary keys: {metadata.get(_PRIMARY_KEYS_METADATA_KEY)}"
+        )
+        return None
+    if int(metadata.get(_HASH_COUNT_METADATA_KEY, 0)) != hash_count:
+        logger.info(
+            f"Ignoring compacted file Bloom filters built with a different "
+            f"hash count: {metadata.get(_HASH_COUNT_METADATA_KEY)}"
+        )
+        return None
+    return {
+        uri: np.frombuffer(bloom_filter, dtype=np.uint8)
+        for uri, bloom_filter in zip(
+            table[_URI_COLUMN_NAME].to_pylist(),
+            table[_BLOOM_FILTER_COLUMN_NAME].to_pylist(),
+        )
+    }
@@ -0,0 +1,239 @@
+import hashlib
+import logging
+from typing import List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from deltacat import logs
+from deltacat.compute.compactor.model.primary_key_digest_algorithm import (
+    PrimaryKeyDigestAlgorithm,
+)
+from deltacat.compute.compactor.utils import system_columns as sc
+
+logger = logs.configure_deltacat_logger(logging.getLogger(__name__))
+
+PK_BYTES_DELIMITER = b"L6kl7u5f"
+
+# Primary key column types whose Arrow string cast is byte-identical to the
+# `str()` of the equivalent NumPy scalar (when the column contains no nulls).
+_LEGACY_COMPATIBLE_TYPE_CHECKS = [
+    pa.types.is_integer,
+    pa.types.is_string,
+    pa.types.is_large_string,
+]
+
+_MURMUR3_C1 = np.uint64(0x87C37B91114253D5)
+_MURMUR3_C2 = np.uint64(0x4CF5AD432745937F)
+_MURMUR3_BLOCK_BYTE_WIDTH = 16
+
+
+def hash_primary_keys(
+    table: pa.Table,
+    primary_keys: List[str],
+    digest_algorithm: PrimaryKeyDigestAlgorithm = PrimaryKeyDigestAlgorithm.SHA1,
+) -> pa.ChunkedArray:
+    """
+    Generates the primary key digest column for the given table by
+    converting all primary key columns to UTF-8 strings, joining them with
+    a common delimiter, and taking the digest of each joined value with the
+    given digest algorithm.
+
+    String conversion and joining run over whole Arrow arrays, and digests
+    are written directly into a fixed-width binary buffer for each table
+    chunk, so no intermediate Python objects are created per primary key
+    column value.
+
+    The digest of each record is byte-identical to the digest produced by
+    stringifying each primary key value via its NumPy representation (i.e.
+    the digest used by all prior compaction rounds). Primary key columns
+    whose Arrow string representation differs from their NumPy string
+    representation (e.g. floats, timestamps, booleans, or any column
+    containing nulls) fall back to per-value conversion.
+
+    SHA1 digests each joined value in a Python loop, while MurmurHash3
+    digests all joined values of a chunk at once with vectorized NumPy
+    operations over the chunk's UTF-8 data buffer.
+    """
+    utf8_columns = [_pk_column_to_utf8(table[pk_name]) for pk_name in primary_keys]
+    if len(utf8_columns) == 1:
+        joined = utf8_columns[0]
+    else:
+        joined = pc.binary_join_element_wise(
+            *utf8_columns,
+            pa.scalar(PK_BYTES_DELIMITER.decode("utf-8"), pa.large_string()),
+        )
+    digest_array = (
+        _murmur3_digest_array
+        if PrimaryKeyDigestAlgorithm(digest_algorithm)
+        is PrimaryKeyDigestAlgorithm.MURMUR3_X64_128
+        else _sha1_digest_array
+    )
+    return pa.chunked_array(
+        [digest_array(chunk) for chunk in joined.chunks],
+        sc._PK_HASH_COLUMN_TYPE,
+    )
+
+
+def _pk_column_to_utf8(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    if column.null_count == 0 and any(
+        type_check(column.type) for type_check in _LEGACY_COMPATIBLE_TYPE_CHECKS
+    ):
+        return pc.cast(column, pa.large_string())
+    # casting a primary key column to numpy also ensures no nulls exist
+    # TODO (pdames): catch error in cast to numpy and print user-friendly err msg.
+    return pa.chunked_array(
+        [pa.array([str(value) for value in column.to_numpy()], pa.large_string())],
+        pa.large_string(),
+    )
+
+
+def _sha1_digest_array(utf8_array: pa.Array) -> pa.Array:
+    utf8_array = utf8_array.cast(pa.large_string())
+    record_count = len(utf8_array)
+    if not record_count:
+        return pa.array([], sc._PK_HASH_COLUMN_TYPE)
+    _, offsets_buffer, data_buffer = utf8_array.buffers()
+    offsets = np.frombuffer(offsets_buffer, dtype=np.int64)[
+        utf8_array.offset : utf8_array.offset + record_count + 1
+    ]
+    data = memoryview(data_buffer) if data_buffer is not None else memoryview(b"")
+    sha1 = hashlib.sha1
+    digests = b"".join(
+        [
+            sha1(data[start:end]).digest()
+            for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())
+        ]
+    )
+    return pa.FixedSizeBinaryArray.from_buffers(
+        sc._PK_HASH_COLUMN_TYPE,
+        record_count,
+        [None, pa.py_buffer(digests)],
+    )
+
+
+def _rotl64(values: np.ndarray, bits: int) -> np.ndarray:
+    return (values << np.uint64(bits)) | (values >> np.uint64(64 - bits))
+
+
+def _fmix64(values: np.ndarray) -> np.ndarray:
+    values ^= values >> np.uint64(33)
+    values *= np.uint64(0xFF51AFD7ED558CCD)
+    values ^= values >> np.uint64(33)
+    values *= np.uint64(0xC4CEB9FE1A85EC53)
+    values ^= values >> np.uint64(33)
+    return values
+
+
+def _load_u64(
+    words: np.ndarray,
+    byte_offsets: np.ndarray,
+    byte_counts: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    # load the little-endian uint64 starting at each (unaligned) byte offset
+    # of the given aligned words, keeping only its first `byte_counts` bytes
+    word_offsets = byte_offsets >> 3
+    shifts = (byte_offsets & 7).astype(np.uint64) << np.uint64(3)
+    values = words[word_offsets] >> shifts
+    values |= np.where(
+        shifts > 0,
+        words[word_offsets + 1] << (np.uint64(64) - shifts),
+        np.uint64(0),
+    )
+    if byte_counts is not None:
+        bit_counts = np.clip(byte_counts, 0, 8).astype(np.uint64) << np.uint64(3)
+        values &= np.where(
+            bit_counts < 64,
+            (np.uint64(1) << bit_counts) - np.uint64(1),
+            np.uint64(0xFFFFFFFFFFFFFFFF),
+        )
+    return values
+
+
+def _murmur3_digest_array(utf8_array: pa.Array) -> pa.Array:
+    utf8_array = utf8_array.cast(pa.large_string())
+    record_count = len(utf8_array)
+    if not record_count:
+        return pa.array([], sc._PK_HASH_COLUMN_TYPE)
+    _, offsets_buffer, data_buffer = utf8_array.buffers()
+    offsets = np.frombuffer(offsets_buffer, dtype=np.int64)[
+        utf8_array.offset : utf8_array.offset + record_count + 1
+    ]
+    # view the data as aligned little-endian uint64 words, padded so that
+    # words loaded past the end of the last value remain in bounds
+    words = np.zeros(offsets[-1] // 8 + 3, dtype="<u8")
+    if data_buffer is not None:
+        words.view(np.uint8)[: offsets[-1]] = np.frombuffer(
+            data_buffer, dtype=np.uint8
+        )[: offsets[-1]]
+    words = words.astype(np.uint64, copy=False)
+    starts = offsets[:-1]
+    lengths = np.diff(offsets)
+    block_counts = lengths // _MURMUR3_BLOCK_BYTE_WIDTH
+
+    # mix each 16-byte block of each value into its hash state (seed 0)
+    h1 = np.zeros(record_count, dtype=np.uint64)
+    h2 = np.zeros(record_count, dtype=np.uint64)
+    for block in range(int(block_counts.max())):
+        indices = np.flatnonzero(block_counts > block)
+        if len(indices) == record_count:
+            indices = slice(None)
+        block_starts = starts[indices] + block * _MURMUR3_BLOCK_BYTE_WIDTH
+        k1 = _load_u64(words, block_starts)
+        k2 = _load_u64(words, block_starts + 8)
+        block_h1, block_h2 = h1[indices], h2[indices]
+        k1 *= _MURMUR3_C1
+        k1 = _rotl64(k1, 31)
+        k1 *= _MURMUR3_C2
+        block_h1 ^= k1
+        block_h1 = _rotl64(block_h1, 27)
+        block_h1 += block_h2
+        block_h1 = block_h1 * np.uint64(5) + np.uint64(0x52DCE729)
+        k2 *= _MURMUR3_C2
+        k2 = _rotl64(k2, 33)
+        k2 *= _MURMUR3_C1
+        block_h2 ^= k2
+        block_h2 = _rotl64(block_h2, 31)
+        block_h2 += block_h1
+        block_h2 = block_h2 * np.uint64(5) + np.uint64(0x38495AB5)
+        h1[indices], h2[indices] = block_h1, block_h2
+
+    # mix the remaining tail bytes of each value (zero words are no-ops)
+    tail_starts = starts + block_counts * _MURMUR3_BLOCK_BYTE_WIDTH
+    tail_lengths = lengths - block_counts * _MURMUR3_BLOCK_BYTE_WIDTH
+    k1 = _load_u64(words, tail_starts, tail_lengths)
+    k2 = _load_u64(words, tail_starts + 8, tail_lengths - 8)
+    k2 *= _MURMUR3_C2
+    k2 = _rotl64(k2, 33)
+    k2 *= _MURMUR3_C1
+    h2 ^= k2
+    k1 *= _MURMUR3_C1
+    k1 = _rotl64(k1, 31)
+    k1 *= _MURMUR3_C2
+    h1 ^= k1
+
+    # finalize
+    lengths = lengths.astype(np.uint64)
+    h1 ^= lengths
+    h2 ^= lengths
+    h1 += h2
+    h2 += h1
+    h1 = _fmix64(h1)
+    h2 = _fmix64(h2)
+    h1 += h2
+    h2 += h1
+
+    # the 128-bit hash fills the first 16 digest bytes (in the little-endian
+    # byte order of MurmurHash3 implementations), and the last 4 digest bytes
+    # hold the low bits of both halves mixed together, so that every digest
+    # byte is uniformly distributed for hash bucketing
+    h3 = _fmix64(h1 ^ _rotl64(h2, 32))
+    digests = np.empty([record_count, sc._PK_HASH_DIGEST_BYTE_WIDTH], dtype=np.uint8)
+    digests[:, :16] = np.stack([h1, h2], axis=1).astype("<u8").view(np.uint8)
+    digests[:, 16:] = h3.astype("<u4").view(np.uint8).reshape(-1, 4)
+    return pa.FixedSizeBinaryArray.from_buffers(
+        sc._PK_HASH_COLUMN_TYPE,
+        record_count,
+        [None, pa.py_buffer(digests)],
+    )
@@ -13,19 +13,29 @@ from ray.types import ObjectRef
 from deltacat import logs
 from deltacat.aws import s3u
 from deltacat.compute.compactor import (
+    DeltaFileEnvelope,
     PrimaryKeyIndexLocator,
     PrimaryKeyIndexMeta,
     PrimaryKeyIndexVersionLocator,
     PrimaryKeyIndexVersionMeta,
+    PrimaryKeyDigestAlgorithm,
     PyArrowWriteResult,
     RoundCompletionInfo,
+    SortKey,
+)
+from deltacat.compute.compactor.model.primary_key_index_hash_bucket import (
+    PrimaryKeyIndexHashBucket,
 )
 from deltacat.compute.compactor.steps.rehash import rehash_bucket as rb
 from deltacat.compute.compactor.steps.rehash import rewrite_index as ri
 from deltacat.compute.compactor.utils import round_completion_file as rcf
 from deltacat.compute.compactor.utils import system_columns as sc
-from deltacat.constants import PRIMARY_KEY_INDEX_WRITE_BOTO3_CONFIG
-from deltacat.storage import Manifest, PartitionLocator
+from deltacat.compute.compactor.utils.primary_key_hash import hash_primary_keys
+from deltacat.constants import (
+    PRIMARY_KEY_INDEX_ALGORITHM_VERSION,
+    PRIMARY_KEY_INDEX_WRITE_BOTO3_CONFIG,
+)
+from deltacat.storage import DeltaType, Manifest, PartitionLocator
 from deltacat.types.media import ContentEncoding, ContentType
 from deltacat.types.tables import get_table_slicer, get_table_writer
 from deltacat.utils.common import ReadKwargsProvider
@@ -33,6 +43,9 @@ from deltacat.utils.ray_utils.concurrency import invoke_parallel
 
 logger = logs.configure_deltacat_logger(logging.getLogger(__name__))
 
+# max hash bucket count supported by vectorized hash bucket index assignment
+_MAX_VECTORIZED_HASH_BUCKET_COUNT = 2**47
+
 
 def rehash(
     options_provider: Callable[[int, Any], Dict[str, Any]],
@@ -175,6 +188,143 @@ def download_hash_bucket_entries(
     return tables
 
 
+def primary_key_index_table(
+    table: pa.Table,
+    primary_keys: List[str],
+    sort_key_names: List[str],
+    file_record_counts: List[int],
+    first_file_index: int = 0,
+    digest_algorithm: PrimaryKeyDigestAlgorithm = PrimaryKeyDigestAlgorithm.SHA1,
+) -> pa.Table:
+    """
+    Builds the primary key index of the given compacted table, whose records
+    were written in order to consecutive files holding the given number of
+    records each. The index holds the sort key columns, primary key digest,
+    file index, and record index (within its file) of every record. File
+    indices are relative to the first compacted file of the hash bucket, and
+    start at `first_file_index`. Primary keys are digested with the given
+    digest algorithm.
+    """
+    file_record_counts = np.asarray(file_record_counts, dtype=np.int64)
+    file_starts = np.cumsum(file_record_counts) - file_record_counts
+    file_indices = np.repeat(
+        np.arange(first_file_index, first_file_index + len(file_record_counts)),
+        file_record_counts,
+    )
+    record_indices = np.arange(len(table)) - np.repeat(file_starts, file_record_counts)
+    # primary key columns are dropped from hash bucket tables before dedupe
+    index_table = sc.append_pk_hash_column(
+        table.select([name for name in sort_key_names if name not in primary_keys]),
+        hash_primary_keys(table, primary_keys, digest_algorithm),
+    )
+    index_table = sc.append_file_idx_column(index_table, file_indices)
+    return sc.append_record_idx_col(index_table, record_indices)
+
+
+def primary_key_index_to_delta_file_envelopes(
+    index_table: pa.Table,
+    pki_hash_bucket: PrimaryKeyIndexHashBucket,
+) -> List[DeltaFileEnvelope]:
+    """
+    Splits the primary key index of a hash bucket, ordered by file index and
+    record index, into one upsert delta file envelope per compacted file. The
+    envelopes can be deduped together with the hash bucket's new records in
+    place of the compacted files themselves.
+    """
+    file_indices = sc.file_index_column_np(index_table)
+    is_file_start = np.ones(len(index_table), dtype=bool)
+    is_file_start[1:] = file_indices[1:] != file_indices[:-1]
+    file_starts = np.flatnonzero(is_file_start)
+    file_lengths = np.diff(np.append(file_starts, len(index_table)))
+    hb_table = index_table.drop([sc._ORDERED_FILE_IDX_COLUMN_NAME])
+    delta_file_envelopes = []
+    for file_start, file_length in zip(file_starts, file_lengths):
+        file_index = int(file_indices[file_start])
+        delta_file_envelopes.append(
+            DeltaFileEnvelope.of(
+                stream_position=pki_hash_bucket.compacted_stream_position,
+                file_index=pki_hash_bucket.first_file_index + file_index,
+                delta_type=DeltaType.UPSERT,
+                table=hb_table.slice(file_start, file_length),
+                is_src_delta=np.bool_(False),
+                file_record_count=pki_hash_bucket.file_record_counts[file_index],
+            )
+        )
+    return delta_file_envelopes
+
+
+def primary_key_index_hash_buckets(
+    round_completion_info: RoundCompletionInfo,
+    compacted_manifest: Manifest,
+    primary_keys: List[str],
+    sort_keys: List[SortKey],
+    hash_bucket_count: Optional[int],
+) -> Optional[List[Optional[PrimaryKeyIndexHashBucket]]]:
+    """
+    Returns the primary key index of each hash bucket of the compacted delta
+    of the given round completion info (or None for empty hash buckets).
+    Returns None if the round didn't write a primary key index, or if its
+    primary key index can't be used to compact with the given primary keys,
+    sort keys, and hash bucket count.
+    """
+    pki_version_locator = round_completion_info.primary_key_index_version_locator
+    hash_bucket_file_counts = round_completion_info.hash_bucket_file_counts
+    if not pki_version_locator or hash_bucket_file_counts is None:
+        return None
+    pki_version_meta = pki_version_locator.primary_key_index_version_meta
+    pki_meta = pki_version_meta.primary_key_index_meta
+    if (
+        list(pki_meta.primary_keys) != list(primary_keys)
+        or [tuple(sk) for sk in pki_meta.sort_keys] != [tuple(sk) for sk in sort_keys]
+        or pki_meta.primary_key_index_algorithm_version
+        != PRIMARY_KEY_INDEX_ALGORITHM_VERSION
+    ):
+        logger.info(
+            f"Primary key index {pki_meta} doesn't match primary keys "
+            f"{primary_keys}, sort keys {sort_keys}, and algorithm version "
+            f"{PRIMARY_KEY_INDEX_ALGORITHM_VERSION}."
+        )
+        return None
+    if hash_bucket_count and hash_bucket_count != pki_version_meta.hash_bucket_count:
+        logger.info(
+            f"Primary key index hash bucket count "
+            f"({pki_version_meta.hash_bucket_count}) doesn't match hash bucket "
+            f"count ({hash_bucket_count})."
+        )
+        return None
+    if sum(hash_bucket_file_counts) != len(compacted_manifest.entries):
+        logger.warning(
+            f"Primary key index hash bucket file count "
+            f"({sum(hash_bucket_file_counts)}) doesn't match compacted delta "
+            f"manifest entry count ({len(compacted_manifest.entries)})."
+        )
+        return None
+
+    stream_position = round_completion_info.compacted_delta_locator.stream_position
+    first_file_indices = np.cumsum(hash_bucket_file_counts) - hash_bucket_file_counts
+    pki_hash_buckets = []
+    for hb_index, root_path in enumerate(
+        round_completion_info.hash_bucket_index_version_root_paths
+    ):
+        file_count = hash_bucket_file_counts[hb_index]
+        if root_path is None or not file_count:
+            pki_hash_buckets.append(None)
+            continue
+        first_file_index = int(first_file_indices[hb_index])
+        pki_hash_buckets.append(
+            PrimaryKeyIndexHashBucket(
+                PrimaryKeyIndexVersionLocator.of(pki_version_meta, root_path),
+                stream_position,
+                first_file_index,
+                [
+                    compacted_manifest.entries[i].meta.record_count
+                    for i in range(first_file_index, first_file_index + file_count)
+                ],
+            )
+        )
+    return pki_hash_buckets
+
+
 def delete_primary_key_index_version(
     s3_bucket: str, pki_version_locator: PrimaryKeyIndexVersionLocator
 ) -> None:
@@ -190,23 +340,82 @@ def delete_primary_key_index_version(
 def group_record_indices_by_hash_bucket(
     pki_table: pa.Table, num_buckets: int
 ) -> np.ndarray:
+    """
+    Groups the record indices of the given table by the hash bucket of each
+    record's primary key digest. Returns an object array of length
+    `num_buckets` whose elements are either None (if no records belong to
+    the hash bucket) or an ascending int64 array of record indices.
+    """
 
     hash_bucket_to_indices = np.empty([num_buckets], dtype="object")
-    record_index = 0
-    for digest in sc.pk_hash_column_np(pki_table):
-        hash_bucket = pk_digest_to_hash_bucket_index(digest, num_buckets)
-        if hash_bucket_to_indices[hash_bucket] is None:
-            hash_bucket_to_indices[hash_bucket] = []
-        hash_bucket_to_indices[hash_bucket].append(record_index)
-        record_index += 1
+    if not len(pki_table):
+        return hash_bucket_to_indices
+    hash_buckets = pk_digests_to_hash_bucket_indices(
+        sc.pk_hash_digest_bytes_np(pki_table),
+        num_buckets,
+    )
+    # a stable sort preserves the original record order within each bucket
+    record_indices = np.argsort(hash_buckets, kind="stable")
+    bucket_record_counts = np.bincount(hash_buckets, minlength=num_buckets)
+    bucket_end_offsets = np.cumsum(bucket_record_counts)
+    for hash_bucket in np.flatnonzero(bucket_record_counts):
+        end = bucket_end_offsets[hash_bucket]
+        start = end - bucket_record_counts[hash_bucket]
+        hash_bucket_to_indices[hash_bucket] = record_indices[start:end]
     return hash_bucket_to_indices
 
 
+def hash_bucket_group_table(
+    hash_bucket_to_table: Dict[int, pa.Table],
+) -> Optional[pa.Table]:
+    """
+    Concatenates the tables of the given hash buckets into a single table
+    ordered by hash bucket index, with the hash bucket index of each record
+    appended as a column. Returns None if the given hash buckets hold no
+    records.
+    """
+    tables = [
+        sc.append_hash_bucket_idx_col(
+            table, np.full(len(table), hb_index, dtype=np.int32)
+        )
+        for hb_index, table in sorted(hash_bucket_to_table.items())
+        if table is not None and len(table)
+    ]
+    return pa.concat_tables(tables) if tables else None
+
+
+def group_tables_by_hash_bucket(
+    hash_bucket_group_tables: List[pa.Table],
+) -> Dict[int, List[pa.Table]]:
+    """
+    Splits each of the given tables written by `hash_bucket_group_table` back
+    into one zero-copy slice per hash bucket (without the hash bucket index
+    column). Returns the slices of each hash bucket in input table order.
+    """
+    hb_index_to_tables = defaultdict(list)
+    for table in hash_bucket_group_tables:
+        if table is None or not len(table):
+            continue
+        hb_indices = sc.hash_bucket_index_column_np(table)
+        hb_table = sc.drop_hash_bucket_idx_column(table)
+        starts = np.flatnonzero(np.diff(hb_indices, prepend=-1))
+        ends = np.append(starts[1:], len(hb_table))
+        for start, end in zip(starts, ends):
+            hb_index_to_tables[int(hb_indices[start])].append(
+                hb_table.slice(start, end - start)
+            )
+    return hb_index_to_tables
+
+
 def group_hash_bucket_indices(
-    hash_bucket_object_groups: np.ndarray, num_buckets: int, num_groups: int
+    hash_bucket_object_groups: Optional[np.ndarray], num_groups: int
 ) -> Tuple[np.ndarray, List[ObjectRef]]:
     """
-    Groups all the ObjectRef that belongs to a particular hash bucket group and hash bucket index.
+    Groups the tables of all hash buckets that belong to the same hash bucket
+    group into a single table per group, and puts each group table into the
+    object store. Arrow tables are read back from the object store without
+    copying or deserializing their buffers. Returns the pickled object ref of
+    each group table (or None for empty groups).
     """
 
     object_refs = []
@@ -215,18 +424,16 @@ def group_hash_bucket_indices(
     if hash_bucket_object_groups is None:
         return hash_bucket_group_to_obj_id, object_refs
 
-    hb_group_to_object = np.empty([num_groups], dtype="object")
-    for hb_index, obj in enumerate(hash_bucket_object_groups):
-        if obj:
-            hb_group = hb_index % num_groups
-            if hb_group_to_object[hb_group] is None:
-                hb_group_to_object[hb_group] = np.empty([num_buckets], dtype="object")
-            hb_group_to_object[hb_group][hb_index] = obj
+    hb_group_to_tables = defaultdict(dict)
+    for hb_index, table in enumerate(hash_bucket_object_groups):
+        if table is not None:
+            hb_group_to_tables[hb_index % num_groups][hb_index] = table
 
-    for hb_group, obj in enumerate(hb_group_to_object):
-        if obj is None:
+    for hb_group, hash_bucket_to_table in hb_group_to_tables.items():
+        table = hash_bucket_group_table(hash_bucket_to_table)
+        if table is None:
             continue
-        obj_ref = ray.put(obj)
+        obj_ref = ray.put(table)
         pickled_obj_ref = cloudpickle.dumps(obj_ref)
         object_refs.append(pickled_obj_ref)
         hash_bucket_group_to_obj_id[hb_group] = pickled_obj_ref
@@ -251,6 +458,34 @@ def pk_digest_to_hash_bucket_index(digest, num_buckets: int) -> int:
     return int.from_bytes(digest, "big") % num_buckets
 
 
+def pk_digests_to_hash_bucket_indices(
+    digests: np.ndarray, num_buckets: int
+) -> np.ndarray:
+    """
+    Vectorized equivalent of `pk_digest_to_hash_bucket_index` over a 2D
+    uint8 array of fixed-width digests (one digest per row). Returns the
+    hash bucket index of each digest. Hash bucket counts greater than
+    `_MAX_VECTORIZED_HASH_BUCKET_COUNT` are not supported.
+    """
+
+    if num_buckets > _MAX_VECTORIZED_HASH_BUCKET_COUNT:
+        raise ValueError(
+            f"Hash bucket count ({num_buckets}) exceeds the maximum supported "
+            f"hash bucket count ({_MAX_VECTORIZED_HASH_BUCKET_COUNT})."
+        )
+    # reduce the big-endian digest integer modulo the bucket count one 16-bit
+    # word at a time, which never overflows a uint64 for supported counts
+    words = np.ascontiguousarray(digests).view(">u2").astype(np.uint64)
+    num_buckets_u64 = np.uint64(num_buckets)
+    shift = np.uint64(16)
+    hash_buckets = np.zeros(len(digests), dtype=np.uint64)
+    for word_index in range(words.shape[1]):
+        hash_buckets <<= shift
+        hash_buckets |= words[:, word_index]
+        hash_buckets %= num_buckets_u64
+    return hash_buckets.astype(np.int64)
+
+
 def write_primary_key_index_files(
     table: pa.Table,
     primary_key_index_version_locator: PrimaryKeyIndexVersionLocator,
@@ -0,0 +1,360 @@
+import logging
+import math
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from deltacat import logs
+from deltacat.compute.compactor.model.compaction_session_audit_info import (
+    CompactionSessionAuditInfo,
+)
+from deltacat.compute.stats.models.delta_column_stats import DeltaColumnStats
+from deltacat.compute.stats.models.delta_stats import DeltaStats
+from deltacat.compute.stats.types import StatsType
+from deltacat.constants import (
+    BYTES_PER_MEBIBYTE,
+    PYARROW_INFLATION_MULTIPLIER,
+    PYARROW_INFLATION_MULTIPLIER_ALL_COLUMNS,
+)
+from deltacat.storage import Delta
+
+logger = logs.configure_deltacat_logger(logging.getLogger(__name__))
+
+# fraction of per-task memory that a task's estimated peak memory may use
+MEMORY_SAFETY_FACTOR = 0.8
+
+# peak hash bucket task memory per byte of primary and sort key columns read,
+# covering the table read, its digest column, and its per-bucket copies
+DEFAULT_HASH_BUCKET_MEMORY_MULTIPLIER = 3.0
+
+# bytes of primary key digest and delta file metadata columns per record
+DEDUPE_RECORD_METADATA_BYTES = 20 + 8 + 4 + 4 + 1 + 1 + 8
+
+# peak dedupe task memory per byte of hash bucket output, covering the
+# concatenated hash bucket tables and the sort indices used to drop duplicates
+DEFAULT_DEDUPE_MEMORY_MULTIPLIER = 3.0
+
+# peak materialize task memory per byte of materialized records, covering the
+# downloaded table, its filtered copy, and the output file buffer
+DEFAULT_MATERIALIZE_MEMORY_MULTIPLIER = 3.0
+
+# maximum default hash bucket count for small inputs on large clusters
+MAX_MIN_HASH_BUCKET_COUNT = 256
+
+
+class CompactionResourcePlan(NamedTuple):
+    hash_bucket_count: int
+    hash_bucket_chunk_size: int
+    materialize_bucket_count: int
+    input_size_bytes: int
+    input_record_count: int
+    hash_bucket_pyarrow_bytes: int
+    pyarrow_bytes: int
+    estimated_hash_bucket_task_memory_bytes: float
+    estimated_dedupe_task_memory_bytes: float
+    estimated_materialize_task_memory_bytes: float
+    reasons: List[str]
+
+
+class _InputEstimate(NamedTuple):
+    input_size_bytes: int
+    record_count: int
+    hash_bucket_pyarrow_bytes: float
+    pyarrow_bytes: float
+    deltas_without_stats: int
+
+
+def _estimate_input(
+    input_deltas: List[Delta],
+    input_deltas_stats: Dict[int, Any],
+    hash_bucket_column_names: List[str],
+) -> _InputEstimate:
+    input_size_bytes = 0
+    record_count = 0
+    hash_bucket_pyarrow_bytes = 0.0
+    pyarrow_bytes = 0.0
+    deltas_without_stats = 0
+    for delta in input_deltas:
+        content_bytes = 0
+        manifest_record_count = 0
+        if delta.manifest:
+            content_bytes = sum(
+                entry.meta.content_length or 0 for entry in delta.manifest.entries
+            )
+            manifest_record_count = delta.manifest.meta.record_count or 0
+        input_size_bytes += content_bytes
+        delta_stats = DeltaStats(input_deltas_stats.get(delta.stream_position) or {})
+        if not delta_stats.get("stats") and not delta_stats.get("column_stats"):
+            deltas_without_stats += 1
+            record_count += manifest_record_count
+            hash_bucket_pyarrow_bytes += content_bytes * PYARROW_INFLATION_MULTIPLIER
+            pyarrow_bytes += content_bytes * PYARROW_INFLATION_MULTIPLIER_ALL_COLUMNS
+            continue
+        stats = delta_stats.stats
+        record_count += stats.get(StatsType.ROW_COUNT.value) or manifest_record_count
+        pyarrow_bytes += stats.pyarrow_table_bytes
+        column_bytes = {}
+        for column_stats in delta_stats.get("column_stats") or []:
+            column_stats = DeltaColumnStats(column_stats)
+            column_bytes[column_stats.column] = column_stats.stats.pyarrow_table_bytes
+        if all(name in column_bytes for name in hash_bucket_column_names):
+            # hash bucket tasks only read the primary and sort key columns
+            hash_bucket_pyarrow_bytes += sum(
+                column_bytes[name] for name in hash_bucket_column_names
+            )
+        else:
+            hash_bucket_pyarrow_bytes += stats.pyarrow_table_bytes
+    return _InputEstimate(
+        input_size_bytes,
+        record_count,
+        hash_bucket_pyarrow_bytes,
+        pyarrow_bytes,
+        deltas_without_stats,
+    )
+
+
+def _observed_multipliers(
+    previous_audits: List[CompactionSessionAuditInfo],
+) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+    """
+    Returns the largest peak task memory per unit of task input observed by
+    previous compaction sessions for each of the hash bucket (per input byte),
+    dedupe (per input record), and materialize (per output pyarrow byte)
+    steps, or None for steps without any usable audit.
+    """
+    hash_bucket, dedupe, materialize = [], [], []
+    for audit in previous_audits:
+        peak_hb = audit.peak_memory_used_bytes_per_hash_bucket_task
+        if peak_hb and audit.input_size_bytes and audit.uniform_deltas_created:
+            hash_bucket.append(
+                peak_hb / (audit.input_size_bytes / audit.uniform_deltas_created)
+            )
+        peak_dd = audit.peak_memory_used_bytes_per_dedupe_task
+        if peak_dd and audit.input_records and audit.cluster_cpu_max:
+            # each dedupe task reads one hash bucket group per cluster CPU
+            dedupe.append(peak_dd / (audit.input_records / audit.cluster_cpu_max))
+        peak_mat = audit.peak_memory_used_bytes_per_materialize_task
+        if peak_mat and audit.output_size_pyarrow_bytes and audit.materialize_buckets:
+            materialize.append(
+                peak_mat / (audit.output_size_pyarrow_bytes / audit.materialize_buckets)
+            )
+    return (
+        max(hash_bucket) if hash_bucket else None,
+        max(dedupe) if dedupe else None,
+        max(materialize) if materialize else None,
+    )
+
+
+def dedupe_spill_threshold_bytes(
+    cluster_resources: Dict[str, float],
+) -> Optional[int]:
+    """
+    Returns the bytes of hash bucket output that each dedupe task may hold in
+    memory before spilling the rest to local disk, so that its estimated peak
+    memory fits in the memory available per cluster CPU. Returns None if the
+    given cluster resources don't include memory.
+    """
+    memory = cluster_resources.get("memory")
+    if not memory:
+        return None
+    memory_per_task = float(memory) / int(cluster_resources["CPU"])
+    return int(
+        memory_per_task * MEMORY_SAFETY_FACTOR / DEFAULT_DEDUPE_MEMORY_MULTIPLIER
+    )
+
+
+def plan_compaction_resources(
+    input_deltas: List[Delta],
+    cluster_resources: Dict[str, float],
+    primary_keys: List[str],
+    sort_key_names: Optional[List[str]] = None,
+    input_deltas_stats: Optional[Dict[int, Any]] = None,
+    previous_audits: Optional[List[CompactionSessionAuditInfo]] = None,
+    hash_bucket_count: Optional[int] = None,
+) -> CompactionResourcePlan:
+    """
+    Plans the hash bucket count, hash bucket chunk size, and materialize
+    bucket count of a compaction session, so that the estimated peak memory
+    of each hash bucket, dedupe, and materialize task fits in the memory
+    available per cluster CPU. Doesn't run or schedule any compaction work,
+    so it can be used for dry runs.
+
+    Input size is estimated from the per-column pyarrow table bytes and row
+    counts of the given delta stats (keyed by delta stream position), falling
+    back to manifest content lengths and record counts for deltas without
+    stats. Peak task memory per unit of input is taken from the largest
+    observed by the given previous compaction session audits, falling back
+    to static multipliers for steps without audited peak memory.
+
+    Returns the plan, with the reasoning behind each choice in its reasons.
+    """
+    if sort_key_names is None:
+        sort_key_names = []
+    if input_deltas_stats is None:
+        input_deltas_stats = {}
+    if previous_audits is None:
+        previous_audits = []
+    reasons = []
+    cluster_cpus = int(cluster_resources["CPU"])
+    memory_per_task = float(cluster_resources["memory"]) / cluster_cpus
+    task_memory_budget = memory_per_task * MEMORY_SAFETY_FACTOR
+    object_store_memory = cluster_resources.get("object_store_memory")
+    reasons.append(
+        f"Planning for {cluster_cpus} CPUs with {memory_per_task} bytes of "
+        f"memory per CPU, of which up to {task_memory_budget} bytes may be "
+        f"used by each task."
+    )
+
+    estimate = _estimate_input(
+        input_deltas,
+        {int(k): v for k, v in input_deltas_stats.items()},
+        list(primary_keys) + list(sort_key_names),
+    )
+    if estimate.deltas_without_stats:
+        reasons.append(
+            f"Estimated the pyarrow bytes of {estimate.deltas_without_stats} of "
+            f"{len(input_deltas)} input deltas without stats by inflating their "
+            f"content length by {PYARROW_INFLATION_MULTIPLIER}x (primary and "
+            f"sort keys) and {PYARROW_INFLATION_MULTIPLIER_ALL_COLUMNS}x (all "
+            f"columns)."
+        )
+    reasons.append(
+        f"Input has {estimate.input_size_bytes} bytes, {estimate.record_count} "
+        f"records, {estimate.hash_bucket_pyarrow_bytes} pyarrow bytes of "
+        f"primary and sort keys, and {estimate.pyarrow_bytes} pyarrow bytes."
+    )
+
+    (
+        observed_hb_multiplier,
+        observed_dd_bytes_per_record,
+        observed_mat_multiplier,
+    ) = _observed_multipliers(previous_audits)
+
+    # hash bucket: size chunks of input bytes to fit each task's peak memory
+    key_inflation = (
+        estimate.hash_bucket_pyarrow_bytes / estimate.input_size_bytes
+        if estimate.input_size_bytes and estimate.hash_bucket_pyarrow_bytes
+        else PYARROW_INFLATION_MULTIPLIER
+    )
+    if observed_hb_multiplier:
+        hb_multiplier = observed_hb_multiplier
+        reasons.append(
+            f"Previous hash bucket tasks peaked at {hb_multiplier:.2f} bytes of "
+            f"memory per input byte."
+        )
+    else:
+        hb_multiplier = key_inflation * DEFAULT_HASH_BUCKET_MEMORY_MULTIPLIER
+        reasons.append(
+            f"Assuming hash bucket tasks peak at {hb_multiplier:.2f} bytes of "
+            f"memory per input byte ({key_inflation:.2f} pyarrow bytes of "
+            f"primary and sort keys per input byte, times "
+            f"{DEFAULT_HASH_BUCKET_MEMORY_MULTIPLIER})."
+        )
+    max_chunk_size = task_memory_budget / hb_multiplier
+    if object_store_memory:
+        max_chunk_size = min(
+            max_chunk_size,
+            float(object_store_memory) / cluster_cpus / key_inflation,
+        )
+    balanced_chunk_size = max(
+        math.ceil(estimate.input_size_bytes / cluster_cpus),
+        BYTES_PER_MEBIBYTE,
+    )
+    hash_bucket_chunk_size = max(int(min(max_chunk_size, balanced_chunk_size)), 1)
+    reasons.append(
+        f"Hash bucket chunk size is {hash_bucket_chunk_size} bytes: the smaller "
+        f"of the {int(max_chunk_size)} bytes that fit in task memory and the "
+        f"{balanced_chunk_size} bytes that spread the input evenly across all "
+        f"CPUs."
+    )
+    estimated_hb_task_memory = hash_bucket_chunk_size * hb_multiplier
+
+    # dedupe: size hash buckets so that deduping each one fits in task memory
+    key_bytes_per_record = (
+        max(estimate.hash_bucket_pyarrow_bytes / estimate.record_count, 0)
+        if estimate.record_count
+        else 0
+    )
+    if observed_dd_bytes_per_record:
+        dd_bytes_per_record = observed_dd_bytes_per_record
+        reasons.append(
+            f"Previous dedupe tasks peaked at {dd_bytes_per_record:.2f} bytes "
+            f"of memory per record."
+        )
+    else:
+        dd_bytes_per_record = (
+            DEDUPE_RECORD_METADATA_BYTES + key_bytes_per_record
+        ) * DEFAULT_DEDUPE_MEMORY_MULTIPLIER
+        reasons.append(
+            f"Assuming dedupe tasks peak at {dd_bytes_per_record:.2f} bytes of "
+            f"memory per record ({DEDUPE_RECORD_METADATA_BYTES} bytes of digest "
+            f"and metadata plus {key_bytes_per_record:.2f} bytes of keys, "
+            f"times {DEFAULT_DEDUPE_MEMORY_MULTIPLIER})."
+        )
+    dedupe_bytes = estimate.record_count * dd_bytes_per_record
+    min_hash_bucket_count = max(
+        min(cluster_cpus, MAX_MIN_HASH_BUCKET_COUNT),
+        math.ceil(dedupe_bytes / task_memory_budget),
+    )
+    if hash_bucket_count is None:
+        hash_bucket_count = min_hash_bucket_count
+        reasons.append(
+            f"Hash bucket count is {hash_bucket_count}: enough for each bucket "
+            f"to dedupe {dedupe_bytes / hash_bucket_count:.0f} bytes, and at "
+            f"least one bucket per CPU (up to {MAX_MIN_HASH_BUCKET_COUNT})."
+        )
+    elif hash_bucket_count < min_hash_bucket_count:
+        reasons.append(
+            f"Keeping the given hash bucket count of {hash_bucket_count}, "
+            f"though at least {min_hash_bucket_count} are recommended."
+        )
+    else:
+        reasons.append(f"Keeping the given hash bucket count of {hash_bucket_count}.")
+    # each dedupe task reads one group of hash buckets per CPU
+    estimated_dd_task_memory = dedupe_bytes / min(hash_bucket_count, cluster_cpus)
+    if estimated_dd_task_memory > task_memory_budget:
+        reasons.append(
+            f"Dedupe tasks may need {estimated_dd_task_memory:.0f} bytes, which "
+            f"exceeds task memory. Add CPUs or compact in multiple rounds."
+        )
+
+    # materialize: size buckets so each task's records fit in task memory
+    if observed_mat_multiplier:
+        mat_multiplier = observed_mat_multiplier
+        reasons.append(
+            f"Previous materialize tasks peaked at {mat_multiplier:.2f} bytes "
+            f"of memory per materialized pyarrow byte."
+        )
+    else:
+        mat_multiplier = DEFAULT_MATERIALIZE_MEMORY_MULTIPLIER
+        reasons.append(
+            f"Assuming materialize tasks peak at {mat_multiplier:.2f} bytes of "
+            f"memory per materialized pyarrow byte."
+        )
+    materialize_bytes = estimate.pyarrow_bytes * mat_multiplier
+    materialize_bucket_count = max(
+        cluster_cpus,
+        math.ceil(materialize_bytes / task_memory_budget),
+    )
+    reasons.append(
+        f"Materialize bucket count is {materialize_bucket_count}: enough for "
+        f"each bucket to materialize "
+        f"{estimate.pyarrow_bytes / materialize_bucket_count:.0f} pyarrow "
+        f"bytes, and at least one bucket per CPU."
+    )
+    estimated_mat_task_memory = materialize_bytes / materialize_bucket_count
+
+    plan = CompactionResourcePlan(
+        hash_bucket_count,
+        hash_bucket_chunk_size,
+        materialize_bucket_count,
+        estimate.input_size_bytes,
+        estimate.record_count,
+        int(estimate.hash_bucket_pyarrow_bytes),
+        int(estimate.pyarrow_bytes),
+        estimated_hb_task_memory,
+        estimated_dd_task_memory,
+        estimated_mat_task_memory,
+        reasons,
+    )
+    for reason in reasons:
+        logger.info(reason)
+    return plan
@@ -1,5 +1,4 @@
-from itertools import repeat
-from typing import Union
+from typing import List, Union
 
 import numpy as np
 import pyarrow as pa
@@ -21,6 +20,11 @@ _PK_HASH_COLUMN_FIELD = pa.field(
     _PK_HASH_COLUMN_NAME,
     _PK_HASH_COLUMN_TYPE,
 )
+# big-endian words of a primary key digest, ordered from most to least
+# significant, such that sorting by each word in turn sorts by digest bytes
+_PK_HASH_DIGEST_WORDS_DTYPE = np.dtype(
+    [("high", ">u8"), ("middle", ">u8"), ("low", ">u4")]
+)
 
 _DEDUPE_TASK_IDX_COLUMN_NAME = _get_sys_col_name("dedupe_task_idx")
 _DEDUPE_TASK_IDX_COLUMN_TYPE = pa.int32()
@@ -50,6 +54,13 @@ _ORDERED_RECORD_IDX_COLUMN_FIELD = pa.field(
     _ORDERED_RECORD_IDX_COLUMN_TYPE,
 )
 
+_HASH_BUCKET_IDX_COLUMN_NAME = _get_sys_col_name("hash_bucket_idx")
+_HASH_BUCKET_IDX_COLUMN_TYPE = pa.int32()
+_HASH_BUCKET_IDX_COLUMN_FIELD = pa.field(
+    _HASH_BUCKET_IDX_COLUMN_NAME,
+    _HASH_BUCKET_IDX_COLUMN_TYPE,
+)
+
 _DELTA_TYPE_COLUMN_NAME = _get_sys_col_name("delta_type")
 _DELTA_TYPE_COLUMN_TYPE = pa.bool_()
 _DELTA_TYPE_COLUMN_FIELD = pa.field(
@@ -73,17 +84,75 @@ _FILE_RECORD_COUNT_COLUMN_FIELD = pa.field(
 
 
 def get_pk_hash_column_array(obj) -> Union[pa.Array, pa.ChunkedArray]:
+    if isinstance(obj, (pa.Array, pa.ChunkedArray)):
+        return obj.cast(_PK_HASH_COLUMN_TYPE)
     return pa.array(obj, _PK_HASH_COLUMN_TYPE)
 
 
 def pk_hash_column_np(table: pa.Table) -> np.ndarray:
-    return table[_PK_HASH_COLUMN_NAME].to_numpy()
+    """
+    Returns the primary key digest column of the given table as a 1D NumPy
+    array of fixed-width void scalars, which compare equal if their digests
+    are equal, and convert back to digest bytes via `tolist()`. The array is
+    a zero-copy view over the underlying Arrow buffer if the digest column
+    consists of a single chunk.
+    """
+    return digest_void_np(pk_hash_column(table))
 
 
 def pk_hash_column(table: pa.Table) -> pa.ChunkedArray:
     return table[_PK_HASH_COLUMN_NAME]
 
 
+def pk_hash_digest_bytes_np(table: pa.Table) -> np.ndarray:
+    """
+    Returns the primary key digest column of the given table as a 2D NumPy
+    uint8 array with one row of `_PK_HASH_DIGEST_BYTE_WIDTH` bytes per
+    record. The array is a zero-copy view over the underlying Arrow buffer
+    if the digest column consists of a single chunk.
+    """
+    return digest_bytes_np(pk_hash_column(table))
+
+
+def digest_bytes_np(digests: Union[pa.Array, pa.ChunkedArray]) -> np.ndarray:
+    """
+    Returns the given primary key digests as a 2D NumPy uint8 array with one
+    row of `_PK_HASH_DIGEST_BYTE_WIDTH` bytes per digest.
+    """
+    if isinstance(digests, pa.ChunkedArray):
+        digests = (
+            digests.chunk(0) if digests.num_chunks == 1 else digests.combine_chunks()
+        )
+    if not len(digests):
+        return np.empty([0, _PK_HASH_DIGEST_BYTE_WIDTH], dtype=np.uint8)
+    start = digests.offset * _PK_HASH_DIGEST_BYTE_WIDTH
+    end = start + len(digests) * _PK_HASH_DIGEST_BYTE_WIDTH
+    return np.frombuffer(digests.buffers()[1], dtype=np.uint8)[start:end].reshape(
+        -1, _PK_HASH_DIGEST_BYTE_WIDTH
+    )
+
+
+def digest_void_np(digests: Union[pa.Array, pa.ChunkedArray]) -> np.ndarray:
+    """
+    Returns the given primary key digests as a 1D NumPy array with one
+    fixed-width void scalar of `_PK_HASH_DIGEST_BYTE_WIDTH` bytes per digest.
+    """
+    return digest_bytes_np(digests).view(f"V{_PK_HASH_DIGEST_BYTE_WIDTH}").ravel()
+
+
+def pk_hash_digest_words_np(table: pa.Table) -> np.ndarray:
+    return digest_words_np(pk_hash_column(table))
+
+
+def digest_words_np(digests: Union[pa.Array, pa.ChunkedArray]) -> np.ndarray:
+    """
+    Returns the given primary key digests as a 1D NumPy structured array of
+    `_PK_HASH_DIGEST_WORDS_DTYPE`, whose fields are zero-copy views of the
+    big-endian 8, 8, and 4-byte unsigned integer words of each digest.
+    """
+    return digest_bytes_np(digests).view(_PK_HASH_DIGEST_WORDS_DTYPE).ravel()
+
+
 def delta_type_column_np(table: pa.Table) -> np.ndarray:
     return table[_DELTA_TYPE_COLUMN_NAME].to_numpy()
 
@@ -132,6 +201,17 @@ def record_index_column_np(table: pa.Table) -> np.ndarray:
     return table[_ORDERED_RECORD_IDX_COLUMN_NAME].to_numpy()
 
 
+def get_hash_bucket_index_column_array(obj) -> Union[pa.Array, pa.ChunkedArray]:
+    return pa.array(
+        obj,
+        _HASH_BUCKET_IDX_COLUMN_TYPE,
+    )
+
+
+def hash_bucket_index_column_np(table: pa.Table) -> np.ndarray:
+    return table[_HASH_BUCKET_IDX_COLUMN_NAME].to_numpy()
+
+
 def is_source_column_np(table: pa.Table) -> np.ndarray:
     return table[_IS_SOURCE_COLUMN_NAME].to_numpy()
 
@@ -164,48 +244,97 @@ def get_file_record_count_column_array(obj) -> Union[pa.Array, pa.ChunkedArray]:
 def project_delta_file_metadata_on_table(
     delta_file_envelope: DeltaFileEnvelope,
 ) -> pa.Table:
+    return project_delta_file_metadata_on_tables([delta_file_envelope])
+
+
+def project_delta_file_metadata_on_tables(
+    delta_file_envelopes: List[DeltaFileEnvelope],
+) -> pa.Table:
+    """
+    Concatenates the tables of the given delta file envelopes, and appends
+    the metadata of each envelope to its records as system columns. Each
+    column is built by a single vectorized repeat of its per-envelope values,
+    so no Python objects are created per record.
+    """
+    table = pa.concat_tables([dfe.table for dfe in delta_file_envelopes])
+    record_counts = np.array(
+        [len(dfe.table) for dfe in delta_file_envelopes],
+        dtype=np.int64,
+    )
 
-    table = delta_file_envelope.table
+    def repeat_envelope_values(values: List, dtype: np.dtype) -> np.ndarray:
+        return np.repeat(np.array(values, dtype=dtype), record_counts)
 
     # append ordered file number column
-    ordered_file_number = delta_file_envelope.file_index
-    ordered_file_number_iterator = repeat(
-        int(ordered_file_number),
-        len(table),
+    table = append_file_idx_column(
+        table,
+        repeat_envelope_values(
+            [dfe.file_index for dfe in delta_file_envelopes],
+            np.int32,
+        ),
     )
-    table = append_file_idx_column(table, ordered_file_number_iterator)
 
     # append event timestamp column
-    stream_position = delta_file_envelope.stream_position
-    stream_position_iterator = repeat(
-        int(stream_position),
-        len(table),
+    table = append_stream_position_column(
+        table,
+        repeat_envelope_values(
+            [dfe.stream_position for dfe in delta_file_envelopes],
+            np.int64,
+        ),
     )
-    table = append_stream_position_column(table, stream_position_iterator)
 
     # append delta type column
-    delta_type = delta_file_envelope.delta_type
-    delta_type_iterator = repeat(
-        delta_type_to_field(delta_type),
-        len(table),
+    table = append_delta_type_col(
+        table,
+        repeat_envelope_values(
+            [delta_type_to_field(dfe.delta_type) for dfe in delta_file_envelopes],
+            np.bool_,
+        ),
     )
-    table = append_delta_type_col(table, delta_type_iterator)
 
     # append is source column
-    is_source_iterator = repeat(
-        True if delta_file_envelope.is_src_delta else False,
-        len(table),
+    table = append_is_source_col(
+        table,
+        repeat_envelope_values(
+            [bool(dfe.is_src_delta) for dfe in delta_file_envelopes],
+            np.bool_,
+        ),
     )
-    table = append_is_source_col(table, is_source_iterator)
 
-    # append row count column
-    file_record_count_iterator = repeat(
-        delta_file_envelope.file_record_count, len(table)
+    # append row count column (null if unknown)
+    file_record_counts = [dfe.file_record_count for dfe in delta_file_envelopes]
+    table = append_file_record_count_col(
+        table,
+        np.ma.masked_array(
+            repeat_envelope_values(
+                [count or 0 for count in file_record_counts],
+                np.int64,
+            ),
+            mask=repeat_envelope_values(
+                [count is None for count in file_record_counts],
+                np.bool_,
+            ),
+        ),
     )
-    table = append_file_record_count_col(table, file_record_count_iterator)
     return table
 
 
+def drop_delta_file_metadata_columns(table: pa.Table) -> pa.Table:
+    """
+    Drops all columns appended by `project_delta_file_metadata_on_table`
+    from the given table.
+    """
+    return table.drop(
+        [
+            _ORDERED_FILE_IDX_COLUMN_NAME,
+            _PARTITION_STREAM_POSITION_COLUMN_NAME,
+            _DELTA_TYPE_COLUMN_NAME,
+            _IS_SOURCE_COLUMN_NAME,
+            _FILE_RECORD_COUNT_COLUMN_NAME,
+        ]
+    )
+
+
 def append_stream_position_column(table: pa.Table, stream_positions):
 
     table = table.append_column(
@@ -250,6 +379,19 @@ def append_dedupe_task_idx_col(table: pa.Table, dedupe_task_indices) -> pa.Table
     return table
 
 
+def append_hash_bucket_idx_col(table: pa.Table, hash_bucket_indices) -> pa.Table:
+
+    table = table.append_column(
+        _HASH_BUCKET_IDX_COLUMN_FIELD,
+        get_hash_bucket_index_column_array(hash_bucket_indices),
+    )
+    return table
+
+
+def drop_hash_bucket_idx_column(table: pa.Table) -> pa.Table:
+    return table.drop([_HASH_BUCKET_IDX_COLUMN_NAME])
+
+
 def delta_type_to_field(delta_type: DeltaType) -> bool:
     return True if delta_type is DeltaType.UPSERT else False
 
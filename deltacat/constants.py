@@ -53,4 +53,19 @@ PRIMARY_KEY_INDEX_WRITE_BOTO3_CONFIG = {
     "retries": {"max_attempts": 25, "mode": "standard"}
 }
 
+# Version of the primary key digest and hash bucket assignment algorithms
+# that a persisted primary key index was written with
+PRIMARY_KEY_INDEX_ALGORITHM_VERSION = "1.0"
+
+# Maximum number of records to write to each primary key index file
+RECORDS_PER_PRIMARY_KEY_INDEX_FILE = 38_000_000
+
 MEMORY_TO_HASH_BUCKET_COUNT_RATIO = 0.0512 * BYTES_PER_TEBIBYTE
+
+# Maximum number of delta manifests to fetch concurrently when discovered
+# deltas don't already include their manifest
+MAX_DELTA_MANIFEST_FETCH_PARALLELISM = 32
+
+# Number of bits per primary key to allocate to the Bloom filter of each
+# compacted file (yielding a false positive rate of about 0.05% per key)
+PRIMARY_KEY_BLOOM_FILTER_BITS_PER_KEY = 16
@@ -0,0 +1,147 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import pyarrow as pa
+
+from deltacat.aws import s3u
+from deltacat.storage import Manifest, ManifestEntry, ManifestMeta
+
+
+def _manifest(entry_count, name="file"):
+    return Manifest.of(
+        [
+            ManifestEntry.of(
+                f"s3://bucket/{name}-{i}.parquet",
+                ManifestMeta.of(1, 1, "application/parquet", "identity"),
+            )
+            for i in range(entry_count)
+        ]
+    )
+
+
+class TestDownloadManifestEntriesParallel(unittest.TestCase):
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.concurrent_downloads = 0
+        self.max_concurrent_downloads = 0
+        self.download_threads = set()
+        # start each test without a shared download thread pool
+        patcher = mock.patch.multiple(
+            s3u,
+            _download_executor=None,
+            _download_executor_max_workers=0,
+            _download_executor_pid=None,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _download_manifest_entry(self, manifest_entry, **kwargs):
+        with self.lock:
+            self.concurrent_downloads += 1
+            self.max_concurrent_downloads = max(
+                self.max_concurrent_downloads, self.concurrent_downloads
+            )
+            self.download_threads.add(threading.current_thread().name)
+        time.sleep(0.01)
+        with self.lock:
+            self.concurrent_downloads -= 1
+        if manifest_entry.url.endswith("fail.parquet"):
+            raise ValueError(manifest_entry.url)
+        return pa.table({"url": [manifest_entry.url]})
+
+    def test_tables_in_entry_order(self):
+        manifest = _manifest(20)
+        with mock.patch.object(
+            s3u, "download_manifest_entry", self._download_manifest_entry
+        ):
+            tables = s3u.download_manifest_entries(manifest, max_parallelism=4)
+        self.assertEqual(
+            [table["url"][0].as_py() for table in tables],
+            [entry.url for entry in manifest.entries],
+        )
+        self.assertGreater(self.max_concurrent_downloads, 1)
+        self.assertLessEqual(self.max_concurrent_downloads, 4)
+
+    def test_thread_pool_is_reused(self):
+        with mock.patch.object(
+            s3u, "download_manifest_entry", self._download_manifest_entry
+        ):
+            s3u.download_manifest_entries(_manifest(8), max_parallelism=2)
+            executor = s3u._get_download_executor(2)
+            s3u.download_manifest_entries(_manifest(8), max_parallelism=2)
+            self.assertIs(s3u._get_download_executor(2), executor)
+            # a larger pool also serves smaller parallelism limits
+            s3u.download_manifest_entries(_manifest(8), max_parallelism=3)
+            larger_executor = s3u._get_download_executor(3)
+            self.assertIsNot(larger_executor, executor)
+            self.max_concurrent_downloads = 0
+            s3u.download_manifest_entries(_manifest(8), max_parallelism=2)
+            self.assertIs(s3u._get_download_executor(2), larger_executor)
+            self.assertLessEqual(self.max_concurrent_downloads, 2)
+        self.assertTrue(
+            all(
+                name.startswith("deltacat-s3-download")
+                for name in self.download_threads
+            )
+        )
+
+    def test_concurrent_downloads_with_increasing_parallelism(self):
+        first_download_started = threading.Event()
+        larger_downloads_done = threading.Event()
+
+        def download_manifest_entry(manifest_entry, **kwargs):
+            if manifest_entry.url.endswith("first-0.parquet"):
+                # hold the first caller until larger pools have replaced its pool
+                first_download_started.set()
+                larger_downloads_done.wait(timeout=10)
+            return self._download_manifest_entry(manifest_entry, **kwargs)
+
+        results = {}
+        errors = []
+
+        def download(name, max_parallelism):
+            try:
+                tables = s3u._download_manifest_entries_parallel(
+                    _manifest(12, name),
+                    max_parallelism=max_parallelism,
+                )
+                results[name] = [table["url"][0].as_py() for table in tables]
+            except BaseException as e:
+                errors.append(e)
+
+        with mock.patch.object(s3u, "download_manifest_entry", download_manifest_entry):
+            first = threading.Thread(target=download, args=("first", 2))
+            first.start()
+            self.assertTrue(first_download_started.wait(timeout=10))
+            threads = [
+                threading.Thread(target=download, args=(f"next{n}", n))
+                for n in range(3, 7)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            larger_downloads_done.set()
+            first.join()
+        self.assertEqual(errors, [])
+        for name in ["first", "next3", "next4", "next5", "next6"]:
+            self.assertEqual(
+                results[name],
+                [f"s3://bucket/{name}-{i}.parquet" for i in range(12)],
+            )
+        self.assertEqual(s3u._download_executor_max_workers, 6)
+
+    def test_download_error_is_raised(self):
+        manifest = _manifest(6)
+        manifest.entries[2]["url"] = "s3://bucket/fail.parquet"
+        with mock.patch.object(
+            s3u, "download_manifest_entry", self._download_manifest_entry
+        ):
+            with self.assertRaises(ValueError):
+                s3u.download_manifest_entries(manifest, max_parallelism=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+import pyarrow as pa
+
+from deltacat.compute.compactor.steps.apply_deletes import _rewrite_primary_key_index
+from deltacat.compute.compactor.utils import system_columns as sc
+from deltacat.compute.compactor.utils.primary_key_index import (
+    primary_key_index_table,
+)
+
+
+class TestRewritePrimaryKeyIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        # 3 compacted files of 4, 2, and 3 records
+        self.table = pa.table({"pk": range(9)})
+        self.index_table = primary_key_index_table(self.table, ["pk"], [], [4, 2, 3])
+
+    def _assert_matches_rebuilt_index(self, is_deleted, file_record_counts):
+        expected = primary_key_index_table(
+            self.table.filter(pa.array(~is_deleted)),
+            ["pk"],
+            [],
+            file_record_counts,
+        )
+        file_indices = sc.file_index_column_np(self.index_table)
+        record_indices = sc.record_index_column_np(self.index_table)
+        file_deleted_record_indices = {
+            int(file_index): record_indices[is_deleted & (file_indices == file_index)]
+            for file_index in np.unique(file_indices[is_deleted])
+        }
+        removed_file_indices = [
+            file_index
+            for file_index, record_count in enumerate([4, 2, 3])
+            if len(file_deleted_record_indices.get(file_index, [])) == record_count
+        ]
+        actual = _rewrite_primary_key_index(
+            self.index_table,
+            is_deleted,
+            file_deleted_record_indices,
+            removed_file_indices,
+        )
+        self.assertTrue(actual.equals(expected))
+
+    def test_delete_records_from_files(self):
+        is_deleted = np.zeros(9, dtype=np.bool_)
+        is_deleted[[0, 2, 7]] = True
+        self._assert_matches_rebuilt_index(is_deleted, [2, 2, 2])
+
+    def test_delete_all_records_of_a_file(self):
+        is_deleted = np.zeros(9, dtype=np.bool_)
+        is_deleted[[1, 4, 5]] = True
+        self._assert_matches_rebuilt_index(is_deleted, [3, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,358 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from deltacat.compute.compactor import (
+    DeltaFileEnvelope,
+    DeltaFileLocator,
+    RecordIndexRanges,
+    SortKey,
+    SortOrder,
+)
+from ray import cloudpickle
+
+from deltacat.compute.compactor.steps import dedupe as dd
+from deltacat.compute.compactor.steps.dedupe import (
+    _drop_duplicates_by_primary_key_hash,
+    _group_record_index_ranges_by_file,
+    _timed_dedupe,
+    _union_primary_key_indices,
+)
+from deltacat.compute.compactor.utils import primary_key_index as pki
+from deltacat.compute.compactor.utils import system_columns as sc
+from deltacat.storage import DeltaType
+from deltacat.utils.common import sha1_digest
+
+
+def _legacy_drop_duplicates_by_primary_key_hash(table: pa.Table) -> pa.Table:
+    value_to_last_row_idx = {}
+    pk_hash_np = sc.pk_hash_column_np(table).tolist()
+    op_type_np = sc.delta_type_column_np(table)
+    for row_idx, (pk_val, op_val) in enumerate(zip(pk_hash_np, op_type_np)):
+        if op_val:
+            value_to_last_row_idx[pk_val] = row_idx
+        else:
+            value_to_last_row_idx.pop(pk_val, None)
+    return table.take(list(value_to_last_row_idx.values()))
+
+
+def _legacy_drop_duplicates_with_sort_keys(table: pa.Table, sort_keys) -> pa.Table:
+    sort_keys = sort_keys + [
+        SortKey.of(sc._PARTITION_STREAM_POSITION_COLUMN_NAME, SortOrder.ASCENDING),
+        SortKey.of(sc._ORDERED_FILE_IDX_COLUMN_NAME, SortOrder.ASCENDING),
+    ]
+    table = table.take(pc.sort_indices(table, sort_keys=sort_keys))
+    return _legacy_drop_duplicates_by_primary_key_hash(table)
+
+
+def _dedupe_input_table(pks, is_upsert) -> pa.Table:
+    table = pa.table({"pk": pks, "row": range(len(pks))})
+    table = sc.append_pk_hash_column(
+        table, [sha1_digest(bytes(str(pk), "utf-8")) for pk in pks]
+    )
+    return sc.append_delta_type_col(table, is_upsert)
+
+
+class TestDropDuplicatesByPrimaryKeyHash(unittest.TestCase):
+    def _assert_matches_legacy(self, table: pa.Table):
+        expected = _legacy_drop_duplicates_by_primary_key_hash(table)
+        actual = _drop_duplicates_by_primary_key_hash(table)
+        self.assertEqual(actual["row"].to_pylist(), expected["row"].to_pylist())
+
+    def test_upserts_only(self):
+        self._assert_matches_legacy(
+            _dedupe_input_table([3, 1, 3, 2, 1, 3], [True] * 6),
+        )
+
+    def test_deletes(self):
+        table = _dedupe_input_table(
+            [1, 2, 1, 3, 2, 1, 4, 4, 3, 5],
+            [True, True, False, True, True, True, False, True, False, False],
+        )
+        self._assert_matches_legacy(table)
+
+    def test_random(self):
+        rng = np.random.default_rng(7)
+        for key_count in [1, 10, 1000]:
+            pks = rng.integers(0, key_count, size=5000).tolist()
+            is_upsert = (rng.random(5000) > 0.2).tolist()
+            table = _dedupe_input_table(pks, is_upsert)
+            self._assert_matches_legacy(table)
+            chunked = pa.concat_tables([table.slice(0, 1234), table.slice(1234)])
+            self._assert_matches_legacy(chunked)
+
+    def test_digests_with_common_prefix(self):
+        digests = [bytes(8) + bytes([i % 3]) * 12 for i in [2, 0, 1, 2, 0, 1]]
+        table = pa.table({"row": range(len(digests))})
+        table = sc.append_pk_hash_column(table, digests)
+        table = sc.append_delta_type_col(table, [True, True, True, True, False, True])
+        self._assert_matches_legacy(table)
+
+    def test_empty_table(self):
+        table = _dedupe_input_table([], [])
+        self.assertEqual(len(_drop_duplicates_by_primary_key_hash(table)), 0)
+
+
+class TestDropDuplicatesWithSortKeys(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(11)
+        record_count = 3000
+        pks = rng.integers(0, 300, size=record_count).tolist()
+        table = _dedupe_input_table(pks, (rng.random(record_count) > 0.2).tolist())
+        version = rng.integers(0, 20, size=record_count).astype(float)
+        version[rng.random(record_count) < 0.05] = np.nan
+        table = table.append_column(
+            "version",
+            pa.array(version, mask=rng.random(record_count) < 0.05),
+        )
+        table = table.append_column(
+            "priority", pa.array(rng.integers(0, 3, size=record_count))
+        )
+        # records are ordered by stream position and file index
+        table = sc.append_stream_position_column(
+            table, np.sort(rng.integers(0, 5, size=record_count))
+        )
+        self.table = sc.append_file_idx_column(table, np.zeros(record_count))
+
+    def _assert_matches_legacy(self, sort_keys):
+        expected = _legacy_drop_duplicates_with_sort_keys(self.table, sort_keys)
+        actual = _drop_duplicates_by_primary_key_hash(self.table, sort_keys)
+        self.assertEqual(actual["row"].to_pylist(), sorted(expected["row"].to_pylist()))
+
+    def test_single_sort_key(self):
+        for sort_order in SortOrder:
+            self._assert_matches_legacy([SortKey.of("priority", sort_order)])
+
+    def test_sort_key_with_nulls_and_nans(self):
+        for sort_order in SortOrder:
+            self._assert_matches_legacy([SortKey.of("version", sort_order)])
+
+    def test_multiple_sort_keys(self):
+        self._assert_matches_legacy(
+            [
+                SortKey.of("priority", SortOrder.DESCENDING),
+                SortKey.of("version", SortOrder.ASCENDING),
+            ]
+        )
+
+
+class TestGroupRecordIndexRangesByFile(unittest.TestCase):
+    def test_group_record_index_ranges(self):
+        rng = np.random.default_rng(3)
+        expected = {}
+        file_record_columns = [[] for _ in range(2)]
+        for stream_position in [10, 20]:
+            for file_index in range(3):
+                record_indices = np.flatnonzero(rng.random(100) > 0.3)
+                dfl = DeltaFileLocator.of(
+                    np.bool_(True),
+                    np.int64(stream_position),
+                    np.int32(file_index),
+                    np.int64(100),
+                )
+                expected[dfl] = record_indices.tolist()
+                # spread the records of each file across two deduped tables
+                for i, table_record_indices in enumerate(
+                    [record_indices[1::2], record_indices[::2]]
+                ):
+                    file_record_columns[i].append(
+                        [
+                            np.full(len(table_record_indices), True),
+                            np.full(len(table_record_indices), stream_position),
+                            np.full(len(table_record_indices), file_index, np.int32),
+                            np.full(len(table_record_indices), 100),
+                            table_record_indices,
+                        ]
+                    )
+        file_record_columns = [
+            [np.concatenate(column) for column in zip(*table_columns)]
+            for table_columns in file_record_columns
+        ]
+        actual = _group_record_index_ranges_by_file(file_record_columns)
+        self.assertEqual(set(actual.keys()), set(expected.keys()))
+        for dfl, record_index_ranges in actual.items():
+            self.assertEqual(
+                record_index_ranges.record_indices().tolist(), expected[dfl]
+            )
+            self.assertEqual(
+                record_index_ranges.starts.tolist(),
+                RecordIndexRanges.of_record_indices(expected[dfl]).starts.tolist(),
+            )
+            self.assertEqual(record_index_ranges.record_count, len(expected[dfl]))
+
+    def test_contiguous_records(self):
+        record_index_ranges = RecordIndexRanges.of_record_indices(
+            np.array([0, 1, 2, 3, 7, 8, 9])
+        )
+        self.assertEqual(record_index_ranges.starts.tolist(), [0, 7])
+        self.assertEqual(record_index_ranges.lengths.tolist(), [4, 3])
+
+    def test_no_records(self):
+        self.assertEqual(_group_record_index_ranges_by_file([]), {})
+
+
+class TestPreDedupe(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(13)
+        self.hb_tables = []
+        for stream_position in range(6):
+            delta_type = DeltaType.DELETE if stream_position == 3 else DeltaType.UPSERT
+            for file_index in range(2):
+                pks = rng.integers(0, 200, size=150)
+                table = sc.append_pk_hash_column(
+                    pa.table({"priority": rng.integers(0, 3, size=150)}),
+                    [sha1_digest(bytes(str(pk), "utf-8")) for pk in pks],
+                )
+                table = sc.append_record_idx_col(table, range(150))
+                self.hb_tables.append(
+                    sc.project_delta_file_metadata_on_table(
+                        DeltaFileEnvelope.of(
+                            stream_position=stream_position,
+                            file_index=file_index,
+                            delta_type=delta_type,
+                            table=table,
+                            file_record_count=150,
+                        )
+                    )
+                )
+
+    def _deduped_record_locators(self, hb_tables, sort_keys):
+        table = _union_primary_key_indices(0, hb_tables)
+        table = _drop_duplicates_by_primary_key_hash(table, sort_keys)
+        return sorted(
+            zip(
+                sc.stream_position_column_np(table).tolist(),
+                sc.file_index_column_np(table).tolist(),
+                sc.record_index_column_np(table).tolist(),
+            )
+        )
+
+    def _assert_pre_dedupe_matches_dedupe(self, sort_keys):
+        expected = self._deduped_record_locators(self.hb_tables, sort_keys)
+        # pre-dedupe interleaved files, then dedupe them with the remaining files
+        pre_deduped_table = _drop_duplicates_by_primary_key_hash(
+            _union_primary_key_indices(0, self.hb_tables[1::2]),
+            sort_keys,
+            drop_deletes=False,
+        )
+        self.assertEqual(pre_deduped_table.schema, self.hb_tables[0].schema)
+        actual = self._deduped_record_locators(
+            [pre_deduped_table] + self.hb_tables[::2],
+            sort_keys,
+        )
+        self.assertEqual(actual, expected)
+
+    def test_union_orders_row_group_runs(self):
+        # the last file is split into row group runs that arrive out of order
+        last_file = self.hb_tables[-1]
+        tables = self.hb_tables[:-1] + [last_file.slice(100), last_file.slice(0, 100)]
+        table = _union_primary_key_indices(0, tables[::-1])
+        self.assertTrue(table.equals(pa.concat_tables(self.hb_tables)))
+
+    def test_pre_dedupe(self):
+        self._assert_pre_dedupe_matches_dedupe(None)
+
+    def test_pre_dedupe_with_sort_keys(self):
+        self._assert_pre_dedupe_matches_dedupe(
+            [SortKey.of("priority", SortOrder.DESCENDING)]
+        )
+
+
+class TestTimedDedupe(unittest.TestCase):
+    setUp = TestPreDedupe.setUp
+
+    def _timed_dedupe(
+        self,
+        num_cpus,
+        materialize_by_hash_bucket,
+        spill_threshold_bytes=None,
+    ):
+        # spread the files of each hash bucket across 2 hash bucket groups
+        hb_group_tables = [
+            pki.hash_bucket_group_table(
+                {
+                    hb_idx: pa.concat_tables(self.hb_tables[hb_idx::4][group::2])
+                    for hb_idx in range(4)
+                }
+            )
+            for group in range(2)
+        ]
+        ray_mock = mock.MagicMock()
+        ray_mock.get.side_effect = lambda obj: obj
+        ray_mock.put.side_effect = lambda obj: obj
+        with mock.patch.object(dd, "ray", ray_mock), mock.patch.multiple(
+            dd,
+            get_current_ray_task_id=mock.DEFAULT,
+            get_current_ray_worker_id=mock.DEFAULT,
+            get_current_node_peak_memory_usage_in_bytes=mock.DEFAULT,
+            get_current_ray_task_num_cpus=mock.MagicMock(return_value=num_cpus),
+        ):
+            result = _timed_dedupe(
+                [cloudpickle.dumps(table) for table in hb_group_tables],
+                [SortKey.of("priority", SortOrder.DESCENDING)],
+                3,
+                0,
+                False,
+                materialize_by_hash_bucket,
+                spill_threshold_bytes=spill_threshold_bytes,
+            )
+        mat_bucket_to_src_file_records = {
+            mat_bucket: cloudpickle.loads(obj_id_pkl)
+            for mat_bucket, (_, obj_id_pkl) in result[0].items()
+        }
+        return mat_bucket_to_src_file_records, result[1], result[2], result[6]
+
+    def _assert_dedupe_results_equal(self, actual, expected):
+        self.assertEqual(actual[0].keys(), expected[0].keys())
+        for mat_bucket, src_file_records in expected[0].items():
+            self.assertEqual(actual[0][mat_bucket].keys(), src_file_records.keys())
+            for src_dfl, record_index_ranges in src_file_records.items():
+                self.assertEqual(
+                    actual[0][mat_bucket][src_dfl].record_indices().tolist(),
+                    record_index_ranges.record_indices().tolist(),
+                )
+        self.assertEqual(actual[1:3], expected[1:3])
+        self.assertEqual(actual[3].tolist(), expected[3].tolist())
+
+    def _assert_concurrent_dedupe_matches_serial_dedupe(
+        self,
+        materialize_by_hash_bucket,
+    ):
+        expected = self._timed_dedupe(1, materialize_by_hash_bucket)
+        self.assertEqual(expected[3].tolist(), [0, 1, 2, 3])
+        self.assertGreater(expected[2], 0)
+        actual = self._timed_dedupe(4, materialize_by_hash_bucket)
+        self._assert_dedupe_results_equal(actual, expected)
+
+    def _assert_spilled_dedupe_matches_in_memory_dedupe(
+        self,
+        materialize_by_hash_bucket,
+    ):
+        expected = self._timed_dedupe(2, materialize_by_hash_bucket)
+        # spill after the first hash bucket group table, and after none
+        for spill_threshold_bytes in [10_000, 1 << 30]:
+            actual = self._timed_dedupe(
+                2,
+                materialize_by_hash_bucket,
+                spill_threshold_bytes,
+            )
+            self._assert_dedupe_results_equal(actual, expected)
+
+    def test_concurrent_dedupe(self):
+        self._assert_concurrent_dedupe_matches_serial_dedupe(False)
+
+    def test_concurrent_dedupe_by_hash_bucket(self):
+        self._assert_concurrent_dedupe_matches_serial_dedupe(True)
+
+    def test_spilled_dedupe(self):
+        self._assert_spilled_dedupe_matches_in_memory_dedupe(False)
+
+    def test_spilled_dedupe_by_hash_bucket(self):
+        self._assert_spilled_dedupe_matches_in_memory_dedupe(True)
+
+
+if __name__ == "__main__":
+    unittest.main()
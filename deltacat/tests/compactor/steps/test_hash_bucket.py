@@ -0,0 +1,240 @@
+import threading
+import time
+import unittest
+
+import numpy as np
+import pyarrow as pa
+
+from deltacat.compute.compactor import DeltaAnnotated
+from deltacat.compute.compactor.model.delta_annotated import DeltaAnnotation
+from deltacat.compute.compactor.utils import system_columns as sc
+from deltacat.compute.compactor.steps.hash_bucket import (
+    _group_file_records_by_pk_hash_bucket,
+)
+from deltacat.storage import (
+    Delta,
+    DeltaLocator,
+    DeltaType,
+    Manifest,
+    ManifestEntry,
+    ManifestMeta,
+)
+
+
+class InMemoryDeltaStorage:
+    """
+    Serves the manifest entries of a delta from in-memory tables, and records
+    the number of entries downloaded at once.
+    """
+
+    def __init__(self, tables, download_latency=0.0, row_group_size=None):
+        self.tables = tables
+        self.download_latency = download_latency
+        self.row_group_size = row_group_size
+        self.max_entries_per_download = 0
+        self.max_concurrent_downloads = 0
+        self._concurrent_downloads = 0
+        self._lock = threading.Lock()
+
+    def _select(self, table, columns):
+        return table.select(columns) if columns else table
+
+    def download_delta(self, delta_like, columns=None, *args, **kwargs):
+        self.max_entries_per_download = len(self.tables)
+        return [self._select(table, columns) for table in self.tables]
+
+    def download_delta_manifest_entry(
+        self,
+        delta_like,
+        entry_index,
+        columns=None,
+        file_reader_kwargs_provider=None,
+        *args,
+        **kwargs,
+    ):
+        with self._lock:
+            self._concurrent_downloads += 1
+            self.max_concurrent_downloads = max(
+                self.max_concurrent_downloads, self._concurrent_downloads
+            )
+            self.max_entries_per_download = max(self.max_entries_per_download, 1)
+        time.sleep(self.download_latency)
+        with self._lock:
+            self._concurrent_downloads -= 1
+        table = self.tables[entry_index]
+        reader_kwargs = (
+            file_reader_kwargs_provider("application/parquet", {})
+            if file_reader_kwargs_provider
+            else {}
+        )
+        if "row_groups" in reader_kwargs:
+            table = pa.concat_tables(
+                table.slice(rg * self.row_group_size, self.row_group_size)
+                for rg in reader_kwargs["row_groups"]
+            )
+        return self._select(table, columns)
+
+
+def _annotated_delta(tables):
+    entries = [
+        ManifestEntry.of(
+            f"s3://bucket/file-{i}.parquet",
+            ManifestMeta.of(len(table), 1, "application/parquet", "identity"),
+        )
+        for i, table in enumerate(tables)
+    ]
+    manifest = Manifest.of(entries)
+    delta = Delta.of(
+        DeltaLocator.of(None, 7),
+        DeltaType.UPSERT,
+        manifest.meta,
+        None,
+        manifest,
+    )
+    return DeltaAnnotated.of(delta)
+
+
+class TestGroupFileRecordsByPkHashBucket(unittest.TestCase):
+    def test_streaming_matches_batch_read(self):
+        rng = np.random.default_rng(3)
+        tables = [
+            pa.table(
+                {
+                    "pk": rng.integers(0, 200, size=size),
+                    "sk": rng.integers(0, 10, size=size),
+                    "data": np.arange(size),
+                }
+            )
+            for size in (50, 0, 120, 80)
+        ]
+        annotated_delta = _annotated_delta(tables)
+
+        results = {}
+        for enable_streaming_hash_bucket in (False, True):
+            storage = InMemoryDeltaStorage(tables)
+            results[
+                enable_streaming_hash_bucket
+            ] = _group_file_records_by_pk_hash_bucket(
+                annotated_delta,
+                8,
+                ["pk"],
+                ["sk"],
+                enable_streaming_hash_bucket=enable_streaming_hash_bucket,
+                deltacat_storage=storage,
+            )
+            expected_max_entries = 1 if enable_streaming_hash_bucket else len(tables)
+            self.assertEqual(storage.max_entries_per_download, expected_max_entries)
+
+        (batch_groups, batch_count), (stream_groups, stream_count) = (
+            results[False],
+            results[True],
+        )
+        self.assertEqual(batch_count, 250)
+        self.assertEqual(stream_count, batch_count)
+        for batch_dfes, stream_dfes in zip(batch_groups, stream_groups):
+            if batch_dfes is None:
+                self.assertIsNone(stream_dfes)
+                continue
+            self.assertEqual(len(batch_dfes), len(stream_dfes))
+            for batch_dfe, stream_dfe in zip(batch_dfes, stream_dfes):
+                self.assertEqual(batch_dfe.file_index, stream_dfe.file_index)
+                self.assertEqual(
+                    batch_dfe.file_record_count, stream_dfe.file_record_count
+                )
+                self.assertTrue(batch_dfe.table.equals(stream_dfe.table))
+
+    def test_prefetch_matches_serial_read(self):
+        rng = np.random.default_rng(4)
+        tables = [
+            pa.table({"pk": rng.integers(0, 100, size=size)})
+            for size in (30, 10, 0, 40, 20, 50)
+        ]
+        annotated_delta = _annotated_delta(tables)
+        serial_storage = InMemoryDeltaStorage(tables)
+        serial_groups, serial_count = _group_file_records_by_pk_hash_bucket(
+            annotated_delta,
+            4,
+            ["pk"],
+            [],
+            enable_streaming_hash_bucket=True,
+            deltacat_storage=serial_storage,
+        )
+        self.assertEqual(serial_storage.max_concurrent_downloads, 1)
+        for prefetch_depth in (1, 3, 10):
+            storage = InMemoryDeltaStorage(tables, download_latency=0.02)
+            groups, record_count = _group_file_records_by_pk_hash_bucket(
+                annotated_delta,
+                4,
+                ["pk"],
+                [],
+                enable_streaming_hash_bucket=True,
+                prefetch_depth=prefetch_depth,
+                deltacat_storage=storage,
+            )
+            self.assertEqual(record_count, serial_count)
+            self.assertLessEqual(storage.max_concurrent_downloads, prefetch_depth)
+            if prefetch_depth > 1:
+                self.assertGreater(storage.max_concurrent_downloads, 1)
+            for serial_dfes, dfes in zip(serial_groups, groups):
+                self.assertEqual(
+                    [(dfe.file_index, dfe.table) for dfe in serial_dfes or []],
+                    [(dfe.file_index, dfe.table) for dfe in dfes or []],
+                )
+
+    def test_row_group_ranges_match_whole_file(self):
+        rng = np.random.default_rng(5)
+        table = pa.table({"pk": rng.integers(0, 300, size=100)})
+        annotated_delta = _annotated_delta([table])
+        whole_groups, whole_count = _group_file_records_by_pk_hash_bucket(
+            annotated_delta,
+            4,
+            ["pk"],
+            [],
+            deltacat_storage=InMemoryDeltaStorage([table]),
+        )
+        # annotate the file as 3 row group ranges of 25 record row groups
+        annotated_delta = _annotated_delta([table] * 3)
+        annotated_delta.annotations = [
+            DeltaAnnotation.of(0, DeltaType.UPSERT, 7, rg_range, rg_range[0] * 25, 100)
+            for rg_range in [(0, 1), (1, 3), (3, 4)]
+        ]
+        storage = InMemoryDeltaStorage([table] * 3, row_group_size=25)
+        groups, record_count = _group_file_records_by_pk_hash_bucket(
+            annotated_delta,
+            4,
+            ["pk"],
+            [],
+            deltacat_storage=storage,
+        )
+        self.assertEqual(storage.max_entries_per_download, 1)
+        self.assertEqual(record_count, whole_count)
+        for whole_dfes, dfes in zip(whole_groups, groups):
+            whole_table = whole_dfes[0].table
+            self.assertTrue(all(dfe.file_record_count == 100 for dfe in dfes))
+            # the pieces hold the same records at the same file record indices
+            self.assertTrue(
+                pa.concat_tables(dfe.table for dfe in dfes).equals(whole_table)
+            )
+            self.assertEqual(
+                np.concatenate(
+                    [sc.record_index_column_np(dfe.table) for dfe in dfes]
+                ).tolist(),
+                sc.record_index_column_np(whole_table).tolist(),
+            )
+
+    def test_streaming_empty_delta(self):
+        annotated_delta = _annotated_delta([])
+        groups, record_count = _group_file_records_by_pk_hash_bucket(
+            annotated_delta,
+            8,
+            ["pk"],
+            [],
+            enable_streaming_hash_bucket=True,
+            deltacat_storage=InMemoryDeltaStorage([]),
+        )
+        self.assertIsNone(groups)
+        self.assertEqual(record_count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+
+import numpy as np
+import pyarrow as pa
+
+from deltacat.compute.compactor import RecordIndexRanges
+from deltacat.compute.compactor.steps.materialize import (
+    _download_kept_records,
+    _record_index_ranges_to_mask,
+    _slice_record_mask,
+)
+from deltacat.storage import Delta, Manifest, ManifestEntry, ManifestMeta
+from deltacat.types.media import ContentEncoding, ContentType
+from deltacat.utils.pyarrow import ReadKwargsProviderPyArrowParquetRowGroups
+
+
+class TestRecordIndexRangesToMask(unittest.TestCase):
+    def test_mask_matches_record_indices(self):
+        rng = np.random.default_rng(5)
+        record_indices = np.flatnonzero(rng.random(1000) > 0.4)
+        # ranges from different dedupe tasks may be adjacent to each other
+        record_index_ranges_list = [
+            RecordIndexRanges.of_record_indices(record_indices[:300]),
+            RecordIndexRanges.of_record_indices(record_indices[300:]),
+        ]
+        mask = _record_index_ranges_to_mask(record_index_ranges_list, 1000)
+        self.assertEqual(np.flatnonzero(mask).tolist(), record_indices.tolist())
+
+    def test_last_record(self):
+        mask = _record_index_ranges_to_mask(
+            [RecordIndexRanges.of_record_indices(np.array([0, 4]))], 5
+        )
+        self.assertEqual(mask.tolist(), [True, False, False, False, True])
+
+
+class TestSliceRecordMask(unittest.TestCase):
+    def test_slices_of_selected_records(self):
+        mask = np.array([True, False, True, True, False, True, True])
+        sliced_mask = _slice_record_mask(mask, [(0, 1), (3, 5)])
+        self.assertEqual(np.flatnonzero(sliced_mask).tolist(), [0, 5, 6])
+
+    def test_slices_partition_selected_records(self):
+        rng = np.random.default_rng(7)
+        mask = rng.random(1000) > 0.5
+        selected_count = int(mask.sum())
+        boundaries = [0, selected_count // 3, selected_count // 2, selected_count]
+        sliced_masks = [
+            _slice_record_mask(mask, [(start, stop)])
+            for start, stop in zip(boundaries[:-1], boundaries[1:])
+        ]
+        self.assertEqual(
+            sum(m.astype(int) for m in sliced_masks).tolist(), mask.astype(int).tolist()
+        )
+
+
+class _FakeStorage:
+    def __init__(self, table, honor_record_range):
+        self.table = table
+        self.honor_record_range = honor_record_range
+        self.file_reader_kwargs_providers = []
+
+    def download_delta_manifest_entry(
+        self, delta, entry_index, file_reader_kwargs_provider=None
+    ):
+        self.file_reader_kwargs_providers.append(file_reader_kwargs_provider)
+        if self.honor_record_range and file_reader_kwargs_provider:
+            kwargs = file_reader_kwargs_provider(ContentType.PARQUET.value, {})
+            if "record_range" in kwargs:
+                start, stop = kwargs["record_range"]
+                return self.table.slice(start, stop - start)
+        return self.table
+
+
+class TestDownloadKeptRecords(unittest.TestCase):
+    def setUp(self):
+        self.table = pa.table({"pk": np.arange(100)})
+        self.delta = Delta.of(
+            None,
+            None,
+            None,
+            None,
+            Manifest.of(
+                [
+                    ManifestEntry.of(
+                        "s3://bucket/file.parquet",
+                        ManifestMeta.of(
+                            100,
+                            1,
+                            ContentType.PARQUET.value,
+                            ContentEncoding.IDENTITY.value,
+                        ),
+                    )
+                ]
+            ),
+        )
+        self.mask = np.zeros(100, dtype=bool)
+        self.mask[[20, 21, 35, 60]] = True
+
+    def _download_kept_records(self, storage, enable_row_group_split):
+        table = _download_kept_records(
+            self.delta,
+            0,
+            self.mask,
+            None,
+            enable_row_group_split,
+            storage,
+        )
+        self.assertEqual(table["pk"].to_pylist(), [20, 21, 35, 60])
+
+    def test_reads_record_range(self):
+        storage = _FakeStorage(self.table, honor_record_range=True)
+        self._download_kept_records(storage, True)
+        (provider,) = storage.file_reader_kwargs_providers
+        self.assertIsInstance(provider, ReadKwargsProviderPyArrowParquetRowGroups)
+        self.assertEqual(provider.record_range, (20, 61))
+
+    def test_storage_reads_whole_file(self):
+        storage = _FakeStorage(self.table, honor_record_range=False)
+        self._download_kept_records(storage, True)
+
+    def test_row_group_split_disabled(self):
+        storage = _FakeStorage(self.table, honor_record_range=True)
+        self._download_kept_records(storage, False)
+        self.assertEqual(storage.file_reader_kwargs_providers, [None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,428 @@
+import io
+import tempfile
+import unittest
+from itertools import count
+from typing import Dict, List
+from unittest import mock
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as papq
+import ray
+
+from deltacat.aws import s3u
+from deltacat.compute.compactor import RoundCompletionInfo
+from deltacat.compute.compactor import compaction_session as cs
+from deltacat.compute.compactor.model.pyarrow_write_result import PyArrowWriteResult
+from deltacat.compute.compactor.utils import primary_key_index as pki
+from deltacat.compute.compactor.utils import round_completion_file as rcf
+from deltacat.compute.compactor.utils.primary_key_hash import hash_primary_keys
+from deltacat.storage import DeltaType
+from deltacat.tests.test_utils.local_storage import LocalStorage
+from deltacat.utils.resources import ClusterUtilization
+
+HASH_BUCKET_COUNT = 8
+
+
+def _sorted_rows(table: pa.Table) -> List[Dict]:
+    return sorted(table.to_pylist(), key=lambda row: row["pk"])
+
+
+def _hash_bucket_indices(pks: List[int]) -> List[int]:
+    digests = hash_primary_keys(pa.table({"pk": pks}), ["pk"]).to_pylist()
+    return [
+        pki.pk_digest_to_hash_bucket_index(digest, HASH_BUCKET_COUNT)
+        for digest in digests
+    ]
+
+
+class _CompactionSessionTestCase(unittest.TestCase):
+    """
+    Runs compaction sessions on a local Ray cluster in local mode, against a
+    local file storage and an in-memory compaction artifact S3 bucket.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # run tasks in this process, so that they see the mocks below (ray may
+        # already be auto-initialized by deltacat's loggers)
+        cls._ray_was_initialized = ray.is_initialized()
+        ray.shutdown()
+        ray.init(local_mode=True, num_cpus=4, include_dashboard=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        ray.shutdown()
+        if cls._ray_was_initialized:
+            # deltacat's loggers keep reading the runtime context of the
+            # driver, so restore the cluster that later tests expect
+            ray.init(include_dashboard=False)
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.storage = LocalStorage(temp_dir.name)
+        self.rng = np.random.default_rng(0)
+        self.s3_objects = {}
+        self.index_tables = {}
+        self.index_hash_bucket_reads = []
+        self.full_recompaction_ids = count()
+        patcher = mock.patch.multiple(
+            s3u,
+            upload=self._upload,
+            download=self._download,
+            delete_files_by_prefix=self._delete_files_by_prefix,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # local mode tasks run on the driver, which has no CPU resources
+        cluster_resources = {"CPU": 4.0, "memory": 1.0, "object_store_memory": 1.0}
+        patcher = mock.patch.object(
+            ClusterUtilization,
+            "get_current_cluster_utilization",
+            return_value=ClusterUtilization(cluster_resources, cluster_resources),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.multiple(
+            pki,
+            write_primary_key_index_files=self._write_primary_key_index_files,
+            download_hash_bucket_entries=self._download_hash_bucket_entries,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _upload(self, s3_url, body, **kwargs):
+        self.s3_objects[s3_url] = body.encode() if isinstance(body, str) else body
+
+    def _download(self, s3_url, fail_if_not_found=True, **kwargs):
+        if s3_url in self.s3_objects:
+            return {"Body": io.BytesIO(self.s3_objects[s3_url])}
+        if fail_if_not_found:
+            raise ValueError(f"Object not found: {s3_url}")
+        return None
+
+    def _delete_files_by_prefix(self, bucket, prefix, **kwargs):
+        for s3_url in list(self.index_tables):
+            if prefix in s3_url:
+                del self.index_tables[s3_url]
+
+    def _write_primary_key_index_files(
+        self,
+        table,
+        primary_key_index_version_locator,
+        s3_bucket,
+        hash_bucket_index,
+        records_per_index_file,
+    ):
+        s3_url = primary_key_index_version_locator.get_pkiv_hb_index_manifest_s3_url(
+            s3_bucket,
+            hash_bucket_index,
+        )
+        self.index_tables[s3_url] = table
+        return PyArrowWriteResult.of(1, table.nbytes, table.nbytes, len(table))
+
+    def _download_hash_bucket_entries(
+        self,
+        s3_bucket,
+        hash_bucket_index,
+        primary_key_index_version_locator,
+        file_reader_kwargs_provider=None,
+    ):
+        self.index_hash_bucket_reads.append(hash_bucket_index)
+        s3_url = primary_key_index_version_locator.get_pkiv_hb_index_manifest_s3_url(
+            s3_bucket,
+            hash_bucket_index,
+        )
+        return [self.index_tables[s3_url]]
+
+    def _add_delta(
+        self,
+        stream_position: int,
+        pks,
+        delta_type: DeltaType = DeltaType.UPSERT,
+    ):
+        pks = np.asarray(pks, dtype=np.int64)
+        self.storage.add_delta(
+            "source",
+            stream_position,
+            [
+                pa.table(
+                    {
+                        "pk": pks,
+                        "value": stream_position * 1000 + np.arange(len(pks)),
+                    }
+                )
+            ],
+            delta_type,
+        )
+
+    def _compact(
+        self,
+        last_stream_position: int,
+        destination: str = "compacted",
+        **kwargs,
+    ) -> RoundCompletionInfo:
+        kwargs.setdefault("hash_bucket_count", HASH_BUCKET_COUNT)
+        cs.compact_partition(
+            self.storage.partition_locator("source"),
+            self.storage.partition_locator(destination),
+            {"pk"},
+            "bucket",
+            last_stream_position,
+            list_deltas_kwargs={},
+            deltacat_storage=self.storage,
+            **kwargs,
+        )
+        return rcf.read_round_completion_file(
+            "bucket",
+            self.storage.partition_locator("source"),
+        )
+
+    def _compacted_file_uris(self, destination: str = "compacted") -> List[str]:
+        return [
+            entry.uri
+            for delta in self.storage.committed_deltas(destination)
+            for entry in delta.manifest.entries
+        ]
+
+    def _assert_matches_full_recompaction(
+        self,
+        last_stream_position: int,
+        **kwargs,
+    ):
+        # fully recompact all source deltas into a new destination, without
+        # the round completion file and artifacts of previous rounds
+        s3_objects, index_tables = self.s3_objects, self.index_tables
+        self.s3_objects, self.index_tables = {}, {}
+        destination = f"full_recompaction_{next(self.full_recompaction_ids)}"
+        try:
+            self._compact(last_stream_position, destination, **kwargs)
+        finally:
+            self.s3_objects, self.index_tables = s3_objects, index_tables
+        self.assertEqual(
+            _sorted_rows(self.storage.read_table("compacted")),
+            _sorted_rows(self.storage.read_table(destination)),
+        )
+
+    def _hash_bucket_file_uris(
+        self,
+        round_completion_info: RoundCompletionInfo,
+    ) -> List[List[str]]:
+        uris = self._compacted_file_uris()
+        hash_bucket_file_uris = []
+        offset = 0
+        for file_count in round_completion_info.hash_bucket_file_counts:
+            hash_bucket_file_uris.append(uris[offset : offset + file_count])
+            offset += file_count
+        self.assertEqual(offset, len(uris))
+        return hash_bucket_file_uris
+
+    def _high_watermark(self, round_completion_info: RoundCompletionInfo) -> int:
+        return round_completion_info.high_watermark.get(
+            self.storage.partition_locator("source")
+        )
+
+
+class TestPrimaryKeyIndexCompaction(_CompactionSessionTestCase):
+    def setUp(self):
+        super().setUp()
+        for stream_position in range(1, 4):
+            self._add_delta(stream_position, self.rng.integers(0, 500, 300))
+        self.first_round_info = self._compact(3, enable_primary_key_index=True)
+        self.first_round_file_uris = self._hash_bucket_file_uris(self.first_round_info)
+        self.index_hash_bucket_reads.clear()
+
+    def test_skips_unchanged_hash_buckets(self):
+        new_pks = [7, 123, 600]
+        updated_hash_buckets = set(_hash_bucket_indices(new_pks))
+        self.assertLess(len(updated_hash_buckets), HASH_BUCKET_COUNT)
+        self._add_delta(4, new_pks)
+        round_info = self._compact(4, enable_primary_key_index=True)
+        self.assertEqual(self._high_watermark(round_info), 4)
+        # only the primary key index of updated hash buckets is read
+        self.assertEqual(set(self.index_hash_bucket_reads), updated_hash_buckets)
+        # compacted files of all other hash buckets are copied by reference
+        hash_bucket_file_uris = self._hash_bucket_file_uris(round_info)
+        first_round_root_paths = (
+            self.first_round_info.hash_bucket_index_version_root_paths
+        )
+        root_paths = round_info.hash_bucket_index_version_root_paths
+        for hb_index in range(HASH_BUCKET_COUNT):
+            if hb_index in updated_hash_buckets:
+                self.assertNotEqual(
+                    hash_bucket_file_uris[hb_index],
+                    self.first_round_file_uris[hb_index],
+                )
+                self.assertNotEqual(
+                    root_paths[hb_index],
+                    first_round_root_paths[hb_index],
+                )
+            else:
+                self.assertEqual(
+                    hash_bucket_file_uris[hb_index],
+                    self.first_round_file_uris[hb_index],
+                )
+                self.assertEqual(
+                    root_paths[hb_index],
+                    first_round_root_paths[hb_index],
+                )
+        self._assert_matches_full_recompaction(4)
+
+        # deletes are deduped against the new round's primary key index
+        self._add_delta(5, [7, 8, 9, 123], DeltaType.DELETE)
+        self._compact(5, enable_primary_key_index=True)
+        self._assert_matches_full_recompaction(5)
+
+    def test_hash_bucket_count_change_ignores_index(self):
+        self._add_delta(4, [7, 123, 600])
+        round_info = self._compact(
+            4,
+            hash_bucket_count=4,
+            enable_primary_key_index=True,
+        )
+        self.assertEqual(self.index_hash_bucket_reads, [])
+        self.assertEqual(len(round_info.hash_bucket_file_counts), 4)
+        self._assert_matches_full_recompaction(4)
+
+
+class TestBloomFilterPruning(_CompactionSessionTestCase):
+    def setUp(self):
+        super().setUp()
+        for stream_position in range(1, 4):
+            self._add_delta(stream_position, self.rng.integers(0, 500, 300))
+        self.compact_kwargs = {
+            "enable_bloom_filter_pruning": True,
+            "records_per_compacted_file": 25,
+        }
+        self._compact(3, **self.compact_kwargs)
+        self.pruned_file_uris = []
+        prune_compacted_files = cs._prune_compacted_files
+
+        def spy(*args, **kwargs):
+            uniform_deltas, pruned_entries = prune_compacted_files(*args, **kwargs)
+            self.pruned_file_uris.append([entry.uri for entry in pruned_entries])
+            return uniform_deltas, pruned_entries
+
+        patcher = mock.patch.object(cs, "_prune_compacted_files", spy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _file_pks(self) -> Dict[str, set]:
+        return {
+            uri: set(papq.read_table(uri)["pk"].to_pylist())
+            for uri in self._compacted_file_uris()
+        }
+
+    def _update_file_record(self, stream_position: int, uri: str) -> int:
+        previous_file_pks = self._file_pks()
+        updated_pk = min(previous_file_pks[uri])
+        self._add_delta(stream_position, [updated_pk])
+        self._compact(stream_position, **self.compact_kwargs)
+        (pruned_file_uris,) = self.pruned_file_uris[-1:]
+        # the file containing the updated primary key is never pruned
+        self.assertNotIn(uri, pruned_file_uris)
+        self.assertTrue(pruned_file_uris)
+        # pruned files are referenced unchanged
+        file_uris = self._compacted_file_uris()
+        for pruned_file_uri in pruned_file_uris:
+            self.assertNotIn(updated_pk, previous_file_pks[pruned_file_uri])
+            self.assertIn(pruned_file_uri, file_uris)
+        self.assertNotIn(uri, file_uris)
+        updated_rows = pc.filter(
+            self.storage.read_table("compacted"),
+            pc.equal(self.storage.read_table("compacted")["pk"], updated_pk),
+        )
+        self.assertEqual(updated_rows["value"].to_pylist(), [stream_position * 1000])
+        self._assert_matches_full_recompaction(stream_position)
+        return updated_pk
+
+    def test_prunes_only_files_without_new_primary_keys(self):
+        first_round_file_uris = self._compacted_file_uris()
+        self.assertGreater(len(first_round_file_uris), 4)
+        self._update_file_record(4, first_round_file_uris[0])
+        # update a file pruned in the previous round, whose Bloom filter was
+        # carried over from the first round
+        pruned_file_uri = self.pruned_file_uris[-1][0]
+        self._update_file_record(5, pruned_file_uri)
+
+
+class TestDeleteOnlyCompaction(_CompactionSessionTestCase):
+    def setUp(self):
+        super().setUp()
+        for stream_position in range(1, 4):
+            self._add_delta(stream_position, self.rng.integers(0, 500, 300))
+        self.delete_only_rounds = []
+        execute_delete_only_round = cs._execute_delete_only_round
+
+        def spy(*args, **kwargs):
+            delete_only_round = execute_delete_only_round(*args, **kwargs)
+            self.delete_only_rounds.append(delete_only_round is not None)
+            return delete_only_round
+
+        patcher = mock.patch.object(cs, "_execute_delete_only_round", spy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _assert_delete_only_round_matches_dedupe_round(self, **kwargs):
+        kwargs["enable_delete_only_fast_path"] = True
+        first_round_info = self._compact(3, **kwargs)
+        compacted_table = self.storage.read_table("compacted")
+        pks = compacted_table["pk"].to_pylist()
+        deleted_pks = pks[::10] + [1000]
+        self._add_delta(4, deleted_pks, DeltaType.DELETE)
+        round_info = self._compact(4, **kwargs)
+        self.assertEqual(self.delete_only_rounds, [True])
+        # deleted records are gone, and all other records keep their order
+        self.assertTrue(
+            self.storage.read_table("compacted").equals(
+                compacted_table.filter(
+                    pc.invert(pc.is_in(compacted_table["pk"], pa.array(deleted_pks)))
+                )
+            )
+        )
+        self._assert_matches_full_recompaction(4)
+        self.assertEqual(self._high_watermark(first_round_info), 3)
+        self.assertEqual(self._high_watermark(round_info), 4)
+        (compacted_delta,) = self.storage.committed_deltas("compacted")
+        self.assertEqual(round_info.compacted_delta_locator, compacted_delta.locator)
+        self.assertEqual(
+            round_info.compacted_pyarrow_write_result.records,
+            len(compacted_table) - len(deleted_pks) + 1,
+        )
+        return round_info
+
+    def test_delete_only_round(self):
+        self._assert_delete_only_round_matches_dedupe_round()
+
+    def test_delete_only_round_with_primary_key_index(self):
+        round_info = self._assert_delete_only_round_matches_dedupe_round(
+            enable_primary_key_index=True
+        )
+        self.assertEqual(
+            sum(round_info.hash_bucket_file_counts),
+            len(self._compacted_file_uris()),
+        )
+        # later rounds dedupe against the primary key index it rewrote
+        self._add_delta(5, [0, 1, 2, 3])
+        self._compact(5, enable_primary_key_index=True)
+        self._assert_matches_full_recompaction(5)
+
+    def test_delete_only_round_with_bloom_filters(self):
+        self._assert_delete_only_round_matches_dedupe_round(
+            enable_bloom_filter_pruning=True,
+            records_per_compacted_file=25,
+        )
+
+    def test_upserts_run_dedupe_round(self):
+        self._compact(3, enable_delete_only_fast_path=True)
+        self._add_delta(4, [5], DeltaType.DELETE)
+        self._add_delta(5, [6])
+        self._compact(5, enable_delete_only_fast_path=True)
+        self.assertEqual(self.delete_only_rounds, [False])
+        self._assert_matches_full_recompaction(5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import io
+import unittest
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as papq
+
+from deltacat.compute.compactor import DeltaAnnotated
+from deltacat.storage import (
+    Delta,
+    DeltaLocator,
+    DeltaType,
+    Manifest,
+    ManifestEntry,
+    ManifestMeta,
+)
+
+
+def _parquet_metadata(record_count, row_group_size):
+    sink = io.BytesIO()
+    papq.write_table(
+        pa.table({"pk": np.arange(record_count)}),
+        sink,
+        row_group_size=row_group_size,
+    )
+    return papq.read_metadata(pa.BufferReader(sink.getvalue()))
+
+
+def _annotated_delta(content_lengths, stream_position=1):
+    entries = [
+        ManifestEntry.of(
+            f"s3://bucket/file-{i}.parquet",
+            ManifestMeta.of(100, content_length, "application/parquet", "identity"),
+        )
+        for i, content_length in enumerate(content_lengths)
+    ]
+    manifest = Manifest.of(entries)
+    delta = Delta.of(
+        DeltaLocator.of(None, stream_position),
+        DeltaType.UPSERT,
+        manifest.meta,
+        None,
+        manifest,
+    )
+    return DeltaAnnotated.of(delta)
+
+
+class TestRebatch(unittest.TestCase):
+    def test_large_entries_split_by_row_groups(self):
+        metadata = _parquet_metadata(1000, 100)
+        annotated_delta = _annotated_delta([4000, 500])
+        requested_urls = []
+
+        def row_group_metadata_provider(entry):
+            requested_urls.append(entry.uri)
+            return metadata
+
+        groups = DeltaAnnotated.rebatch(
+            [annotated_delta],
+            1000,
+            row_group_metadata_provider=row_group_metadata_provider,
+        )
+        # only the entry larger than the minimum group size is inspected
+        self.assertEqual(requested_urls, ["s3://bucket/file-0.parquet"])
+        annotations = [a for group in groups for a in group.annotations]
+        self.assertEqual(
+            [a.annotation_row_group_range for a in annotations],
+            [(0, 3), (3, 6), (6, 9), (9, 10), None],
+        )
+        self.assertEqual(
+            [a.annotation_first_record_index for a in annotations],
+            [0, 300, 600, 900, 0],
+        )
+        self.assertEqual(
+            [a.annotation_file_record_count for a in annotations],
+            [1000, 1000, 1000, 1000, None],
+        )
+        # each group refers to the manifest entry of each of its annotations
+        for group in groups:
+            self.assertEqual(len(group.manifest.entries), len(group.annotations))
+            for annotation, entry in zip(group.annotations, group.manifest.entries):
+                self.assertEqual(
+                    entry.uri,
+                    f"s3://bucket/file-{annotation.annotation_file_index}.parquet",
+                )
+
+    def test_unsplittable_entries_unchanged(self):
+        annotated_delta = _annotated_delta([4000, 500])
+        for metadata in (None, _parquet_metadata(1000, 1000)):
+            groups = DeltaAnnotated.rebatch(
+                [annotated_delta],
+                1000,
+                row_group_metadata_provider=lambda entry: metadata,
+            )
+            self.assertEqual(
+                [len(group.annotations) for group in groups],
+                [1, 1],
+            )
+            for group in groups:
+                self.assertIsNone(group.annotations[0].annotation_row_group_range)
+
+
+class TestFilterFileIndices(unittest.TestCase):
+    def test_filter_keeps_original_file_indices(self):
+        annotated_delta = _annotated_delta([100, 200, 300, 400])
+        filtered = DeltaAnnotated.filter_file_indices(annotated_delta, {1, 3})
+        self.assertEqual(
+            [a.annotation_file_index for a in filtered.annotations],
+            [1, 3],
+        )
+        self.assertEqual(
+            [entry.uri for entry in filtered.manifest.entries],
+            ["s3://bucket/file-1.parquet", "s3://bucket/file-3.parquet"],
+        )
+        self.assertEqual(filtered.locator, annotated_delta.locator)
+
+    def test_filter_all_file_indices(self):
+        annotated_delta = _annotated_delta([100, 200])
+        self.assertIsNone(DeltaAnnotated.filter_file_indices(annotated_delta, set()))
+
+
+if __name__ == "__main__":
+    unittest.main()
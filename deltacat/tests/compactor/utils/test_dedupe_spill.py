@@ -0,0 +1,57 @@
+import os
+import unittest
+
+import pyarrow as pa
+
+from deltacat.compute.compactor.utils import system_columns as sc
+from deltacat.compute.compactor.utils.dedupe_spill import HashBucketSpill
+from deltacat.utils.common import sha1_digest
+
+
+def _hb_table(pks, record_offset=0) -> pa.Table:
+    table = sc.append_pk_hash_column(
+        pa.table({"pk": pks}),
+        [sha1_digest(bytes(str(pk), "utf-8")) for pk in pks],
+    )
+    return sc.append_record_idx_col(
+        table.drop(["pk"]),
+        range(record_offset, record_offset + len(pks)),
+    )
+
+
+class TestHashBucketSpill(unittest.TestCase):
+    def test_partitions_by_digest(self):
+        with HashBucketSpill(4) as spill:
+            spill.spill({0: _hb_table([1, 2, 3, 2]), 3: _hb_table([4])})
+            spill.spill({0: _hb_table([3, 5, 1], record_offset=4), 1: _hb_table([])})
+            self.assertEqual(spill.hash_bucket_indices, [0, 3])
+            self.assertGreater(spill.spilled_bytes, 0)
+            digests_seen = set()
+            records = []
+            for partition_tables in spill.read_partitions(0):
+                self.assertLessEqual(len(partition_tables), 2)
+                for table in partition_tables:
+                    # spilled record order is preserved in each partition
+                    record_indices = sc.record_index_column_np(table).tolist()
+                    self.assertEqual(sorted(record_indices), record_indices)
+                    records.extend(record_indices)
+                table = pa.concat_tables(partition_tables)
+                digests = set(sc.pk_hash_column(table).to_pylist())
+                # records with the same digest are never split across partitions
+                self.assertFalse(digests & digests_seen)
+                digests_seen |= digests
+            self.assertEqual(sorted(records), list(range(7)))
+            self.assertEqual(len(digests_seen), 4)
+            spill_dir = spill._spill_dir
+            self.assertTrue(os.listdir(spill_dir))
+        self.assertFalse(os.path.exists(spill_dir))
+
+    def test_empty_spill(self):
+        with HashBucketSpill(2) as spill:
+            spill.spill({0: _hb_table([])})
+            self.assertEqual(spill.hash_bucket_indices, [])
+            self.assertEqual(list(spill.read_partitions(0)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
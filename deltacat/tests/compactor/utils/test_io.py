@@ -1,3 +1,4 @@
+import time
 import unittest
 from unittest import mock
 from deltacat.tests.test_utils.constants import TEST_DELTA
@@ -85,3 +86,164 @@ class TestFitInputDeltas(unittest.TestCase):
 
         with self.assertRaises(KeyError):
             io.fit_input_deltas([], {}, self.COMPACTION_AUDIT, None)
+
+
+class _ManifestStorage:
+    """
+    Serves delta manifests from a dictionary of stream position to manifest,
+    and records the stream positions of the manifests fetched.
+    """
+
+    def __init__(self, manifests=None, latency=0.0):
+        self.manifests = manifests or {}
+        self.latency = latency
+        self.fetched_stream_positions = []
+
+    def get_delta_manifest(self, delta):
+        time.sleep(self.latency)
+        self.fetched_stream_positions.append(delta.stream_position)
+        return self.manifests[delta.stream_position]
+
+
+def _delta(partition_locator, stream_position, content_length):
+    from deltacat.storage import (
+        Delta,
+        DeltaLocator,
+        DeltaType,
+        Manifest,
+        ManifestEntry,
+        ManifestMeta,
+    )
+
+    manifest = Manifest.of(
+        [
+            ManifestEntry.of(
+                f"s3://bucket/{stream_position}.parquet",
+                ManifestMeta.of(10, content_length, "application/parquet", "identity"),
+            )
+        ]
+    )
+    return Delta.of(
+        DeltaLocator.of(partition_locator, stream_position),
+        DeltaType.UPSERT,
+        manifest.meta,
+        None,
+        manifest,
+    )
+
+
+class TestLimitInputDeltas(unittest.TestCase):
+    CLUSTER_RESOURCES = {"CPU": 2, "memory": 1000.0, "object_store_memory": 1000.0}
+
+    def setUp(self):
+        from deltacat.compute.compactor.model.compaction_session_audit_info import (
+            CompactionSessionAuditInfo,
+        )
+        from deltacat.storage import PartitionLocator
+
+        self.compaction_audit = CompactionSessionAuditInfo("1.0", "test")
+        self.source = PartitionLocator.at("ns", "source", "1", [], None, None, "p1")
+        self.compacted = PartitionLocator.at(
+            "ns", "compacted", "1", [], None, None, "p2"
+        )
+
+    def _limit_input_deltas(self, input_deltas, stats, source_partition_locator):
+        from deltacat.compute.compactor.utils import io
+
+        return io.limit_input_deltas(
+            input_deltas,
+            self.CLUSTER_RESOURCES,
+            4,
+            0,
+            {
+                delta.stream_position: {"stats": {"pyarrowTableBytes": pyarrow_bytes}}
+                for delta, pyarrow_bytes in zip(input_deltas, stats)
+            },
+            self.compaction_audit,
+            source_partition_locator=source_partition_locator,
+            deltacat_storage=_ManifestStorage(),
+        )
+
+    def test_limits_source_deltas_to_prefix(self):
+        input_deltas = [
+            _delta(self.source, 1, 100),
+            _delta(self.source, 2, 100),
+            _delta(self.source, 3, 100),
+            _delta(self.compacted, 5, 100),
+        ]
+        (
+            delta_list,
+            _,
+            high_watermark,
+            require_multiple_rounds,
+        ) = self._limit_input_deltas(input_deltas, [300, 300, 300, 300], self.source)
+
+        self.assertTrue(require_multiple_rounds)
+        # the compacted delta is always included, and the source deltas are
+        # limited to the prefix that fits with it
+        self.assertEqual(
+            [da.stream_position for da in delta_list],
+            [1, 2, 5],
+        )
+        self.assertEqual(high_watermark.get(self.source), 2)
+        self.assertEqual(high_watermark.get(self.compacted), 5)
+        self.assertEqual(self.compaction_audit.input_size_bytes, 300)
+
+    def test_includes_first_source_delta_if_none_fit(self):
+        input_deltas = [
+            _delta(self.source, 1, 100),
+            _delta(self.source, 2, 100),
+            _delta(self.compacted, 5, 100),
+        ]
+        (
+            delta_list,
+            _,
+            high_watermark,
+            require_multiple_rounds,
+        ) = self._limit_input_deltas(input_deltas, [600, 100, 900], self.source)
+
+        self.assertTrue(require_multiple_rounds)
+        self.assertEqual([da.stream_position for da in delta_list], [1, 5])
+        self.assertEqual(high_watermark.get(self.source), 1)
+
+    def test_fetches_only_missing_manifests(self):
+        from deltacat.compute.compactor.utils import io
+
+        input_deltas = [_delta(self.source, sp, 100) for sp in range(1, 11)]
+        storage = _ManifestStorage(
+            {delta.stream_position: delta.manifest for delta in input_deltas},
+            latency=0.05,
+        )
+        for delta in input_deltas[2:]:
+            delta.manifest = None
+        start = time.monotonic()
+        delta_list, _, _, _ = io.limit_input_deltas(
+            input_deltas,
+            {"CPU": 2, "memory": 1e6, "object_store_memory": 1e6},
+            4,
+            0,
+            {},
+            self.compaction_audit,
+            manifest_fetch_parallelism=4,
+            deltacat_storage=storage,
+        )
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(sorted(storage.fetched_stream_positions), list(range(3, 11)))
+        self.assertEqual(len(delta_list), 10)
+        # 8 fetches of 50ms each run 4 at a time
+        self.assertLess(elapsed, 0.3)
+        self.assertGreater(self.compaction_audit.delta_discovery_time_in_seconds, 0)
+
+    def test_all_deltas_fit(self):
+        input_deltas = [_delta(self.source, 1, 100), _delta(self.source, 2, 100)]
+        (
+            delta_list,
+            _,
+            high_watermark,
+            require_multiple_rounds,
+        ) = self._limit_input_deltas(input_deltas, [100, 100], None)
+
+        self.assertFalse(require_multiple_rounds)
+        self.assertEqual(len(delta_list), 2)
+        self.assertEqual(high_watermark.get(self.source), 2)
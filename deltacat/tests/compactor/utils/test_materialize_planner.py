@@ -0,0 +1,137 @@
+import unittest
+
+import numpy as np
+
+from deltacat.compute.compactor import DeltaFileLocator
+from deltacat.compute.compactor.model.dedupe_result import DedupeResult
+from deltacat.compute.compactor.utils.materialize_planner import (
+    plan_materialize_tasks,
+)
+
+
+def _dedupe_result(dedupe_task_index, src_file_record_counts):
+    mat_bucket_idx_to_obj_id = {}
+    mat_bucket_idx_to_src_file_record_count = {}
+    for mat_bucket, record_counts in src_file_record_counts.items():
+        mat_bucket_idx_to_obj_id[mat_bucket] = (
+            dedupe_task_index,
+            f"obj-{dedupe_task_index}-{mat_bucket}",
+        )
+        mat_bucket_idx_to_src_file_record_count[mat_bucket] = record_counts
+    return DedupeResult(
+        mat_bucket_idx_to_obj_id,
+        mat_bucket_idx_to_src_file_record_count,
+        np.int64(0),
+        np.double(0),
+        np.double(0),
+        np.double(0),
+    )
+
+
+def _dfl(is_src_delta, stream_position, file_index, file_record_count):
+    return DeltaFileLocator.of(
+        np.bool_(is_src_delta),
+        np.int64(stream_position),
+        np.int32(file_index),
+        np.int64(file_record_count),
+    )
+
+
+class TestPlanMaterializeTasks(unittest.TestCase):
+    def test_balances_files_by_record_count(self):
+        src_dfls = [_dfl(True, 1, i, 100) for i in range(8)]
+        record_counts = [60, 50, 40, 30, 20, 20, 10, 10]
+        dd_results = [
+            _dedupe_result(0, {0: dict(zip(src_dfls[:4], record_counts[:4]))}),
+            _dedupe_result(1, {1: dict(zip(src_dfls[4:], record_counts[4:]))}),
+        ]
+        plans = plan_materialize_tasks(dd_results, 2)
+        self.assertEqual(len(plans), 2)
+        task_record_counts = [
+            sum(
+                stop - start
+                for record_slices in src_file_record_slices.values()
+                for start, stop in record_slices
+            )
+            for _, src_file_record_slices in plans
+        ]
+        self.assertEqual(sorted(task_record_counts), [120, 120])
+        for dd_task_idx_and_obj_ids, src_file_record_slices in plans:
+            # each task only reads the dedupe outputs that contain its files
+            expected_obj_ids = {
+                (0, "obj-0-0") if src_dfls.index(src_dfl) < 4 else (1, "obj-1-1")
+                for src_dfl in src_file_record_slices
+            }
+            self.assertEqual(set(dd_task_idx_and_obj_ids), expected_obj_ids)
+
+    def test_splits_large_files(self):
+        large_dfl = _dfl(True, 1, 0, 1000)
+        small_dfl = _dfl(True, 1, 1, 10)
+        dd_results = [
+            _dedupe_result(0, {0: {large_dfl: 300}}),
+            _dedupe_result(1, {0: {large_dfl: 600, small_dfl: 10}}),
+        ]
+        plans = plan_materialize_tasks(dd_results, 4)
+        self.assertEqual(len(plans), 4)
+        large_file_slices = sorted(
+            record_slice
+            for _, src_file_record_slices in plans
+            for record_slice in src_file_record_slices.get(large_dfl, [])
+        )
+        # slices cover all records kept from the file without overlapping
+        self.assertEqual(large_file_slices[0][0], 0)
+        self.assertEqual(large_file_slices[-1][1], 900)
+        for (_, stop), (start, _) in zip(large_file_slices, large_file_slices[1:]):
+            self.assertEqual(stop, start)
+        for dd_task_idx_and_obj_ids, src_file_record_slices in plans:
+            if large_dfl in src_file_record_slices:
+                self.assertEqual(
+                    sorted(dd_task_idx_and_obj_ids),
+                    [(0, "obj-0-0"), (1, "obj-1-0")],
+                )
+
+    def test_byte_size_cost(self):
+        src_dfls = [_dfl(True, 1, i, 100) for i in range(3)]
+        dd_results = [_dedupe_result(0, {0: {dfl: 100 for dfl in src_dfls}})]
+        plans = plan_materialize_tasks(dd_results, 2)
+        self.assertEqual(sum(len(slices) for _, slices in plans), 3)
+        # the first file is split once its size on disk is taken into account
+        content_lengths = {(True, 1, 0): 900, (True, 1, 1): 50, (True, 1, 2): 50}
+        plans = plan_materialize_tasks(dd_results, 2, content_lengths)
+        first_file_slices = [
+            slices[src_dfls[0]] for _, slices in plans if src_dfls[0] in slices
+        ]
+        self.assertEqual(first_file_slices, [[(0, 50)], [(50, 100)]])
+
+    def test_min_records_per_slice(self):
+        large_dfl = _dfl(True, 1, 0, 1000)
+        small_dfl = _dfl(True, 1, 1, 10)
+        dd_results = [_dedupe_result(0, {0: {large_dfl: 1000, small_dfl: 10}})]
+        plans = plan_materialize_tasks(dd_results, 8, min_records_per_slice=400)
+        large_file_slices = sorted(
+            record_slice
+            for _, src_file_record_slices in plans
+            for record_slice in src_file_record_slices.get(large_dfl, [])
+        )
+        self.assertEqual(large_file_slices, [(0, 500), (500, 1000)])
+
+    def test_untouched_files_are_not_split(self):
+        untouched_dfls = [_dfl(False, 1, i, 1000) for i in range(4)]
+        touched_dfl = _dfl(True, 2, 0, 10)
+        src_file_record_counts = {dfl: 1000 for dfl in untouched_dfls}
+        src_file_record_counts[touched_dfl] = 10
+        dd_results = [_dedupe_result(0, {0: src_file_record_counts})]
+        plans = plan_materialize_tasks(dd_results, 4, min_records_per_slice=10)
+        self.assertEqual(len(plans), 4)
+        for _, src_file_record_slices in plans:
+            for src_dfl, record_slices in src_file_record_slices.items():
+                self.assertEqual(record_slices, [(0, src_file_record_counts[src_dfl])])
+        # untouched files are spread across tasks by count
+        self.assertEqual(
+            sorted(len(slices) for _, slices in plans),
+            [1, 1, 1, 2],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import io
+import unittest
+from unittest import mock
+
+import numpy as np
+import pyarrow as pa
+
+from deltacat.compute.compactor.utils import primary_key_bloom_filter as pbf
+from deltacat.compute.compactor.utils import system_columns as sc
+from deltacat.compute.compactor.utils.primary_key_hash import hash_primary_keys
+from deltacat.constants import PRIMARY_KEY_BLOOM_FILTER_BITS_PER_KEY
+
+
+def _digests(start: int, stop: int) -> np.ndarray:
+    table = pa.table({"pk": range(start, stop)})
+    return sc.digest_bytes_np(hash_primary_keys(table, ["pk"]))
+
+
+class TestPrimaryKeyBloomFilter(unittest.TestCase):
+    def setUp(self) -> None:
+        self.hash_count = pbf.bloom_filter_hash_count(
+            PRIMARY_KEY_BLOOM_FILTER_BITS_PER_KEY
+        )
+        self.bloom_filter = pbf.build_bloom_filter(
+            _digests(0, 10_000), PRIMARY_KEY_BLOOM_FILTER_BITS_PER_KEY
+        )
+
+    def test_no_false_negatives(self):
+        may_contain = pbf.bloom_filter_may_contain(
+            self.bloom_filter,
+            self.hash_count,
+            pbf.bloom_filter_hashes(_digests(0, 10_000)),
+        )
+        self.assertTrue(may_contain.all())
+
+    def test_false_positive_rate(self):
+        may_contain = pbf.bloom_filter_may_contain(
+            self.bloom_filter,
+            self.hash_count,
+            pbf.bloom_filter_hashes(_digests(10_000, 110_000)),
+        )
+        self.assertLess(np.count_nonzero(may_contain), 100)
+
+    def test_empty_bloom_filter(self):
+        bloom_filter = pbf.build_bloom_filter(
+            _digests(0, 0), PRIMARY_KEY_BLOOM_FILTER_BITS_PER_KEY
+        )
+        may_contain = pbf.bloom_filter_may_contain(
+            bloom_filter,
+            self.hash_count,
+            pbf.bloom_filter_hashes(_digests(0, 100)),
+        )
+        self.assertFalse(may_contain.any())
+
+    def test_write_and_read_bloom_filters(self):
+        objects = {}
+
+        def upload(s3_url, body, **kwargs):
+            objects[s3_url] = body
+
+        def download(s3_url, fail_if_not_found=True, **kwargs):
+            return {"Body": io.BytesIO(objects[s3_url])} if s3_url in objects else None
+
+        s3_url = "s3://bucket/bloom-filters/1.parquet"
+        with mock.patch.object(pbf.s3u, "upload", upload), mock.patch.object(
+            pbf.s3u, "download", download
+        ):
+            pbf.write_bloom_filters(
+                s3_url,
+                {"s3://bucket/file.parquet": self.bloom_filter},
+                ["pk"],
+                self.hash_count,
+            )
+            bloom_filters = pbf.read_bloom_filters(s3_url, ["pk"], self.hash_count)
+            self.assertEqual(list(bloom_filters.keys()), ["s3://bucket/file.parquet"])
+            np.testing.assert_array_equal(
+                bloom_filters["s3://bucket/file.parquet"], self.bloom_filter
+            )
+            self.assertIsNone(
+                pbf.read_bloom_filters(s3_url, ["pk", "other"], self.hash_count)
+            )
+            self.assertIsNone(
+                pbf.read_bloom_filters(s3_url, ["pk"], self.hash_count + 1)
+            )
+            self.assertIsNone(
+                pbf.read_bloom_filters("s3://bucket/missing", ["pk"], self.hash_count)
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
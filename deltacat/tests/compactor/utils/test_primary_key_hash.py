@@ -0,0 +1,140 @@
+import unittest
+
+import pyarrow as pa
+
+from deltacat.compute.compactor import PrimaryKeyDigestAlgorithm
+from deltacat.compute.compactor.utils.primary_key_hash import hash_primary_keys
+from deltacat.tests.test_utils.primary_key_hash import (
+    legacy_pk_digests,
+    murmur3_pk_digests,
+)
+
+
+class TestHashPrimaryKeys(unittest.TestCase):
+    def setUp(self) -> None:
+        self.table = pa.Table.from_batches(
+            [
+                pa.record_batch(
+                    [
+                        pa.array([1, -2, 3], pa.int64()),
+                        pa.array(["a", "ü", ""]),
+                        pa.array([1.0, 2.5, float("nan")]),
+                        pa.array([True, False, True]),
+                    ],
+                    names=["int_pk", "str_pk", "float_pk", "bool_pk"],
+                ),
+                pa.record_batch(
+                    [
+                        pa.array([2**40], pa.int64()),
+                        pa.array(["L6kl7u5f"]),
+                        pa.array([-0.5]),
+                        pa.array([False]),
+                    ],
+                    names=["int_pk", "str_pk", "float_pk", "bool_pk"],
+                ),
+            ]
+        )
+
+    def _assert_legacy_compatible(self, table: pa.Table, primary_keys):
+        digests = hash_primary_keys(table, primary_keys)
+        self.assertEqual(digests.type, pa.binary(20))
+        self.assertEqual(
+            digests.to_pylist(),
+            legacy_pk_digests(table, primary_keys),
+        )
+
+    def test_single_int_key(self):
+        self._assert_legacy_compatible(self.table, ["int_pk"])
+
+    def test_single_string_key(self):
+        self._assert_legacy_compatible(self.table, ["str_pk"])
+
+    def test_multi_column_key(self):
+        self._assert_legacy_compatible(self.table, ["int_pk", "str_pk"])
+
+    def test_fallback_types(self):
+        self._assert_legacy_compatible(
+            self.table, ["bool_pk", "float_pk", "int_pk", "str_pk"]
+        )
+
+    def test_nulls(self):
+        table = pa.table(
+            {
+                "int_pk": pa.array([1, None, 3], pa.int64()),
+                "str_pk": pa.array(["a", None, "c"]),
+            }
+        )
+        self._assert_legacy_compatible(table, ["int_pk", "str_pk"])
+
+    def test_sliced_table(self):
+        self._assert_legacy_compatible(self.table.slice(1, 2), ["int_pk", "str_pk"])
+
+    def test_empty_table(self):
+        digests = hash_primary_keys(self.table.slice(0, 0), ["int_pk", "str_pk"])
+        self.assertEqual(len(digests), 0)
+
+
+class TestHashPrimaryKeysMurmur3(unittest.TestCase):
+    def setUp(self) -> None:
+        # cover values with and without whole 16-byte blocks and tail bytes
+        self.table = pa.Table.from_batches(
+            [
+                pa.record_batch(
+                    [
+                        pa.array([1, -2, 3, 4], pa.int64()),
+                        pa.array(["", "a" * 8, "ü" * 8, "b" * 40]),
+                    ],
+                    names=["int_pk", "str_pk"],
+                ),
+                pa.record_batch(
+                    [
+                        pa.array([2**40, 5], pa.int64()),
+                        pa.array(["c" * 15, "d" * 17]),
+                    ],
+                    names=["int_pk", "str_pk"],
+                ),
+            ]
+        )
+
+    def _assert_matches_reference(self, table: pa.Table, primary_keys):
+        digests = hash_primary_keys(
+            table,
+            primary_keys,
+            PrimaryKeyDigestAlgorithm.MURMUR3_X64_128,
+        )
+        self.assertEqual(digests.type, pa.binary(20))
+        self.assertEqual(
+            digests.to_pylist(),
+            murmur3_pk_digests(table, primary_keys),
+        )
+
+    def test_single_string_key(self):
+        self._assert_matches_reference(self.table, ["str_pk"])
+
+    def test_multi_column_key(self):
+        self._assert_matches_reference(self.table, ["int_pk", "str_pk"])
+
+    def test_sliced_table(self):
+        self._assert_matches_reference(self.table.slice(2, 3), ["str_pk"])
+
+    def test_empty_table(self):
+        digests = hash_primary_keys(
+            self.table.slice(0, 0),
+            ["str_pk"],
+            PrimaryKeyDigestAlgorithm.MURMUR3_X64_128,
+        )
+        self.assertEqual(len(digests), 0)
+
+    def test_differs_from_sha1(self):
+        self.assertNotEqual(
+            hash_primary_keys(
+                self.table,
+                ["str_pk"],
+                PrimaryKeyDigestAlgorithm.MURMUR3_X64_128,
+            ).to_pylist(),
+            legacy_pk_digests(self.table, ["str_pk"]),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
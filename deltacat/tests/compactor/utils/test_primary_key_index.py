@@ -0,0 +1,264 @@
+import unittest
+
+import numpy as np
+import pyarrow as pa
+
+from deltacat.compute.compactor import (
+    DeltaFileEnvelope,
+    PrimaryKeyIndexMeta,
+    PrimaryKeyIndexVersionLocator,
+    PrimaryKeyIndexVersionMeta,
+    RoundCompletionInfo,
+    SortKey,
+)
+from deltacat.compute.compactor.model.primary_key_index_hash_bucket import (
+    PrimaryKeyIndexHashBucket,
+)
+from deltacat.compute.compactor.utils import system_columns as sc
+from deltacat.compute.compactor.utils.primary_key_hash import hash_primary_keys
+from deltacat.compute.compactor.utils.primary_key_index import (
+    group_record_indices_by_hash_bucket,
+    group_tables_by_hash_bucket,
+    hash_bucket_group_table,
+    pk_digest_to_hash_bucket_index,
+    pk_digests_to_hash_bucket_indices,
+    primary_key_index_hash_buckets,
+    primary_key_index_table,
+    primary_key_index_to_delta_file_envelopes,
+)
+from deltacat.constants import PRIMARY_KEY_INDEX_ALGORITHM_VERSION
+from deltacat.storage import (
+    DeltaLocator,
+    DeltaType,
+    Manifest,
+    ManifestEntry,
+    ManifestMeta,
+    PartitionLocator,
+)
+from deltacat.utils.common import sha1_digest
+
+
+class TestGroupRecordIndicesByHashBucket(unittest.TestCase):
+    def setUp(self) -> None:
+        digests = [sha1_digest(bytes(str(i), "utf-8")) for i in range(1000)]
+        self.digests = digests
+        self.table = sc.append_pk_hash_column(pa.table({"v": range(1000)}), digests)
+
+    def _assert_matches_scalar_bucketing(self, table: pa.Table, num_buckets: int):
+        expected = [[] for _ in range(num_buckets)]
+        for record_index, digest in enumerate(table[sc._PK_HASH_COLUMN_NAME]):
+            hash_bucket = pk_digest_to_hash_bucket_index(digest.as_py(), num_buckets)
+            expected[hash_bucket].append(record_index)
+        actual = group_record_indices_by_hash_bucket(table, num_buckets)
+        self.assertEqual(len(actual), num_buckets)
+        for hash_bucket, indices in enumerate(actual):
+            if not expected[hash_bucket]:
+                self.assertIsNone(indices)
+            else:
+                self.assertEqual(indices.tolist(), expected[hash_bucket])
+
+    def test_bucket_counts(self):
+        for num_buckets in [1, 7, 256, 3001]:
+            self._assert_matches_scalar_bucketing(self.table, num_buckets)
+
+    def test_chunked_and_sliced_digests(self):
+        table = pa.concat_tables([self.table.slice(0, 10), self.table.slice(500)])
+        self._assert_matches_scalar_bucketing(table, 13)
+        self._assert_matches_scalar_bucketing(self.table.slice(3, 40), 13)
+
+    def test_empty_table(self):
+        actual = group_record_indices_by_hash_bucket(self.table.slice(0, 0), 4)
+        self.assertTrue(all(indices is None for indices in actual))
+
+    def test_take_preserves_record_order(self):
+        actual = group_record_indices_by_hash_bucket(self.table, 5)
+        indices = np.concatenate([i for i in actual if i is not None])
+        self.assertEqual(sorted(indices.tolist()), list(range(1000)))
+
+
+class TestHashBucketGroupTable(unittest.TestCase):
+    def test_group_tables_by_hash_bucket(self):
+        group_tables = [
+            hash_bucket_group_table(
+                {
+                    5: pa.table({"v": [50, 51]}),
+                    1: pa.table({"v": [10]}),
+                    3: None,
+                }
+            ),
+            hash_bucket_group_table({5: pa.table({"v": [52, 53, 54]})}),
+            hash_bucket_group_table({3: pa.table({"v": pa.array([], pa.int64())})}),
+        ]
+        self.assertEqual(
+            sc.hash_bucket_index_column_np(group_tables[0]).tolist(), [1, 5, 5]
+        )
+        self.assertIsNone(group_tables[2])
+        hb_index_to_tables = group_tables_by_hash_bucket(group_tables)
+        self.assertEqual(sorted(hb_index_to_tables.keys()), [1, 5])
+        self.assertEqual(
+            [table["v"].to_pylist() for table in hb_index_to_tables[5]],
+            [[50, 51], [52, 53, 54]],
+        )
+        self.assertEqual(hb_index_to_tables[1][0].column_names, ["v"])
+
+
+class TestPkDigestsToHashBucketIndices(unittest.TestCase):
+    def setUp(self) -> None:
+        digests = [sha1_digest(bytes(str(i), "utf-8")) for i in range(1000)]
+        self.digests = digests
+        self.digest_bytes = sc.pk_hash_digest_bytes_np(
+            sc.append_pk_hash_column(pa.table({"v": range(1000)}), digests)
+        )
+
+    def test_matches_scalar_bucketing(self):
+        for num_buckets in [1, 7, 3001, 2**32 + 15, 2**47]:
+            expected = [
+                pk_digest_to_hash_bucket_index(digest, num_buckets)
+                for digest in self.digests
+            ]
+            actual = pk_digests_to_hash_bucket_indices(self.digest_bytes, num_buckets)
+            self.assertEqual(actual.tolist(), expected)
+
+    def test_unsupported_bucket_count(self):
+        with self.assertRaises(ValueError):
+            pk_digests_to_hash_bucket_indices(self.digest_bytes, 2**47 + 1)
+
+
+class TestPrimaryKeyIndexTable(unittest.TestCase):
+    def setUp(self) -> None:
+        self.table = pa.table(
+            {"pk": range(10), "sk": range(100, 110), "v": range(200, 210)}
+        )
+
+    def test_file_and_record_indices(self):
+        index_table = primary_key_index_table(
+            self.table, ["pk"], ["sk"], [4, 6], first_file_index=2
+        )
+        self.assertEqual(
+            index_table.column_names,
+            [
+                "sk",
+                sc._PK_HASH_COLUMN_NAME,
+                sc._ORDERED_FILE_IDX_COLUMN_NAME,
+                sc._ORDERED_RECORD_IDX_COLUMN_NAME,
+            ],
+        )
+        self.assertEqual(
+            sc.file_index_column_np(index_table).tolist(), [2] * 4 + [3] * 6
+        )
+        self.assertEqual(
+            sc.record_index_column_np(index_table).tolist(),
+            list(range(4)) + list(range(6)),
+        )
+        self.assertTrue(
+            sc.pk_hash_column(index_table).equals(
+                hash_primary_keys(self.table, ["pk"]).cast(sc._PK_HASH_COLUMN_TYPE)
+            )
+        )
+
+    def test_delta_file_envelopes(self):
+        index_table = primary_key_index_table(self.table, ["pk"], ["sk"], [4, 6])
+        pki_hash_bucket = PrimaryKeyIndexHashBucket(None, 7, 5, [4, 6])
+        envelopes = primary_key_index_to_delta_file_envelopes(
+            index_table, pki_hash_bucket
+        )
+        self.assertEqual([dfe.file_index for dfe in envelopes], [5, 6])
+        self.assertEqual([dfe.file_record_count for dfe in envelopes], [4, 6])
+        for dfe in envelopes:
+            self.assertIsInstance(dfe, DeltaFileEnvelope)
+            self.assertEqual(dfe.stream_position, 7)
+            self.assertEqual(dfe.delta_type, DeltaType.UPSERT)
+            self.assertFalse(dfe.is_src_delta)
+            # envelope tables match the layout of hash bucket output tables
+            self.assertEqual(
+                dfe.table.column_names,
+                [
+                    "sk",
+                    sc._PK_HASH_COLUMN_NAME,
+                    sc._ORDERED_RECORD_IDX_COLUMN_NAME,
+                ],
+            )
+        self.assertEqual(
+            sc.record_index_column_np(envelopes[1].table).tolist(), list(range(6))
+        )
+
+
+class TestPrimaryKeyIndexHashBuckets(unittest.TestCase):
+    def setUp(self) -> None:
+        self.sort_keys = [SortKey.of("sk")]
+        self.pki_version_meta = PrimaryKeyIndexVersionMeta.of(
+            PrimaryKeyIndexMeta.of(
+                PartitionLocator.at("ns", "table", "1", None, None, [], None),
+                ["pk"],
+                self.sort_keys,
+                PRIMARY_KEY_INDEX_ALGORITHM_VERSION,
+            ),
+            3,
+        )
+        self.manifest = Manifest.of(
+            [
+                ManifestEntry.of(
+                    f"s3://bucket/{i}.parquet",
+                    ManifestMeta.of(10 + i, 100, "application/parquet", "identity"),
+                )
+                for i in range(4)
+            ]
+        )
+        self.rci = RoundCompletionInfo.of(
+            None,
+            DeltaLocator.of(None, 9),
+            None,
+            0,
+            None,
+            primary_key_index_version_locator=PrimaryKeyIndexVersionLocator.generate(
+                self.pki_version_meta
+            ),
+            hash_bucket_file_counts=[1, 0, 3],
+            hash_bucket_index_version_root_paths=["root-0", None, "root-2"],
+        )
+
+    def test_hash_buckets(self):
+        pki_hash_buckets = primary_key_index_hash_buckets(
+            self.rci, self.manifest, ["pk"], self.sort_keys, None
+        )
+        self.assertEqual(len(pki_hash_buckets), 3)
+        self.assertIsNone(pki_hash_buckets[1])
+        self.assertEqual(pki_hash_buckets[0].first_file_index, 0)
+        self.assertEqual(pki_hash_buckets[0].file_record_counts, [10])
+        self.assertEqual(pki_hash_buckets[2].first_file_index, 1)
+        self.assertEqual(pki_hash_buckets[2].file_record_counts, [11, 12, 13])
+        self.assertEqual(pki_hash_buckets[2].compacted_stream_position, 9)
+        self.assertEqual(
+            pki_hash_buckets[
+                2
+            ].primary_key_index_version_locator.get_pkiv_hb_index_manifest_s3_url(
+                "bucket", 2
+            ),
+            "s3://bucket/root-2/2.json",
+        )
+
+    def test_unusable_index(self):
+        for primary_keys, sort_keys, hash_bucket_count in [
+            (["pk", "pk2"], self.sort_keys, None),
+            (["pk"], [], None),
+            (["pk"], self.sort_keys, 4),
+        ]:
+            self.assertIsNone(
+                primary_key_index_hash_buckets(
+                    self.rci,
+                    self.manifest,
+                    primary_keys,
+                    sort_keys,
+                    hash_bucket_count,
+                )
+            )
+        self.rci["hashBucketFileCounts"] = [1, 0, 2]
+        self.assertIsNone(
+            primary_key_index_hash_buckets(
+                self.rci, self.manifest, ["pk"], self.sort_keys, 3
+            )
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
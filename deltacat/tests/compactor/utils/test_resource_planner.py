@@ -0,0 +1,174 @@
+import unittest
+
+from deltacat.compute.compactor.model.compaction_session_audit_info import (
+    CompactionSessionAuditInfo,
+)
+from deltacat.compute.compactor.utils.resource_planner import (
+    DEFAULT_DEDUPE_MEMORY_MULTIPLIER,
+    MEMORY_SAFETY_FACTOR,
+    dedupe_spill_threshold_bytes,
+    plan_compaction_resources,
+)
+from deltacat.constants import BYTES_PER_GIBIBYTE, BYTES_PER_MEBIBYTE
+from deltacat.storage import (
+    Delta,
+    DeltaLocator,
+    DeltaType,
+    Manifest,
+    ManifestEntry,
+    ManifestMeta,
+)
+
+CLUSTER_RESOURCES = {
+    "CPU": 8,
+    "memory": 8 * 4 * BYTES_PER_GIBIBYTE,
+    "object_store_memory": 8 * 2 * BYTES_PER_GIBIBYTE,
+}
+
+
+def _delta(stream_position, content_length, record_count):
+    manifest = Manifest.of(
+        [
+            ManifestEntry.of(
+                f"s3://bucket/{stream_position}.parquet",
+                ManifestMeta.of(
+                    record_count,
+                    content_length,
+                    "application/parquet",
+                    "identity",
+                ),
+            )
+        ]
+    )
+    return Delta.of(
+        DeltaLocator.of(None, stream_position),
+        DeltaType.UPSERT,
+        manifest.meta,
+        None,
+        manifest,
+    )
+
+
+def _delta_stats(record_count, column_bytes):
+    return {
+        "column_stats": [
+            {
+                "column": column,
+                "stats": {"pyarrowTableBytes": pyarrow_bytes},
+            }
+            for column, pyarrow_bytes in column_bytes.items()
+        ],
+        "stats": {
+            "rowCount": record_count,
+            "pyarrowTableBytes": sum(column_bytes.values()),
+        },
+    }
+
+
+class TestPlanCompactionResources(unittest.TestCase):
+    def test_plan_without_stats_or_audits(self):
+        input_deltas = [
+            _delta(sp, 10 * BYTES_PER_GIBIBYTE, 100_000_000) for sp in range(1, 5)
+        ]
+        plan = plan_compaction_resources(input_deltas, CLUSTER_RESOURCES, ["pk"])
+
+        self.assertEqual(plan.input_size_bytes, 40 * BYTES_PER_GIBIBYTE)
+        self.assertEqual(plan.input_record_count, 400_000_000)
+        budget = 4 * BYTES_PER_GIBIBYTE * MEMORY_SAFETY_FACTOR
+        self.assertLessEqual(plan.estimated_hash_bucket_task_memory_bytes, budget)
+        self.assertLessEqual(plan.estimated_materialize_task_memory_bytes, budget)
+        self.assertGreaterEqual(plan.hash_bucket_count, 8)
+        self.assertGreaterEqual(plan.materialize_bucket_count, 8)
+        self.assertTrue(any("without stats" in reason for reason in plan.reasons))
+
+    def test_column_stats_only_count_key_columns(self):
+        input_deltas = [_delta(1, 10 * BYTES_PER_GIBIBYTE, 100_000_000)]
+        column_bytes = {
+            "pk": 1 * BYTES_PER_GIBIBYTE,
+            "data": 40 * BYTES_PER_GIBIBYTE,
+        }
+        plan = plan_compaction_resources(
+            input_deltas,
+            CLUSTER_RESOURCES,
+            ["pk"],
+            input_deltas_stats={1: _delta_stats(100_000_000, column_bytes)},
+        )
+        self.assertEqual(plan.hash_bucket_pyarrow_bytes, 1 * BYTES_PER_GIBIBYTE)
+        self.assertEqual(plan.pyarrow_bytes, 41 * BYTES_PER_GIBIBYTE)
+        all_columns_plan = plan_compaction_resources(
+            input_deltas,
+            CLUSTER_RESOURCES,
+            ["pk", "data"],
+            input_deltas_stats={1: _delta_stats(100_000_000, column_bytes)},
+        )
+        # reading fewer key bytes per input byte allows larger chunks
+        self.assertGreater(
+            plan.hash_bucket_chunk_size,
+            all_columns_plan.hash_bucket_chunk_size,
+        )
+
+    def test_previous_audit_calibrates_plan(self):
+        input_deltas = [_delta(1, 64 * BYTES_PER_GIBIBYTE, 100_000_000)]
+        audit = CompactionSessionAuditInfo("1.0", "s3://bucket/audit.json")
+        audit.set_input_size_bytes(1 * BYTES_PER_GIBIBYTE)
+        audit.set_uniform_deltas_created(8)
+        audit.set_peak_memory_used_bytes_per_hash_bucket_task(1280 * BYTES_PER_MEBIBYTE)
+        plan = plan_compaction_resources(
+            input_deltas,
+            CLUSTER_RESOURCES,
+            ["pk"],
+            previous_audits=[audit],
+        )
+        # previous tasks peaked at 10 bytes of memory per input byte
+        self.assertEqual(
+            plan.hash_bucket_chunk_size,
+            int(4 * BYTES_PER_GIBIBYTE * MEMORY_SAFETY_FACTOR / 10),
+        )
+        self.assertTrue(
+            any("Previous hash bucket tasks" in reason for reason in plan.reasons)
+        )
+
+    def test_hash_bucket_count_scales_with_records(self):
+        small_plan = plan_compaction_resources(
+            [_delta(1, BYTES_PER_GIBIBYTE, 1_000_000)],
+            CLUSTER_RESOURCES,
+            ["pk"],
+        )
+        large_plan = plan_compaction_resources(
+            [_delta(1, BYTES_PER_GIBIBYTE, 10_000_000_000)],
+            CLUSTER_RESOURCES,
+            ["pk"],
+        )
+        self.assertEqual(small_plan.hash_bucket_count, 8)
+        self.assertGreater(large_plan.hash_bucket_count, 8)
+
+    def test_keeps_given_hash_bucket_count(self):
+        plan = plan_compaction_resources(
+            [_delta(1, BYTES_PER_GIBIBYTE, 10_000_000_000)],
+            CLUSTER_RESOURCES,
+            ["pk"],
+            hash_bucket_count=2,
+        )
+        self.assertEqual(plan.hash_bucket_count, 2)
+        self.assertTrue(any("recommended" in reason for reason in plan.reasons))
+
+
+class TestDedupeSpillThresholdBytes(unittest.TestCase):
+    def test_threshold_fits_task_memory(self):
+        threshold = dedupe_spill_threshold_bytes(CLUSTER_RESOURCES)
+        self.assertEqual(
+            threshold,
+            int(
+                4
+                * BYTES_PER_GIBIBYTE
+                * MEMORY_SAFETY_FACTOR
+                / DEFAULT_DEDUPE_MEMORY_MULTIPLIER
+            ),
+        )
+
+    def test_no_threshold_without_memory(self):
+        self.assertIsNone(dedupe_spill_threshold_bytes({"CPU": 8}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+from itertools import repeat
+
+import numpy as np
+import pyarrow as pa
+
+from deltacat.compute.compactor import DeltaFileEnvelope
+from deltacat.compute.compactor.utils import system_columns as sc
+from deltacat.compute.compactor.utils.primary_key_hash import hash_primary_keys
+from deltacat.storage import DeltaType
+
+
+def _legacy_project_delta_file_metadata_on_table(
+    delta_file_envelope: DeltaFileEnvelope,
+) -> pa.Table:
+    table = delta_file_envelope.table
+    record_count = len(table)
+    table = sc.append_file_idx_column(
+        table, repeat(int(delta_file_envelope.file_index), record_count)
+    )
+    table = sc.append_stream_position_column(
+        table, repeat(int(delta_file_envelope.stream_position), record_count)
+    )
+    table = sc.append_delta_type_col(
+        table,
+        repeat(sc.delta_type_to_field(delta_file_envelope.delta_type), record_count),
+    )
+    table = sc.append_is_source_col(
+        table, repeat(bool(delta_file_envelope.is_src_delta), record_count)
+    )
+    return sc.append_file_record_count_col(
+        table, repeat(delta_file_envelope.file_record_count, record_count)
+    )
+
+
+class TestProjectDeltaFileMetadataOnTables(unittest.TestCase):
+    def setUp(self) -> None:
+        self.delta_file_envelopes = [
+            DeltaFileEnvelope.of(
+                stream_position=stream_position,
+                file_index=file_index,
+                delta_type=delta_type,
+                table=pa.table({"pk": pa.array(range(record_count), pa.int64())}),
+                is_src_delta=is_src_delta,
+                file_record_count=file_record_count,
+            )
+            for (
+                stream_position,
+                file_index,
+                delta_type,
+                record_count,
+                is_src_delta,
+                file_record_count,
+            ) in [
+                (3, 0, DeltaType.UPSERT, 4, np.bool_(True), 10),
+                (3, 1, DeltaType.DELETE, 0, np.bool_(True), 0),
+                (7, 2, DeltaType.DELETE, 2, np.bool_(True), None),
+                (9, 5, DeltaType.UPSERT, 3, np.bool_(False), 3),
+            ]
+        ]
+
+    def test_matches_legacy_projection(self):
+        expected = pa.concat_tables(
+            [
+                _legacy_project_delta_file_metadata_on_table(dfe)
+                for dfe in self.delta_file_envelopes
+            ]
+        )
+        actual = sc.project_delta_file_metadata_on_tables(self.delta_file_envelopes)
+        self.assertTrue(actual.equals(expected))
+
+    def test_single_envelope(self):
+        for dfe in self.delta_file_envelopes:
+            self.assertTrue(
+                sc.project_delta_file_metadata_on_table(dfe).equals(
+                    _legacy_project_delta_file_metadata_on_table(dfe)
+                )
+            )
+
+
+class TestPkHashDigestViews(unittest.TestCase):
+    def setUp(self) -> None:
+        table = pa.table({"pk": [3, 1, 4, 1, 5]})
+        self.table = sc.append_pk_hash_column(
+            table,
+            pa.chunked_array(
+                [
+                    hash_primary_keys(table.slice(0, 2), ["pk"]).chunk(0),
+                    hash_primary_keys(table.slice(2), ["pk"]).chunk(0),
+                ]
+            ),
+        )
+        self.digests = sc.pk_hash_column(self.table).to_pylist()
+
+    def test_void_view(self):
+        digests = sc.pk_hash_column_np(self.table)
+        self.assertEqual(digests.dtype.itemsize, 20)
+        self.assertEqual(digests.tolist(), self.digests)
+        self.assertEqual(digests[1], digests[3])
+        self.assertNotEqual(digests[0], digests[1])
+
+    def test_words_view(self):
+        digests = sc.pk_hash_digest_words_np(self.table)
+        for i, digest in enumerate(self.digests):
+            self.assertEqual(
+                (int(digests["high"][i]), int(digests["middle"][i])),
+                (
+                    int.from_bytes(digest[:8], "big"),
+                    int.from_bytes(digest[8:16], "big"),
+                ),
+            )
+            self.assertEqual(int(digests["low"][i]), int.from_bytes(digest[16:], "big"))
+
+    def test_zero_copy_view(self):
+        table = self.table.combine_chunks()
+        buffer = np.frombuffer(
+            sc.pk_hash_column(table).chunk(0).buffers()[1], dtype=np.uint8
+        )
+        self.assertTrue(np.shares_memory(sc.pk_hash_column_np(table), buffer))
+        self.assertTrue(np.shares_memory(sc.pk_hash_digest_words_np(table), buffer))
+
+
+if __name__ == "__main__":
+    unittest.main()
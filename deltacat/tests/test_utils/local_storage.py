@@ -0,0 +1,276 @@
+import os
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Union
+
+import pyarrow as pa
+import pyarrow.parquet as papq
+
+from deltacat.storage import (
+    Delta,
+    DeltaLocator,
+    DeltaType,
+    ListResult,
+    Manifest,
+    ManifestEntry,
+    ManifestMeta,
+    Partition,
+    PartitionLocator,
+    Stream,
+    StreamLocator,
+)
+from deltacat.types.media import ContentEncoding, ContentType
+from deltacat.utils.common import ReadKwargsProvider
+
+
+class LocalStorage:
+    """
+    Minimal deltacat storage for compaction session tests, run on a local Ray
+    cluster in local mode. Each table has a single unpartitioned partition,
+    whose deltas are kept in memory and whose files are written as Parquet
+    files to a local directory.
+
+    Staged partitions collect committed deltas until they're committed, and
+    then replace the table's previously committed deltas.
+    """
+
+    def __init__(self, root: str, namespace: str = "test_namespace"):
+        self.root = root
+        self.namespace = namespace
+        self._deltas: Dict[str, List[Delta]] = defaultdict(list)
+        self._staged_deltas: Dict[str, List[Delta]] = defaultdict(list)
+
+    def partition_locator(self, table_name: str) -> PartitionLocator:
+        return PartitionLocator.at(
+            self.namespace,
+            table_name,
+            "1",
+            "stream",
+            None,
+            [],
+            None,
+        )
+
+    def add_delta(
+        self,
+        table_name: str,
+        stream_position: int,
+        tables: List[pa.Table],
+        delta_type: DeltaType = DeltaType.UPSERT,
+    ) -> Delta:
+        manifest = self._write_manifest(tables)
+        delta = Delta.of(
+            DeltaLocator.of(self.partition_locator(table_name), stream_position),
+            delta_type,
+            manifest.meta,
+            None,
+            manifest,
+        )
+        self._deltas[table_name].append(delta)
+        return delta
+
+    def committed_deltas(self, table_name: str) -> List[Delta]:
+        return list(self._deltas[table_name])
+
+    def read_table(self, table_name: str) -> Optional[pa.Table]:
+        tables = [
+            papq.read_table(entry.uri)
+            for delta in self._deltas[table_name]
+            for entry in delta.manifest.entries
+        ]
+        return pa.concat_tables(tables) if tables else None
+
+    def list_deltas(
+        self,
+        namespace: str,
+        table_name: str,
+        partition_values: Optional[List[Any]] = None,
+        table_version: Optional[str] = None,
+        first_stream_position: Optional[int] = None,
+        last_stream_position: Optional[int] = None,
+        ascending_order: Optional[bool] = None,
+        include_manifest: bool = False,
+        *args,
+        **kwargs,
+    ) -> ListResult[Delta]:
+        deltas = [
+            delta
+            for delta in self._deltas[table_name]
+            if (
+                first_stream_position is None
+                or delta.stream_position >= first_stream_position
+            )
+            and (
+                last_stream_position is None
+                or delta.stream_position <= last_stream_position
+            )
+        ]
+        deltas.sort(key=lambda d: d.stream_position, reverse=ascending_order is False)
+        return ListResult.of(deltas, None, None)
+
+    def get_stream(
+        self,
+        namespace: str,
+        table_name: str,
+        table_version: Optional[str] = None,
+        *args,
+        **kwargs,
+    ) -> Optional[Stream]:
+        return Stream.of(self.partition_locator(table_name).stream_locator, None)
+
+    def get_partition(
+        self,
+        stream_locator: StreamLocator,
+        partition_values: Optional[List[Any]] = None,
+        *args,
+        **kwargs,
+    ) -> Optional[Partition]:
+        deltas = self._deltas[stream_locator.table_name]
+        if not deltas:
+            return None
+        return Partition.of(
+            self.partition_locator(stream_locator.table_name),
+            None,
+            None,
+            stream_position=max(delta.stream_position for delta in deltas),
+        )
+
+    def stage_partition(
+        self,
+        stream: Stream,
+        partition_values: Optional[List[Any]] = None,
+        *args,
+        **kwargs,
+    ) -> Partition:
+        table_name = stream.locator.table_name
+        self._staged_deltas[table_name] = []
+        return Partition.of(self.partition_locator(table_name), None, None)
+
+    def commit_partition(self, partition: Partition, *args, **kwargs) -> Partition:
+        table_name = partition.locator.stream_locator.table_name
+        self._deltas[table_name] = self._staged_deltas.pop(table_name, [])
+        return partition
+
+    def get_delta_manifest(
+        self,
+        delta_like: Union[Delta, DeltaLocator],
+        *args,
+        **kwargs,
+    ) -> Manifest:
+        locator = delta_like.locator if isinstance(delta_like, Delta) else delta_like
+        table_name = locator.partition_locator.stream_locator.table_name
+        for delta in self._deltas[table_name] + self._staged_deltas[table_name]:
+            if delta.stream_position == locator.stream_position:
+                return delta.manifest
+        raise ValueError(f"Delta not found: {locator}")
+
+    def download_delta_manifest_entry(
+        self,
+        delta_like: Union[Delta, DeltaLocator],
+        entry_index: int,
+        table_type=None,
+        columns: Optional[List[str]] = None,
+        file_reader_kwargs_provider: Optional[ReadKwargsProvider] = None,
+        *args,
+        **kwargs,
+    ) -> pa.Table:
+        manifest = (
+            delta_like.manifest
+            if isinstance(delta_like, Delta) and delta_like.manifest
+            else self.get_delta_manifest(delta_like)
+        )
+        table = papq.read_table(manifest.entries[entry_index].uri, columns=columns)
+        if file_reader_kwargs_provider:
+            read_kwargs = file_reader_kwargs_provider(ContentType.PARQUET.value, {})
+            if "record_range" in read_kwargs:
+                start, stop = read_kwargs["record_range"]
+                table = table.slice(start, stop - start)
+        return table
+
+    def download_delta(
+        self,
+        delta_like: Union[Delta, DeltaLocator],
+        table_type=None,
+        storage_type=None,
+        max_parallelism: Optional[int] = None,
+        columns: Optional[List[str]] = None,
+        file_reader_kwargs_provider: Optional[ReadKwargsProvider] = None,
+        *args,
+        **kwargs,
+    ) -> List[pa.Table]:
+        manifest = (
+            delta_like.manifest
+            if isinstance(delta_like, Delta) and delta_like.manifest
+            else self.get_delta_manifest(delta_like)
+        )
+        return [
+            self.download_delta_manifest_entry(
+                delta_like,
+                i,
+                columns=columns,
+                file_reader_kwargs_provider=file_reader_kwargs_provider,
+            )
+            for i in range(len(manifest.entries))
+        ]
+
+    def stage_delta(
+        self,
+        data: Union[pa.Table, List[pa.Table]],
+        partition: Partition,
+        delta_type: DeltaType = DeltaType.UPSERT,
+        max_records_per_entry: Optional[int] = None,
+        *args,
+        **kwargs,
+    ) -> Delta:
+        tables = data if isinstance(data, list) else [data]
+        if max_records_per_entry:
+            table = pa.concat_tables(tables)
+            tables = [
+                table.slice(offset, max_records_per_entry)
+                for offset in range(0, len(table), max_records_per_entry)
+            ]
+        manifest = self._write_manifest(tables)
+        return Delta.of(
+            DeltaLocator.of(partition.locator, None),
+            delta_type,
+            manifest.meta,
+            None,
+            manifest,
+        )
+
+    def commit_delta(self, delta: Delta, *args, **kwargs) -> Delta:
+        table_name = delta.partition_locator.stream_locator.table_name
+        staged_deltas = self._staged_deltas[table_name]
+        delta = Delta.of(
+            DeltaLocator.of(
+                delta.partition_locator,
+                max([d.stream_position for d in staged_deltas], default=0) + 1,
+            ),
+            delta.type,
+            delta.meta,
+            delta.properties,
+            delta.manifest,
+        )
+        staged_deltas.append(delta)
+        return delta
+
+    def get_table_version_schema(self, *args, **kwargs) -> Optional[pa.Schema]:
+        return None
+
+    def _write_manifest(self, tables: List[pa.Table]) -> Manifest:
+        entries = []
+        for table in tables:
+            path = os.path.join(self.root, f"{uuid.uuid4()}.parquet")
+            papq.write_table(table, path)
+            entries.append(
+                ManifestEntry.of(
+                    path,
+                    ManifestMeta.of(
+                        len(table),
+                        os.path.getsize(path),
+                        ContentType.PARQUET.value,
+                        ContentEncoding.IDENTITY.value,
+                    ),
+                )
+            )
+        return Manifest.of(entries)
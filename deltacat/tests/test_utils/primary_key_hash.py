@@ -0,0 +1,91 @@
+from typing import List
+
+import pyarrow as pa
+
+from deltacat.compute.compactor.utils.primary_key_hash import PK_BYTES_DELIMITER
+from deltacat.utils.common import sha1_digest
+
+_UINT64_MASK = (1 << 64) - 1
+
+
+def _legacy_joined_pks(table: pa.Table, primary_keys: List[str]) -> List[bytes]:
+    all_column_fields = [table[pk_name].to_numpy() for pk_name in primary_keys]
+    return [
+        PK_BYTES_DELIMITER.join(
+            [
+                bytes(str(column_fields[field_index]), "utf-8")
+                for column_fields in all_column_fields
+            ]
+        )
+        for field_index in range(len(table))
+    ]
+
+
+def legacy_pk_digests(table: pa.Table, primary_keys: List[str]) -> List[bytes]:
+    """
+    Reference implementation of the per-row primary key digest generator
+    used by the hash bucket step prior to columnar primary key hashing.
+    """
+    return [sha1_digest(pk) for pk in _legacy_joined_pks(table, primary_keys)]
+
+
+def _rotl64(x: int, r: int) -> int:
+    return ((x << r) | (x >> (64 - r))) & _UINT64_MASK
+
+
+def _fmix64(k: int) -> int:
+    k ^= k >> 33
+    k = (k * 0xFF51AFD7ED558CCD) & _UINT64_MASK
+    k ^= k >> 33
+    k = (k * 0xC4CEB9FE1A85EC53) & _UINT64_MASK
+    k ^= k >> 33
+    return k
+
+
+def murmur3_x64_128_digest(data: bytes) -> bytes:
+    """
+    Reference implementation of the 20-byte MurmurHash3 primary key digest:
+    the 128-bit MurmurHash3 (x64 variant, seed 0) of the given bytes,
+    followed by 4 bytes of its two final hash words mixed together.
+    """
+    c1, c2 = 0x87C37B91114253D5, 0x4CF5AD432745937F
+    h1 = h2 = 0
+    block_count = len(data) // 16
+    for i in range(block_count):
+        k1 = int.from_bytes(data[i * 16 : i * 16 + 8], "little")
+        k2 = int.from_bytes(data[i * 16 + 8 : i * 16 + 16], "little")
+        h1 ^= (_rotl64((k1 * c1) & _UINT64_MASK, 31) * c2) & _UINT64_MASK
+        h1 = (_rotl64(h1, 27) + h2) & _UINT64_MASK
+        h1 = (h1 * 5 + 0x52DCE729) & _UINT64_MASK
+        h2 ^= (_rotl64((k2 * c2) & _UINT64_MASK, 33) * c1) & _UINT64_MASK
+        h2 = (_rotl64(h2, 31) + h1) & _UINT64_MASK
+        h2 = (h2 * 5 + 0x38495AB5) & _UINT64_MASK
+    tail = data[block_count * 16 :]
+    if len(tail) > 8:
+        k2 = int.from_bytes(tail[8:], "little")
+        h2 ^= (_rotl64((k2 * c2) & _UINT64_MASK, 33) * c1) & _UINT64_MASK
+    if tail:
+        k1 = int.from_bytes(tail[:8], "little")
+        h1 ^= (_rotl64((k1 * c1) & _UINT64_MASK, 31) * c2) & _UINT64_MASK
+    h1 ^= len(data)
+    h2 ^= len(data)
+    h1 = (h1 + h2) & _UINT64_MASK
+    h2 = (h2 + h1) & _UINT64_MASK
+    h1 = _fmix64(h1)
+    h2 = _fmix64(h2)
+    h1 = (h1 + h2) & _UINT64_MASK
+    h2 = (h2 + h1) & _UINT64_MASK
+    return (
+        h1.to_bytes(8, "little")
+        + h2.to_bytes(8, "little")
+        + (_fmix64(h1 ^ _rotl64(h2, 32)) & 0xFFFFFFFF).to_bytes(4, "little")
+    )
+
+
+def murmur3_pk_digests(table: pa.Table, primary_keys: List[str]) -> List[bytes]:
+    """
+    Reference implementation of the per-row MurmurHash3 primary key digest.
+    """
+    return [
+        murmur3_x64_128_digest(pk) for pk in _legacy_joined_pks(table, primary_keys)
+    ]
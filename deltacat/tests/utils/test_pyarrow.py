@@ -0,0 +1,225 @@
+import gzip
+import io
+import unittest
+from unittest import mock
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as papq
+from botocore.exceptions import ClientError
+
+from deltacat.aws import s3u
+from deltacat.types.media import ContentEncoding, ContentType
+from deltacat.utils.pyarrow import (
+    ReadKwargsProviderPyArrowParquetRowGroups,
+    s3_file_to_table,
+)
+
+
+class InMemoryS3Client:
+    """
+    Serves `get_object` requests, including ranged requests, from in-memory
+    objects, and records the number of requests and bytes transferred.
+    """
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.request_count = 0
+        self.bytes_transferred = 0
+
+    def get_object(self, Bucket, Key, Range=None):
+        body = self.objects[f"s3://{Bucket}/{Key}"]
+        self.request_count += 1
+        response = {}
+        if Range is not None:
+            if not body:
+                raise ClientError(
+                    {"Error": {"Code": "InvalidRange"}},
+                    "GetObject",
+                )
+            start, end = Range[len("bytes=") :].split("-")
+            if not start:
+                start = max(len(body) - int(end), 0)
+                end = len(body) - 1
+            start, end = int(start), min(int(end), len(body) - 1)
+            response["ContentRange"] = f"bytes {start}-{end}/{len(body)}"
+            body = body[start : end + 1]
+        self.bytes_transferred += len(body)
+        response["Body"] = io.BytesIO(body)
+        return response
+
+
+def _parquet_bytes(table, **kwargs):
+    sink = io.BytesIO()
+    papq.write_table(table, sink, **kwargs)
+    return sink.getvalue()
+
+
+class TestS3FileToTable(unittest.TestCase):
+    def _read(self, s3_client, url, content_type, content_encoding, **kwargs):
+        with mock.patch.object(s3u, "s3_client_cache", return_value=s3_client):
+            return s3_file_to_table(url, content_type, content_encoding, **kwargs)
+
+    def test_parquet_include_columns_reads_column_chunks(self):
+        rng = np.random.default_rng(1)
+        table = pa.table(
+            {
+                "pk": np.arange(50_000),
+                **{f"col_{i}": rng.random(50_000) for i in range(20)},
+            }
+        )
+        url = "s3://bucket/wide.parquet"
+        s3_client = InMemoryS3Client({url: _parquet_bytes(table)})
+        result = self._read(
+            s3_client,
+            url,
+            ContentType.PARQUET.value,
+            ContentEncoding.IDENTITY.value,
+            include_columns=["pk"],
+        )
+        self.assertTrue(result.equals(table.select(["pk"])))
+        self.assertLess(s3_client.bytes_transferred, len(s3_client.objects[url]) // 5)
+
+    def test_small_parquet_file_single_request(self):
+        table = pa.table({"pk": [1, 2, 3], "data": ["a", "b", "c"]})
+        url = "s3://bucket/small.parquet"
+        s3_client = InMemoryS3Client({url: _parquet_bytes(table)})
+        result = self._read(
+            s3_client,
+            url,
+            ContentType.PARQUET.value,
+            ContentEncoding.IDENTITY.value,
+            include_columns=["data"],
+        )
+        self.assertTrue(result.equals(table.select(["data"])))
+        self.assertEqual(s3_client.request_count, 1)
+
+    def test_parquet_without_include_columns_reads_full_object(self):
+        table = pa.table({"pk": np.arange(1000), "data": np.arange(1000) * 2})
+        url = "s3://bucket/full.parquet"
+        s3_client = InMemoryS3Client({url: _parquet_bytes(table)})
+        result = self._read(
+            s3_client,
+            url,
+            ContentType.PARQUET.value,
+            ContentEncoding.IDENTITY.value,
+        )
+        self.assertTrue(result.equals(table))
+        self.assertEqual(s3_client.request_count, 1)
+
+    def test_parquet_row_groups_read(self):
+        rng = np.random.default_rng(2)
+        table = pa.table({"pk": np.arange(100_000), "data": rng.random(100_000)})
+        url = "s3://bucket/row_groups.parquet"
+        s3_client = InMemoryS3Client(
+            {url: _parquet_bytes(table, row_group_size=10_000)}
+        )
+        result = self._read(
+            s3_client,
+            url,
+            ContentType.PARQUET.value,
+            ContentEncoding.IDENTITY.value,
+            include_columns=["pk"],
+            pa_read_func_kwargs_provider=ReadKwargsProviderPyArrowParquetRowGroups(
+                row_groups=[3, 4]
+            ),
+        )
+        self.assertTrue(result.equals(table.select(["pk"]).slice(30_000, 20_000)))
+        self.assertLess(s3_client.bytes_transferred, len(s3_client.objects[url]) // 5)
+
+    def test_parquet_record_range_read(self):
+        rng = np.random.default_rng(3)
+        table = pa.table({"pk": np.arange(100_000), "data": rng.random(100_000)})
+        url = "s3://bucket/record_range.parquet"
+        s3_client = InMemoryS3Client(
+            {url: _parquet_bytes(table, row_group_size=10_000)}
+        )
+        result = self._read(
+            s3_client,
+            url,
+            ContentType.PARQUET.value,
+            ContentEncoding.IDENTITY.value,
+            pa_read_func_kwargs_provider=ReadKwargsProviderPyArrowParquetRowGroups(
+                record_range=(25_000, 41_000)
+            ),
+        )
+        self.assertTrue(result.equals(table.slice(25_000, 16_000)))
+        self.assertLess(s3_client.bytes_transferred, len(s3_client.objects[url]) // 2)
+
+    def test_parquet_row_groups_read_kwargs(self):
+        table = pa.table({"pk": np.arange(1_000), "data": ["a", "b"] * 500})
+        url = "s3://bucket/read_kwargs.parquet"
+        s3_client = InMemoryS3Client({url: _parquet_bytes(table, row_group_size=100)})
+
+        def read(**read_kwargs):
+            return self._read(
+                s3_client,
+                url,
+                ContentType.PARQUET.value,
+                ContentEncoding.IDENTITY.value,
+                pa_read_func_kwargs_provider=ReadKwargsProviderPyArrowParquetRowGroups(
+                    record_range=(150, 420),
+                    delegate=lambda content_type, kwargs: {**kwargs, **read_kwargs},
+                ),
+            )
+
+        result = read(read_dictionary=["data"], use_threads=False)
+        self.assertTrue(pa.types.is_dictionary(result.schema.field("data").type))
+        self.assertEqual(result["pk"].to_pylist(), list(range(150, 420)))
+        with self.assertRaises(NotImplementedError):
+            read(filters=[("pk", ">", 200)])
+
+    def test_row_groups_ignored_for_csv(self):
+        provider = ReadKwargsProviderPyArrowParquetRowGroups(row_groups=[0])
+        self.assertEqual(provider(ContentType.CSV.value, {}), {})
+
+    def test_gzip_csv_full_read(self):
+        sink = io.BytesIO()
+        pacsv.write_csv(
+            pa.table({"pk": [1, 2], "data": ["a", "b"]}),
+            sink,
+            write_options=pacsv.WriteOptions(include_header=False),
+        )
+        url = "s3://bucket/file.csv.gz"
+        s3_client = InMemoryS3Client({url: gzip.compress(sink.getvalue())})
+        result = self._read(
+            s3_client,
+            url,
+            ContentType.CSV.value,
+            ContentEncoding.GZIP.value,
+            column_names=["pk", "data"],
+            include_columns=["data"],
+        )
+        self.assertEqual(result.column_names, ["data"])
+        self.assertEqual(result["data"].to_pylist(), ["a", "b"])
+
+
+class TestS3RangedReader(unittest.TestCase):
+    def test_reads_match_object(self):
+        body = bytes(range(256)) * 40
+        url = "s3://bucket/object"
+        s3_client = InMemoryS3Client({url: body})
+        with mock.patch.object(s3u, "s3_client_cache", return_value=s3_client):
+            reader = s3u.S3RangedReader(url, tail_size=1000)
+        self.assertEqual(reader.size, len(body))
+        reader.seek(100)
+        self.assertEqual(reader.read(50), body[100:150])
+        # reads that start in the fetched tail don't make another request
+        request_count = s3_client.request_count
+        reader.seek(-10, io.SEEK_END)
+        self.assertEqual(reader.read(), body[-10:])
+        self.assertEqual(s3_client.request_count, request_count)
+        self.assertEqual(reader.read(10), b"")
+
+    def test_empty_object(self):
+        url = "s3://bucket/empty"
+        s3_client = InMemoryS3Client({url: b""})
+        with mock.patch.object(s3u, "s3_client_cache", return_value=s3_client):
+            reader = s3u.S3RangedReader(url)
+        self.assertEqual(reader.size, 0)
+        self.assertEqual(reader.read(), b"")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,7 +6,7 @@ import gzip
 import io
 import logging
 from functools import partial
-from typing import Any, Callable, Dict, Iterable, List, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 import pyarrow as pa
 from fsspec import AbstractFileSystem
@@ -204,6 +204,116 @@ class ReadKwargsProviderPyArrowSchemaOverride(ContentTypeKwargsProvider):
         return kwargs
 
 
+class ReadKwargsProviderPyArrowParquetRowGroups(ContentTypeKwargsProvider):
+    """ReadKwargsProvider impl that reads only a subset of the row groups of
+    Parquet files, given either as row group indices or as the half-open
+    range of records to read. When a record range is given, the table read
+    contains exactly the records in that range. Keyword args from an optional
+    delegate provider are applied first."""
+
+    def __init__(
+        self,
+        row_groups: Optional[List[int]] = None,
+        record_range: Optional[Tuple[int, int]] = None,
+        delegate: Optional[ReadKwargsProvider] = None,
+    ):
+        assert (row_groups is None) != (
+            record_range is None
+        ), "Exactly one of row groups or record range must be given"
+        self.row_groups = row_groups
+        self.record_range = record_range
+        self.delegate = delegate
+
+    def _get_kwargs(self, content_type: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        if self.delegate:
+            kwargs = self.delegate(content_type, kwargs)
+        if content_type == ContentType.PARQUET.value:
+            if self.row_groups is not None:
+                kwargs["row_groups"] = self.row_groups
+            else:
+                kwargs["record_range"] = self.record_range
+        return kwargs
+
+
+# pq.read_table keyword args applied when opening a Parquet file to read a
+# subset of its row groups
+_PARQUET_ROW_GROUPS_FILE_KWARGS = {
+    "metadata",
+    "read_dictionary",
+    "memory_map",
+    "buffer_size",
+    "pre_buffer",
+    "coerce_int96_timestamp_unit",
+    "decryption_properties",
+    "thrift_string_size_limit",
+    "thrift_container_size_limit",
+}
+
+# pq.read_table keyword args applied when reading a subset of row groups
+_PARQUET_ROW_GROUPS_READ_KWARGS = {
+    "use_threads",
+    "use_pandas_metadata",
+}
+
+
+def _read_parquet_row_groups(
+    input_file: Any,
+    row_groups: Optional[List[int]],
+    record_range: Optional[Tuple[int, int]],
+    columns: Optional[List[str]] = None,
+    schema: Optional[pa.Schema] = None,
+    **kwargs,
+) -> pa.Table:
+
+    unsupported_kwargs = (
+        kwargs.keys()
+        - _PARQUET_ROW_GROUPS_FILE_KWARGS
+        - _PARQUET_ROW_GROUPS_READ_KWARGS
+    )
+    if unsupported_kwargs:
+        raise NotImplementedError(
+            f"Reading a subset of Parquet row groups doesn't support read "
+            f"kwargs: {sorted(unsupported_kwargs)}"
+        )
+    file_kwargs = {
+        k: v for k, v in kwargs.items() if k in _PARQUET_ROW_GROUPS_FILE_KWARGS
+    }
+    file_kwargs.setdefault("pre_buffer", True)
+    parquet_file = papq.ParquetFile(input_file, **file_kwargs)
+    first_record_index = 0
+    if record_range is not None:
+        # find the row groups that contain the records in the range
+        start, stop = record_range
+        row_groups = []
+        row_group_start = 0
+        for rg in range(parquet_file.metadata.num_row_groups):
+            row_group_stop = (
+                row_group_start + parquet_file.metadata.row_group(rg).num_rows
+            )
+            if row_group_stop > start and row_group_start < stop:
+                if not row_groups:
+                    first_record_index = row_group_start
+                row_groups.append(rg)
+            row_group_start = row_group_stop
+    table = parquet_file.read_row_groups(
+        row_groups,
+        columns=columns,
+        **{k: v for k, v in kwargs.items() if k in _PARQUET_ROW_GROUPS_READ_KWARGS},
+    )
+    if record_range is not None:
+        table = table.slice(start - first_record_index, stop - start)
+    if schema is not None:
+        table = table.cast(
+            pa.schema(
+                [
+                    schema.field(name) if name in schema.names else field
+                    for name, field in zip(table.column_names, table.schema)
+                ]
+            )
+        )
+    return table
+
+
 def _add_column_kwargs(
     content_type: str,
     column_names: Optional[List[str]],
@@ -253,21 +363,45 @@ def s3_file_to_table(
         f"Reading {s3_url} to PyArrow. Content type: {content_type}. "
         f"Encoding: {content_encoding}"
     )
-    s3_obj = s3_utils.get_object_at_url(s3_url, **s3_client_kwargs)
-    logger.debug(f"Read S3 object from {s3_url}: {s3_obj}")
     pa_read_func = CONTENT_TYPE_TO_PA_READ_FUNC[content_type]
-    input_file_init = ENCODING_TO_FILE_INIT[content_encoding]
-    input_file = input_file_init(fileobj=io.BytesIO(s3_obj["Body"].read()))
-
-    args = [input_file]
     kwargs = content_type_to_reader_kwargs(content_type)
     _add_column_kwargs(content_type, column_names, include_columns, kwargs)
 
     if pa_read_func_kwargs_provider:
         kwargs = pa_read_func_kwargs_provider(content_type, kwargs)
 
+    row_groups = kwargs.pop("row_groups", None)
+    record_range = kwargs.pop("record_range", None)
+    if (
+        content_type == ContentType.PARQUET.value
+        and content_encoding == ContentEncoding.IDENTITY.value
+        and (include_columns or row_groups is not None or record_range is not None)
+    ):
+        # only download the footer and the column chunks of included columns
+        # and row groups
+        input_file = pa.PythonFile(
+            s3_utils.S3RangedReader(s3_url, **s3_client_kwargs),
+            mode="r",
+        )
+    else:
+        s3_obj = s3_utils.get_object_at_url(s3_url, **s3_client_kwargs)
+        logger.debug(f"Read S3 object from {s3_url}: {s3_obj}")
+        body = s3_obj["Body"].read()
+        if content_encoding == ContentEncoding.IDENTITY.value:
+            # read directly from the downloaded bytes without copying them
+            input_file = pa.BufferReader(body)
+        else:
+            input_file_init = ENCODING_TO_FILE_INIT[content_encoding]
+            input_file = input_file_init(fileobj=io.BytesIO(body))
+
+    if row_groups is not None or record_range is not None:
+        pa_read_func = partial(
+            _read_parquet_row_groups,
+            row_groups=row_groups,
+            record_range=record_range,
+        )
     logger.debug(f"Reading {s3_url} via {pa_read_func} with kwargs: {kwargs}")
-    table, latency = timed_invocation(pa_read_func, *args, **kwargs)
+    table, latency = timed_invocation(pa_read_func, input_file, **kwargs)
     logger.debug(f"Time to read {s3_url} into PyArrow table: {latency}s")
     return table
 
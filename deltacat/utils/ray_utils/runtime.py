@@ -126,3 +126,14 @@ def get_current_ray_task_id() -> str:
 
 def get_current_ray_worker_id() -> str:
     return ray.get_runtime_context().worker.core_worker.get_worker_id()
+
+
+def get_current_ray_task_num_cpus() -> int:
+    """Returns the number of CPUs assigned to the current Ray task or actor,
+    rounded down to a whole number of at least 1. Returns 1 when not called
+    from a Ray worker (e.g. from the driver or in local mode)."""
+    runtime_context = ray.get_runtime_context()
+    if runtime_context.worker.mode != ray.WORKER_MODE:
+        return 1
+    cpus = runtime_context.get_assigned_resources().get("CPU")
+    return max(int(cpus), 1) if cpus is not None else 1